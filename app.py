@@ -2,11 +2,13 @@ import streamlit as st
 import os
 import uuid
 from ui.sidebar import render_sidebar  # Asegúrate de que render_sidebar() no ejecute comandos a nivel global
-from ui.chat import render_chat_interface
+from ui.chat import render_chat_interface, adopt_finished_generation, has_unadopted_generation
 from ui.instructions import render_instructions
 from ui.history import render_history_management
 from config.settings import APP_TITLE, APP_DESCRIPTION, PAGE_ICON
-from services.storage_service import load_conversation, save_conversation
+from services.storage_service import load_conversation
+from services.autosave_service import get_autosave_writer
+from services.archive_service import get_archive_runner
 
 # Esta llamada debe ser la primera instrucción de Streamlit en el script
 st.set_page_config(
@@ -24,7 +26,9 @@ os.makedirs('ui', exist_ok=True)
 def init_app():
     """Inicializa variables y configura la sesión."""
     if "conversation_id" not in st.session_state:
-        st.session_state.conversation_id = str(uuid.uuid4())
+        # La URL recuerda la conversación, así que al recargar la página se
+        # vuelve a ella (y a la respuesta que se siga generando)
+        st.session_state.conversation_id = st.query_params.get("conversation") or str(uuid.uuid4())
     
     if "messages" not in st.session_state:
         messages = load_conversation(st.session_state.conversation_id)
@@ -41,14 +45,21 @@ def init_app():
 
 def main():
     init_app()
+    if st.query_params.get("conversation") != st.session_state.conversation_id:
+        st.query_params["conversation"] = st.session_state.conversation_id
+    # Una respuesta terminada en segundo plano pasa al historial en cualquier página
+    adopt_finished_generation()
+    # Archivado periódico de conversaciones frías, en segundo plano
+    get_archive_runner().maybe_schedule()
     
     st.title(APP_TITLE)
     st.markdown(APP_DESCRIPTION)
     
     # --- Navegación en la barra lateral ---
     st.sidebar.title("Navigation")
-    # Llama a render_sidebar() si lo deseas (asegúrate de que no ejecute comandos de Streamlit en el nivel global)
     page = st.sidebar.radio("Go to", ["Chat", "History Management"])
+    # La lista de modelos sale de un catálogo en caché, así que no bloquea cada rerun
+    render_sidebar()
     
     if page == "Chat":
         st.header("Chat")
@@ -59,9 +70,15 @@ def main():
         st.header("History Management")
         render_history_management()
     
-    # Guardar conversación si autosave está habilitado
-    if st.session_state.autosave and st.session_state.messages:
-        save_conversation(st.session_state.conversation_id, st.session_state.messages)
+    # Encolar el guardado si autosave está habilitado; el escritor en segundo
+    # plano solo persiste la conversación si cambió desde el último guardado.
+    # Mientras hay una respuesta en segundo plano, es ella quien guarda
+    if st.session_state.autosave and st.session_state.messages and not has_unadopted_generation():
+        get_autosave_writer().schedule(
+            st.session_state.conversation_id,
+            st.session_state.messages,
+            st.session_state.get("conversation_name", "(unnamed)")
+        )
 
 if __name__ == "__main__":
     main()
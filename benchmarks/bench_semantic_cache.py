@@ -0,0 +1,85 @@
+"""
+Lookup latency of the semantic response cache.
+
+Fills a SemanticCache with random unit vectors (no Ollama needed) and times
+lookups of near-duplicate queries against the memory-mapped index at
+several sizes. Each lookup is one matrix-vector product over all stored
+questions, so latency grows linearly with the number of entries.
+
+Usage:
+    python -m benchmarks.bench_semantic_cache [--sizes 1000 10000 100000] [--dim 768]
+"""
+import argparse
+import json
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+from services.semantic_cache import SemanticCache
+
+
+def random_unit_vectors(rng: np.random.Generator, count: int, dim: int) -> np.ndarray:
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            cache = SemanticCache(directory, "bench", threshold=0.9, capacity=size,
+                                  embed_fn=lambda model, text: [])
+            vectors = random_unit_vectors(rng, size, args.dim)
+            start = time.perf_counter()
+            for begin in range(0, size, 10000):
+                batch = vectors[begin:begin + 10000]
+                cache.add_many(
+                    "model",
+                    [f"question {i}" for i in range(begin, begin + len(batch))],
+                    batch,
+                    [f"answer {i}" for i in range(begin, begin + len(batch))]
+                )
+            fill_seconds = time.perf_counter() - start
+
+            # Queries are stored questions plus a little noise, so most of them hit
+            targets = rng.integers(0, size, args.lookups)
+            noise = random_unit_vectors(rng, args.lookups, args.dim) * 0.2
+            queries = vectors[targets] + noise
+            queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+            timings = []
+            hits = 0
+            for query in queries:
+                start = time.perf_counter()
+                match = cache.lookup("model", query)
+                timings.append((time.perf_counter() - start) * 1000)
+                hits += match is not None
+
+            print(json.dumps({
+                "benchmark": "semantic_cache_lookup",
+                "entries": size,
+                "dim": args.dim,
+                "fill_s": round(fill_seconds, 3),
+                "lookups": args.lookups,
+                "hit_rate": round(hits / args.lookups, 3),
+                "p50_ms": round(percentile(timings, 50), 3),
+                "p95_ms": round(percentile(timings, 95), 3),
+                "max_ms": round(max(timings), 3),
+            }))
+
+
+if __name__ == "__main__":
+    main()
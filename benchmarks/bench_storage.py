@@ -0,0 +1,112 @@
+"""
+Conversation storage benchmark.
+
+Fills a temporary history directory with N conversations through
+services.storage_service and times save_conversation (new conversations
+and appending one message to an existing one), load_conversation and
+list_conversations / list_conversations_page, for each storage backend.
+
+Usage:
+    python -m benchmarks.bench_storage [--counts 10 1000 10000] [--backends sqlite jsonl]
+"""
+import argparse
+import json
+import logging
+import random
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from services import storage_service
+from utils.messages import new_message
+
+
+def make_messages(count: int, index: int) -> List[Dict]:
+    messages = []
+    for turn in range(count // 2):
+        messages.append(new_message("user", f"Question {turn} of conversation {index}: how does it work?"))
+        messages.append(new_message(
+            "assistant",
+            f"Answer {turn}. " + "Some explanation with a bit of detail. " * 10,
+            thinking="Reasoning about the question. " * 5
+        ))
+    return messages
+
+
+def timed(fn: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def summary(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    return {
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 3),
+    }
+
+
+def use_backend(backend: str, directory: str) -> None:
+    storage_service.STORAGE_BACKEND = backend
+    storage_service.STORAGE_DIR = directory
+    storage_service._sqlite_store = None
+    storage_service._archive_store = None
+
+
+def run(backend: str, count: int, messages_per_conversation: int, samples: int) -> Dict:
+    rng = random.Random(count)
+    with tempfile.TemporaryDirectory() as directory:
+        use_backend(backend, directory)
+        ids = [f"bench-{i:06d}" for i in range(count)]
+        conversations = {cid: make_messages(messages_per_conversation, i) for i, cid in enumerate(ids)}
+
+        start = time.perf_counter()
+        for cid in ids:
+            storage_service.save_conversation(cid, conversations[cid], name=f"Conversation {cid}")
+        fill_seconds = time.perf_counter() - start
+
+        sample_ids = rng.sample(ids, min(samples, count))
+        append_ms = []
+        for cid in sample_ids:
+            conversations[cid].append(new_message("user", "One more question?"))
+            append_ms.append(timed(
+                lambda: storage_service.save_conversation(cid, conversations[cid], name=f"Conversation {cid}")
+            ))
+        load_ms = [timed(lambda: storage_service.load_conversation(cid)) for cid in sample_ids]
+        list_ms = [timed(storage_service.list_conversations) for _ in range(3)]
+        page_ms = [timed(lambda: storage_service.list_conversations_page(limit=20)) for _ in range(10)]
+
+    return {
+        "benchmark": "storage",
+        "backend": backend,
+        "conversations": count,
+        "messages_per_conversation": messages_per_conversation,
+        "save_new_ms_avg": round(fill_seconds * 1000 / count, 3),
+        "save_append": summary(append_ms),
+        "load": summary(load_ms),
+        "list_all": summary(list_ms),
+        "list_page": summary(page_ms),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--backends", nargs="+", default=["sqlite", "jsonl"])
+    parser.add_argument("--messages", type=int, default=10, help="Messages per conversation")
+    parser.add_argument("--samples", type=int, default=50, help="Conversations timed for load and append")
+    args = parser.parse_args()
+
+    # load_conversation touches st.session_state, which warns outside `streamlit run`
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").disabled = True
+    logging.getLogger("streamlit.runtime.state.session_state_proxy").disabled = True
+
+    for backend in args.backends:
+        for count in args.counts:
+            print(json.dumps(run(backend, count, args.messages, args.samples)))
+
+
+if __name__ == "__main__":
+    main()
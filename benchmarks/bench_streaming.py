@@ -0,0 +1,130 @@
+"""
+End-to-end streaming benchmark against the fake Ollama server.
+
+Streams synthetic responses over HTTP from benchmarks.fake_ollama through
+the path the chat uses: a GenerationJob consumes the stream on its own
+thread and ui.chat.render_job_output, which the chat's polling fragment
+calls, renders the job's buffer with a StreamRenderer (Streamlit runs in bare mode, so elements are built but not
+sent anywhere). For each case it also times a plain iteration over the same
+stream, so the cost of buffering, parsing and rendering can be told apart
+from the transport.
+
+Usage:
+    python -m benchmarks.bench_streaming [--sizes 2000 20000] [--chunk-chars 4 16]
+        [--tokens-per-second 0]
+"""
+import argparse
+import json
+import logging
+import time
+from typing import Any, Dict, List
+
+import ollama
+import streamlit as st
+
+from benchmarks.fake_ollama import FakeOllamaConfig, start_fake_ollama
+from config.settings import GENERATION_POLL_SECONDS
+from services import telemetry
+from services.context_manager import ContextWindowManager
+from services.generation_service import GenerationJob
+from services.ollama_service import ChatStream
+from services.prompt_assembler import PromptAssembler
+from ui.chat import render_job_output
+from ui.stream_thinking import StreamRenderer
+
+MESSAGES = [{"role": "user", "content": "Explain the benchmark."}]
+
+
+def run_raw(client: ollama.Client) -> Dict[str, float]:
+    start = time.perf_counter()
+    chars = 0
+    chunks = 0
+    for chunk in client.chat(model="deepseek-r1:14b", messages=MESSAGES, stream=True):
+        chars += len(chunk["message"]["content"])
+        chunks += 1
+    return {"seconds": time.perf_counter() - start, "chars": chars, "chunks": chunks}
+
+
+class FakeServerJob(GenerationJob):
+    """GenerationJob that asks the benchmark's fake server directly instead of the app's scheduler."""
+
+    def __init__(self, client: ollama.Client):
+        super().__init__(
+            conversation_id="bench", conversation_name="bench", base_messages=MESSAGES,
+            context_manager=ContextWindowManager(), prompt_assembler=PromptAssembler(),
+            model="deepseek-r1:14b", temperature=0.7,
+            session_id="bench", metadata={}, autosave=False
+        )
+        self._client = client
+
+    def _open_stream(self, prompt_messages: List[Dict[str, Any]]) -> ChatStream:
+        return ChatStream(self._client.chat(model=self.model, messages=prompt_messages, stream=True))
+
+
+def run_rendered(client: ollama.Client) -> Dict[str, float]:
+    start = time.perf_counter()
+    job = FakeServerJob(client)
+    job.start()
+    renderer = StreamRenderer(st.empty(), st.empty())
+    position, done = 0, False
+    while not done:
+        # The chat's fragment polls without waiting; here each read waits for new chunks
+        # so the measurement is not dominated by the poll interval
+        position, done = render_job_output(job, renderer, position, timeout=GENERATION_POLL_SECONDS)
+    timings = job.result["metadata"]["telemetry"]
+    return {
+        "seconds": time.perf_counter() - start,
+        "chars": len(job.result["content"]) + len(job.result.get("thinking") or ""),
+        "ttft_ms": timings["ttft_ms"],
+        "first_visible_ms": timings["first_visible_ms"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 20000],
+                        help="Characters of thinking and of answer per response")
+    parser.add_argument("--chunk-chars", type=int, nargs="+", default=[4, 16])
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # Bare-mode Streamlit warns on every element; the benchmark only needs them built
+    # (Streamlit resets logger levels when it loads its config, so disable it instead)
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").disabled = True
+    # Benchmark answers are not real traffic: keep them out of the metrics log
+    telemetry.METRICS_LOG_ENABLED = False
+
+    for size in args.sizes:
+        for chunk_chars in args.chunk_chars:
+            config = FakeOllamaConfig(
+                tokens_per_second=args.tokens_per_second,
+                chunk_chars=chunk_chars,
+                think_chars=size,
+                answer_chars=size,
+            )
+            server, url = start_fake_ollama(config)
+            try:
+                client = ollama.Client(host=url)
+                raw = min((run_raw(client) for _ in range(args.repeat)), key=lambda r: r["seconds"])
+                rendered = min((run_rendered(client) for _ in range(args.repeat)), key=lambda r: r["seconds"])
+            finally:
+                server.shutdown()
+
+            print(json.dumps({
+                "benchmark": "streaming_end_to_end",
+                "response_chars": 2 * size,
+                "chunk_chars": chunk_chars,
+                "chunks": raw["chunks"],
+                "tokens_per_second": args.tokens_per_second,
+                "raw_ms": round(raw["seconds"] * 1000, 3),
+                "rendered_ms": round(rendered["seconds"] * 1000, 3),
+                "overhead_us_per_chunk": round((rendered["seconds"] - raw["seconds"]) * 1e6 / raw["chunks"], 3),
+                "chars_per_s": round(rendered["chars"] / rendered["seconds"]),
+                "ttft_ms": rendered["ttft_ms"],
+                "first_visible_ms": rendered["first_visible_ms"],
+            }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Micro-benchmark for the streaming <think> parser.
+
+Feeds synthetic deepseek-r1 style responses in small chunks and reports the
+time per chunk for the incremental ThinkStreamParser and for the previous
+approach of re-running the regexes over the accumulated response. With the
+parser the time per chunk stays flat as the response grows; with the regex
+rescan it grows linearly (quadratic in total). extract_thinking, used on
+complete responses, is timed once over the whole text.
+
+Usage:
+    python -m benchmarks.bench_thinking [--chunk-size 8] [--sizes 2000 8000 32000]
+"""
+import argparse
+import json
+import re
+import time
+from typing import Callable, List
+
+from utils.thinking import ThinkStreamParser, extract_thinking
+
+
+def make_response(size: int) -> str:
+    """Build a response of roughly `size` characters: half thinking, half answer."""
+    half = size // 2
+    thinking = ("Let me reason about this step by step. " * (half // 40 + 1))[:half]
+    answer = ("Here is the final answer with some detail. " * (half // 44 + 1))[:half]
+    return f"<think>{thinking}</think>\n\n{answer}"
+
+
+def chunked(text: str, chunk_size: int) -> List[str]:
+    return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+
+
+def run_parser(chunks: List[str]) -> None:
+    parser = ThinkStreamParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.close()
+
+
+def run_regex_rescan(chunks: List[str]) -> None:
+    full_response = ""
+    for chunk in chunks:
+        full_response += chunk
+        re.search(r'<think>(.*?)</think>', full_response, re.DOTALL)
+        re.sub(r'<think>.*?</think>', '', full_response, flags=re.DOTALL).strip()
+
+
+def run_extract_thinking(chunks: List[str]) -> None:
+    extract_thinking("".join(chunks))
+
+
+def measure(fn: Callable[[List[str]], None], chunks: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(chunks)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunk-size", type=int, default=8)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 8000, 32000, 128000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        chunks = chunked(make_response(size), args.chunk_size)
+        impls = (
+            ("parser", run_parser),
+            ("regex_rescan", run_regex_rescan),
+            ("extract_thinking", run_extract_thinking),
+        )
+        for name, fn in impls:
+            seconds = measure(fn, chunks, args.repeat)
+            print(json.dumps({
+                "benchmark": "thinking_stream",
+                "impl": name,
+                "response_chars": size,
+                "chunks": len(chunks),
+                "total_ms": round(seconds * 1000, 3),
+                "us_per_chunk": round(seconds * 1e6 / len(chunks), 3),
+            }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Compare two benchmark result files written by benchmarks.run_all.
+
+Results are matched on their parameters (every field that is not a
+measurement) and each measurement is printed with its ratio new/old.
+Timings that got slower by more than --threshold are flagged, and the
+exit status is 1 if any were, so the comparison can gate a change.
+
+Usage:
+    python -m benchmarks.compare old.jsonl new.jsonl [--threshold 0.2]
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, Iterator, List, Tuple
+
+# Run metadata that differs between files and is not part of the identity
+RUN_FIELDS = {"commit", "run_at", "python", "quick"}
+# Fields (or nested fields, e.g. "load.p50_ms") with these suffixes are measurements
+MEASUREMENT_SUFFIXES = ("_ms", "_s", "us_per_chunk", "_avg", "hit_rate")
+# Measurements where higher is better; every other measurement is a time or cost
+HIGHER_IS_BETTER = ("_per_s", "hit_rate")
+
+
+def is_measurement(key: str) -> bool:
+    return key.endswith(MEASUREMENT_SUFFIXES)
+
+
+def flatten(record: Dict[str, Any], prefix: str = "") -> Iterator[Tuple[str, Any]]:
+    for key, value in record.items():
+        if isinstance(value, dict):
+            yield from flatten(value, f"{prefix}{key}.")
+        else:
+            yield f"{prefix}{key}", value
+
+
+def split(record: Dict[str, Any]) -> Tuple[Tuple, Dict[str, float]]:
+    identity, measurements = [], {}
+    for key, value in flatten(record):
+        if key in RUN_FIELDS:
+            continue
+        if is_measurement(key) and isinstance(value, (int, float)):
+            measurements[key] = value
+        else:
+            identity.append((key, value))
+    return tuple(sorted(identity)), measurements
+
+
+def load(path: str) -> Dict[Tuple, Dict[str, float]]:
+    results = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                identity, measurements = split(json.loads(line))
+                results[identity] = measurements
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    old, new = load(args.old), load(args.new)
+    regressions: List[str] = []
+    for identity, new_values in new.items():
+        old_values = old.get(identity)
+        if old_values is None:
+            continue
+        label = " ".join(f"{k}={v}" for k, v in identity)
+        for key, new_value in new_values.items():
+            old_value = old_values.get(key)
+            if not old_value:
+                continue
+            ratio = new_value / old_value
+            worse = ratio < 1 - args.threshold if key.endswith(HIGHER_IS_BETTER) else ratio > 1 + args.threshold
+            flag = "  REGRESSION" if worse else ""
+            print(f"{label} {key}: {old_value} -> {new_value} ({ratio:.2f}x){flag}")
+            if worse:
+                regressions.append(f"{label} {key}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Stand-in for the Ollama HTTP API used by the benchmarks.
+
+Serves /api/chat (streaming and not), /api/generate, /api/tags and
+/api/show. Chat answers are synthetic deepseek-r1 style responses: a
+<think> section followed by the answer, streamed in chunks of a
+configurable size at a configurable token rate. The final chunk carries
+the same counters Ollama sends (eval_count, eval_duration, ...).
+
+Usage:
+    python -m benchmarks.fake_ollama [--port 11434] [--tokens-per-second 0]
+        [--chunk-chars 4] [--think-chars 2000] [--answer-chars 2000]
+"""
+import argparse
+import json
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, Tuple
+
+# Ollama counts roughly one token per this many characters of English text
+CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class FakeOllamaConfig:
+    """Shape and speed of the synthetic responses."""
+    tokens_per_second: float = 0.0  # 0 = as fast as possible
+    chunk_chars: int = 4
+    think_chars: int = 2000
+    answer_chars: int = 2000
+    model: str = "deepseek-r1:14b"
+    # Seconds before a chat or generate response starts, like prompt evaluation or a model load
+    first_chunk_delay: float = 0.0
+
+
+def make_response(think_chars: int, answer_chars: int) -> str:
+    """Build a response with a <think> section of think_chars and an answer of answer_chars."""
+    thinking = ("Let me reason about this step by step. " * (think_chars // 40 + 1))[:think_chars]
+    paragraph = "Here is part of the final answer with **some** detail.\n\n"
+    answer = (paragraph * (answer_chars // len(paragraph) + 1))[:answer_chars]
+    if not think_chars:
+        return answer
+    return f"<think>{thinking}</think>\n\n{answer}"
+
+
+def stream_chunks(config: FakeOllamaConfig) -> Iterator[str]:
+    """Yield the response text in chunks, paced to the configured token rate."""
+    text = make_response(config.think_chars, config.answer_chars)
+    delay = 0.0
+    if config.tokens_per_second > 0:
+        delay = config.chunk_chars / CHARS_PER_TOKEN / config.tokens_per_second
+    next_at = time.perf_counter()
+    for start in range(0, len(text), config.chunk_chars):
+        if delay:
+            next_at += delay
+            pause = next_at - time.perf_counter()
+            if pause > 0:
+                time.sleep(pause)
+        yield text[start:start + config.chunk_chars]
+
+
+def final_stats(config: FakeOllamaConfig, elapsed: float) -> dict:
+    tokens = (config.think_chars + config.answer_chars) // CHARS_PER_TOKEN
+    return {
+        "done": True,
+        "done_reason": "stop",
+        "total_duration": int(elapsed * 1e9),
+        "load_duration": 1_000_000,
+        "prompt_eval_count": 32,
+        "prompt_eval_duration": 10_000_000,
+        "eval_count": tokens,
+        "eval_duration": int(elapsed * 1e9),
+    }
+
+
+def _make_handler(config: FakeOllamaConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def setup(self):
+            super().setup()
+            with self.server.lock:
+                self.server.connections += 1
+
+        def _json(self, obj: dict) -> None:
+            body = json.dumps(obj).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _chunk(self, obj: dict) -> None:
+            line = (json.dumps(obj) + "\n").encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._json({"models": [{
+                    "model": config.model,
+                    "name": config.model,
+                    "size": 9_000_000_000,
+                    "digest": "fake",
+                    "details": {"family": "qwen2", "parameter_size": "14.8B", "quantization_level": "Q4_K_M"},
+                }]})
+            else:
+                self._json({})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/api/show":
+                return self._json({"model_info": {"qwen2.context_length": 131072}})
+            if self.path not in ("/api/chat", "/api/generate"):
+                return self._json({})
+
+            is_chat = self.path == "/api/chat"
+            model = request.get("model", config.model)
+            if config.first_chunk_delay:
+                time.sleep(config.first_chunk_delay)
+            start = time.perf_counter()
+            if not request.get("stream", True):
+                text = "".join(stream_chunks(config))
+                body = {"message": {"role": "assistant", "content": text}} if is_chat else {"response": text}
+                return self._json({"model": model, **body, **final_stats(config, time.perf_counter() - start)})
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for piece in stream_chunks(config):
+                    body = {"message": {"role": "assistant", "content": piece}} if is_chat else {"response": piece}
+                    self._chunk({"model": model, **body, "done": False})
+                empty = {"message": {"role": "assistant", "content": ""}} if is_chat else {"response": ""}
+                self._chunk({"model": model, **empty, **final_stats(config, time.perf_counter() - start)})
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    return Handler
+
+
+def start_fake_ollama(config: FakeOllamaConfig, port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Start the server on a background thread.
+
+    Args:
+        config: Response shape and speed
+        port: Port to listen on (0 = any free port)
+
+    Returns:
+        (server, base URL); call server.shutdown() to stop it.
+        server.connections counts the TCP connections accepted so far
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(config))
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    threading.Thread(target=server.serve_forever, name="fake-ollama", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--chunk-chars", type=int, default=4)
+    parser.add_argument("--think-chars", type=int, default=2000)
+    parser.add_argument("--answer-chars", type=int, default=2000)
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(
+        tokens_per_second=args.tokens_per_second,
+        chunk_chars=args.chunk_chars,
+        think_chars=args.think_chars,
+        answer_chars=args.answer_chars,
+    )
+    server, url = start_fake_ollama(config, args.port)
+    print(f"Fake Ollama listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
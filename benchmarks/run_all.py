@@ -0,0 +1,77 @@
+"""
+Run the benchmark suite and write the results as JSON lines.
+
+Each benchmark runs in its own process. Every result line is tagged with
+the git commit, so result files from different commits can be compared
+with benchmarks.compare.
+
+Usage:
+    python -m benchmarks.run_all [--output bench_output.jsonl] [--quick]
+        [--only thinking storage]
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from typing import Dict, List
+
+# Benchmark name -> (module, arguments for the full run, arguments for --quick)
+BENCHMARKS: Dict[str, tuple] = {
+    "thinking": ("benchmarks.bench_thinking", [], ["--sizes", "2000", "8000", "--repeat", "1"]),
+    "streaming": ("benchmarks.bench_streaming", [], ["--sizes", "2000", "--repeat", "1"]),
+    "storage": ("benchmarks.bench_storage", [], ["--counts", "10", "1000"]),
+    "semantic_cache": ("benchmarks.bench_semantic_cache", [], ["--sizes", "1000", "10000"]),
+}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_benchmark(module: str, arguments: List[str]) -> List[Dict]:
+    result = subprocess.run(
+        [sys.executable, "-m", module, *arguments], capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(f"{module} failed:\n{result.stderr}", file=sys.stderr)
+        return []
+    records = []
+    for line in result.stdout.splitlines():
+        if line.startswith("{"):
+            records.append(json.loads(line))
+    return records
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default="bench_output.jsonl")
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes, for a fast check")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), default=sorted(BENCHMARKS))
+    args = parser.parse_args()
+
+    run_info = {
+        "commit": git_commit(),
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "quick": args.quick,
+    }
+    count = 0
+    with open(args.output, "w", encoding="utf-8") as f:
+        for name in args.only:
+            module, full_args, quick_args = BENCHMARKS[name]
+            print(f"Running {name}...", file=sys.stderr)
+            for record in run_benchmark(module, quick_args if args.quick else full_args):
+                f.write(json.dumps({**run_info, **record}) + "\n")
+                count += 1
+    print(f"Wrote {count} results to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
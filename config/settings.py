@@ -1,3 +1,5 @@
+import os
+
 APP_TITLE = "🤖 DeepSeek Chatbot"
 APP_DESCRIPTION = "Chat with your local DeepSeek model using Ollama"
 PAGE_ICON = "🤖"
@@ -6,6 +8,118 @@ PAGE_ICON = "🤖"
 DEFAULT_MODEL = "deepseek-r1:14b"
 DEFAULT_TEMPERATURE = 0.7
 
+# Ollama server and HTTP connection pool shared by every request.
+# OLLAMA_HTTP_KEEPALIVE_EXPIRY is how long idle HTTP connections are reused;
+# it is unrelated to OLLAMA_KEEP_ALIVE below, which keeps models loaded
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")
+OLLAMA_CONNECT_TIMEOUT = 5.0
+OLLAMA_READ_TIMEOUT = 300.0
+OLLAMA_POOL_MAX_CONNECTIONS = 10
+OLLAMA_POOL_MAX_KEEPALIVE = 10
+OLLAMA_HTTP_KEEPALIVE_EXPIRY = 60.0
+
+# Output caps, enforced on every chat request (None = no limit). Ollama stops
+# after OLLAMA_NUM_PREDICT generated tokens; the stream is closed as soon as
+# the <think> section passes OLLAMA_THINKING_MAX_TOKENS, which aborts the
+# generation and frees the slot. Overrides match like OLLAMA_KEEP_ALIVE_BY_MODEL below
+OLLAMA_NUM_PREDICT = 4096
+OLLAMA_NUM_PREDICT_BY_MODEL = {}
+OLLAMA_THINKING_MAX_TOKENS = 3072
+OLLAMA_THINKING_MAX_TOKENS_BY_MODEL = {}
+
+# Context window sent to the model (Ollama's num_ctx option)
+OLLAMA_NUM_CTX = 8192
+# Tokens left free for the reply (thinking + answer); the prompt gets the rest.
+# It covers the largest output cap, so a full prompt plus a full reply fit in
+# num_ctx and Ollama never shifts part of the prompt out mid-answer (an
+# uncapped model still can)
+CONTEXT_RESPONSE_RESERVE_TOKENS = max(
+    (cap for cap in [OLLAMA_NUM_PREDICT, *OLLAMA_NUM_PREDICT_BY_MODEL.values()] if cap is not None),
+    default=2048
+)
+CONTEXT_TOKEN_BUDGET = OLLAMA_NUM_CTX - CONTEXT_RESPONSE_RESERVE_TOKENS
+# When the prompt overflows, older turns are summarized until it fits in this fraction of the budget
+CONTEXT_TRIM_RATIO = 0.75
+# Rough token estimate used for budgeting
+CHARS_PER_TOKEN = 3.5
+MESSAGE_TOKEN_OVERHEAD = 4
+# Model used to summarize older turns (None = the selected chat model)
+SUMMARY_MODEL = None
+SUMMARY_MAX_TOKENS = 400
+# Reasoning models think before writing the summary; this much thinking is
+# allowed on top of SUMMARY_MAX_TOKENS (past it, the extractive summary is used)
+SUMMARY_THINKING_MAX_TOKENS = 1024
+
+# How long Ollama keeps a model (and its KV cache) loaded after a request.
+# Overrides match the full model name or the name without tag, e.g.
+# {"deepseek-r1": "2h", "tiny:1b": "5m"}; -1 keeps the model loaded indefinitely
+OLLAMA_KEEP_ALIVE = "30m"
+OLLAMA_KEEP_ALIVE_BY_MODEL = {}
+
+# Chat requests from all sessions go through one scheduler: at most
+# OLLAMA_MAX_CONCURRENT_REQUESTS stream at once and waiting requests are served
+# round-robin across sessions. Requests beyond the queue limits are rejected
+OLLAMA_MAX_CONCURRENT_REQUESTS = 2
+OLLAMA_MAX_QUEUED_REQUESTS = 32
+OLLAMA_MAX_QUEUED_PER_SESSION = 2
+
+# Compare mode sends the same conversation to several models at once; each one
+# takes a scheduler slot, so all of them only stream together (and the total
+# time stays close to the slowest model) up to OLLAMA_MAX_CONCURRENT_REQUESTS.
+# They are all queued under the user's session, so they must also fit in
+# OLLAMA_MAX_QUEUED_PER_SESSION. Ollama must also be allowed to keep them
+# loaded (OLLAMA_MAX_LOADED_MODELS)
+COMPARE_MAX_MODELS = min(OLLAMA_MAX_CONCURRENT_REQUESTS, OLLAMA_MAX_QUEUED_PER_SESSION)
+
+# Exact-match cache of deterministic answers (temperature at or below the
+# maximum), keyed on model, options and the normalized prompt. Recent answers
+# stay in memory; all of them are kept in a SQLite file
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_MAX_TEMPERATURE = 0.0
+RESPONSE_CACHE_MEMORY_ENTRIES = 256
+RESPONSE_CACHE_DISK_MAX_ENTRIES = 10000
+RESPONSE_CACHE_DB = os.path.join("conversation_history", "response_cache.db")
+# Cached answers are replayed as a stream in chunks of this many characters
+RESPONSE_CACHE_REPLAY_CHUNK_CHARS = 24
+
+# Semantic cache: standalone questions similar enough (cosine similarity) to
+# one answered before get the stored answer. Needs numpy and an embedding
+# model pulled in Ollama (ollama pull nomic-embed-text)
+SEMANTIC_CACHE_ENABLED = False
+SEMANTIC_CACHE_EMBED_MODEL = "nomic-embed-text"
+SEMANTIC_CACHE_THRESHOLD = 0.92
+# Entries per chat model; the least recently used one is evicted when full
+SEMANTIC_CACHE_MAX_ENTRIES = 100000
+# Each vector file starts with room for this many entries and doubles when
+# full, up to SEMANTIC_CACHE_MAX_ENTRIES (a full file is ~300 MB at 768 dims)
+SEMANTIC_CACHE_INITIAL_ENTRIES = 1024
+SEMANTIC_CACHE_DIR = os.path.join("conversation_history", "semantic_cache")
+
+# One JSON line per answer with its timings and token counts
+# (summary per model: python -m services.telemetry)
+METRICS_LOG_ENABLED = True
+METRICS_LOG_PATH = os.path.join("conversation_history", "metrics.jsonl")
+
+# Preload the selected model in the background on startup and when it changes
+MODEL_WARMUP_ENABLED = True
+# A failed warm-up is retried after this many seconds
+MODEL_WARMUP_RETRY_SECONDS = 30
+
+# Installed models are cached for this long and refreshed in the background
+MODEL_CATALOG_TTL_SECONDS = 60
+# The very first catalog load waits at most this long before falling back
+MODEL_CATALOG_INITIAL_TIMEOUT = 3.0
+
+# The chat shows only the latest CHAT_RENDER_WINDOW messages; "load earlier"
+# adds CHAT_RENDER_PAGE_SIZE more each time
+CHAT_RENDER_WINDOW = 40
+CHAT_RENDER_PAGE_SIZE = 40
+
+# Maximum number of UI updates per second while a response is streaming
+STREAM_RENDER_MAX_HZ = 15
+# While thinking streams, only this many trailing characters are re-rendered
+STREAM_THINKING_PREVIEW_CHARS = 1500
+
 # UI text
 SIDEBAR_HEADER = "Settings"
 SIDEBAR_FOOTER = "Made with Streamlit and Ollama"
@@ -23,4 +137,41 @@ INSTRUCTIONS = """
 - This application is using the DeepSeek model: `deepseek-r1:14b`
 - Adjust temperature for more creative or focused responses
 - Your conversation history is maintained during the session
-"""
\ No newline at end of file
+"""
+
+# Conversation storage
+# "sqlite" keeps conversations in a WAL-mode database inside the history
+# directory; "jsonl" keeps one append-only journal file per conversation
+STORAGE_BACKEND = "sqlite"
+SQLITE_DB_FILENAME = "history.db"
+HISTORY_PAGE_SIZE = 20
+
+# Append-only journals are compacted once they hold more than
+# JOURNAL_COMPACT_RATIO records per message (and at least the minimum below)
+JOURNAL_COMPACT_MIN_RECORDS = 200
+JOURNAL_COMPACT_RATIO = 2
+
+# Autosave batches changes and writes them on a background thread after this delay
+AUTOSAVE_DEBOUNCE_SECONDS = 2.0
+
+# Answers are generated on a background thread per conversation. The chat view
+# polls the answer's buffer from a fragment every GENERATION_POLL_SECONDS,
+# drawing the new text and the queue position without blocking the page.
+# A finished answer stays available to the sessions open on its conversation
+# (and to reloaded pages) for GENERATION_RESULT_TTL_SECONDS
+GENERATION_POLL_SECONDS = 0.25
+GENERATION_RESULT_TTL_SECONDS = 900
+
+# Archive tier: conversations untouched for ARCHIVE_AFTER_DAYS are moved into
+# compressed pack files (one zlib record per conversation plus an offset index)
+# under the history directory. The check runs in the background at most once
+# every ARCHIVE_CHECK_INTERVAL_HOURS; archived conversations still open and
+# list normally, and saving one moves it back to the live store
+ARCHIVE_ENABLED = True
+ARCHIVE_AFTER_DAYS = 30
+ARCHIVE_CHECK_INTERVAL_HOURS = 24
+ARCHIVE_DIRNAME = "archive"
+ARCHIVE_PACK_MAX_BYTES = 64 * 1024 * 1024
+ARCHIVE_COMPRESSION_LEVEL = 6
+# Conversations written to a pack per batch (and per fsync)
+ARCHIVE_BATCH_SIZE = 100
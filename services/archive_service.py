@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, Any, List, Optional, Tuple
+
+from config.settings import ARCHIVE_ENABLED, ARCHIVE_AFTER_DAYS, ARCHIVE_CHECK_INTERVAL_HOURS
+from services.storage_service import (
+    archive_stale_conversations,
+    restore_conversation,
+    get_archive_store
+)
+
+# Clave en los metadatos del archivo con la fecha del último archivado
+LAST_RUN_KEY = "last_archive_run"
+
+
+class ArchiveJobRunner:
+    """
+    Ejecuta los trabajos de archivado y restauración en un hilo en segundo plano.
+
+    Los trabajos se ejecutan de uno en uno y en orden, así que un archivado
+    y una restauración nunca compiten por las mismas conversaciones. Tras
+    cada archivado se reescriben los packs con demasiados bytes muertos.
+    """
+
+    def __init__(self):
+        # (tipo, argumento): ("archive", días) o ("restore", [ids])
+        self._queue: Deque[Tuple[str, Any]] = deque()
+        self._running: Optional[str] = None
+        self._last: Optional[Dict[str, Any]] = None
+        self._next_check = 0.0
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="archive-jobs", daemon=True)
+        self._thread.start()
+
+    def archive(self, days: float = ARCHIVE_AFTER_DAYS) -> bool:
+        """Encola un archivado; devuelve False si ya había uno pendiente."""
+        with self._cond:
+            if self._running == "archive" or any(kind == "archive" for kind, _ in self._queue):
+                return False
+            self._queue.append(("archive", days))
+            self._cond.notify_all()
+        return True
+
+    def restore(self, conversation_ids: List[str]) -> None:
+        """Encola la restauración de conversaciones archivadas."""
+        with self._cond:
+            self._queue.append(("restore", list(conversation_ids)))
+            self._cond.notify_all()
+
+    def maybe_schedule(self) -> bool:
+        """
+        Encola el archivado periódico si pasaron ARCHIVE_CHECK_INTERVAL_HOURS
+        desde el último. Se llama en cada rerun, así que entre comprobaciones
+        no toca el disco.
+        """
+        if not ARCHIVE_ENABLED or time.monotonic() < self._next_check:
+            return False
+        self._next_check = time.monotonic() + 60
+        archive = get_archive_store()
+        if archive is None:
+            return False
+        last_run = archive.get_meta(LAST_RUN_KEY)
+        interval = timedelta(hours=ARCHIVE_CHECK_INTERVAL_HOURS)
+        if last_run and datetime.fromisoformat(last_run) + interval > datetime.now():
+            return False
+        return self.archive()
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Estado de los trabajos.
+
+        Returns:
+            Diccionario con running (tipo del trabajo en curso o None), queued
+            y last (tipo, count, finished_at y error del último trabajo, o None).
+        """
+        with self._cond:
+            return {"running": self._running, "queued": len(self._queue), "last": self._last}
+
+    def wait_idle(self, timeout: float = 60.0) -> bool:
+        """Espera a que terminen los trabajos encolados; devuelve False si se agota el tiempo."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _execute(self, kind: str, argument: Any) -> int:
+        if kind == "archive":
+            count = archive_stale_conversations(argument)
+            archive = get_archive_store()
+            if archive is not None:
+                archive.repack()
+                archive.set_meta(LAST_RUN_KEY, datetime.now().isoformat())
+            return count
+        return sum(1 for cid in argument if restore_conversation(cid))
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                kind, argument = self._queue.popleft()
+                self._running = kind
+
+            error = None
+            count = 0
+            try:
+                count = self._execute(kind, argument)
+            except Exception as e:
+                print(f"Error in {kind} job: {e}")
+                error = str(e)
+            finally:
+                with self._cond:
+                    self._running = None
+                    self._last = {
+                        "kind": kind,
+                        "count": count,
+                        "finished_at": datetime.now().isoformat(timespec="seconds"),
+                        "error": error,
+                    }
+                    self._cond.notify_all()
+
+
+_runner: Optional[ArchiveJobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_archive_runner() -> ArchiveJobRunner:
+    """Devuelve el ejecutor de trabajos de archivo compartido por el proceso."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = ArchiveJobRunner()
+        return _runner
@@ -0,0 +1,289 @@
+import json
+import mmap
+import os
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+from config.settings import ARCHIVE_PACK_MAX_BYTES, ARCHIVE_COMPRESSION_LEVEL
+from services.sqlite_store import encode_cursor, decode_cursor
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS archived (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    last_updated TEXT NOT NULL,
+    message_count INTEGER NOT NULL,
+    pack TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    raw_size INTEGER NOT NULL,
+    archived_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_archived_updated
+    ON archived (last_updated DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_archived_pack ON archived (pack);
+CREATE TABLE IF NOT EXISTS archive_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+INDEX_FILENAME = "index.db"
+PACK_PREFIX = "pack-"
+PACK_SUFFIX = ".pack"
+
+# Un pack se reescribe cuando menos de esta fracción de sus bytes sigue indexada
+REPACK_LIVE_RATIO = 0.5
+
+
+class ArchiveStore:
+    """
+    Archivo de conversaciones frías en packs comprimidos.
+
+    Cada conversación se comprime por separado con zlib y se añade al final
+    del pack actual; un índice SQLite guarda su pack, desplazamiento y
+    longitud, además de los metadatos para listar sin abrir los packs. Leer
+    una conversación solo descomprime su registro, leído de un mapeo en
+    memoria del pack.
+
+    Los packs solo crecen: al restaurar o eliminar una conversación se borra
+    su fila del índice y sus bytes quedan muertos hasta que repack() reescribe
+    los packs que ya son mayoritariamente basura.
+    """
+
+    def __init__(self, directory: str, pack_max_bytes: int = ARCHIVE_PACK_MAX_BYTES,
+                 compression_level: int = ARCHIVE_COMPRESSION_LEVEL):
+        self.directory = directory
+        self.pack_max_bytes = pack_max_bytes
+        self.compression_level = compression_level
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        # pack -> (archivo abierto, mapeo); se vuelve a mapear cuando el pack crece
+        self._maps: Dict[str, Tuple[Any, mmap.mmap]] = {}
+        self._maps_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                os.path.join(self.directory, INDEX_FILENAME), timeout=5.0, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _pack_path(self, pack: str) -> str:
+        return os.path.join(self.directory, pack)
+
+    def _pack_names(self) -> List[str]:
+        return sorted(
+            f for f in os.listdir(self.directory)
+            if f.startswith(PACK_PREFIX) and f.endswith(PACK_SUFFIX)
+        )
+
+    def _current_pack(self, incoming: int) -> str:
+        """Pack al que se añaden incoming bytes; abre uno nuevo si el actual está lleno."""
+        packs = self._pack_names()
+        if packs:
+            last = packs[-1]
+            size = os.path.getsize(self._pack_path(last))
+            if size == 0 or size + incoming <= self.pack_max_bytes:
+                return last
+            number = int(last[len(PACK_PREFIX):-len(PACK_SUFFIX)]) + 1
+        else:
+            number = 1
+        return f"{PACK_PREFIX}{number:06d}{PACK_SUFFIX}"
+
+    def add_many(self, conversations: List[Dict[str, Any]]) -> int:
+        """
+        Archiva conversaciones (con id, name, last_updated y messages).
+
+        Los registros se escriben y se sincronizan en disco antes de confirmar
+        el índice, así que un corte a mitad deja como mucho bytes sin indexar
+        y nunca una fila que apunte a datos incompletos. Una conversación ya
+        archivada se reemplaza.
+
+        Returns:
+            Número de conversaciones archivadas.
+        """
+        if not conversations:
+            return 0
+        records = []
+        for conv in conversations:
+            raw = json.dumps(conv, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            records.append((conv, len(raw), zlib.compress(raw, self.compression_level)))
+        with self._write_lock:
+            return self._append(records)
+
+    def _append(self, records: List[Tuple[Dict[str, Any], int, bytes]]) -> int:
+        # Se llama con _write_lock tomado
+        archived_at = datetime.now().isoformat()
+        rows = []
+        pack = self._current_pack(sum(len(blob) for _, _, blob in records))
+        with open(self._pack_path(pack), "ab") as f:
+            offset = f.tell()
+            for conv, raw_size, blob in records:
+                f.write(blob)
+                rows.append((
+                    conv["id"], conv.get("name", "(unnamed)"), conv["last_updated"],
+                    len(conv.get("messages", [])), pack, offset, len(blob), raw_size, archived_at
+                ))
+                offset += len(blob)
+            f.flush()
+            os.fsync(f.fileno())
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO archived VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(rows)
+
+    def _read(self, pack: str, offset: int, length: int) -> bytes:
+        """Lee un registro del mapeo en memoria del pack."""
+        with self._maps_lock:
+            entry = self._maps.get(pack)
+            if entry is None or len(entry[1]) < offset + length:
+                if entry is not None:
+                    entry[1].close()
+                    entry[0].close()
+                f = open(self._pack_path(pack), "rb")
+                entry = (f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+                self._maps[pack] = entry
+            return entry[1][offset:offset + length]
+
+    def _unmap(self, pack: str) -> None:
+        with self._maps_lock:
+            entry = self._maps.pop(pack, None)
+            if entry is not None:
+                entry[1].close()
+                entry[0].close()
+
+    def load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Devuelve la conversación archivada, o None si no está en el archivo."""
+        row = self._connect().execute(
+            "SELECT pack, offset, length FROM archived WHERE id = ?", (conversation_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(self._read(*row)))
+
+    def contains(self, conversation_id: str) -> bool:
+        return self._connect().execute(
+            "SELECT 1 FROM archived WHERE id = ?", (conversation_id,)
+        ).fetchone() is not None
+
+    def remove(self, conversation_id: str) -> bool:
+        """Quita una conversación del índice; devuelve False si no estaba archivada."""
+        with self._write_lock:
+            return self._connect().execute(
+                "DELETE FROM archived WHERE id = ?", (conversation_id,)
+            ).rowcount > 0
+
+    def list_page(self, limit: Optional[int] = None,
+                  cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Lista las conversaciones archivadas con el mismo orden y cursor que
+        SQLiteConversationStore.list_page, para poder mezclar ambas listas.
+        """
+        query = "SELECT id, name, last_updated, message_count FROM archived"
+        params: List[Any] = []
+        if cursor:
+            query += " WHERE (last_updated, id) < (?, ?)"
+            params.extend(decode_cursor(cursor))
+        query += " ORDER BY last_updated DESC, id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit + 1)
+
+        rows = self._connect().execute(query, params).fetchall()
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][2], rows[-1][0])
+
+        conversations = [
+            {"id": r[0], "name": r[1], "last_updated": r[2], "message_count": r[3], "archived": True}
+            for r in rows
+        ]
+        return conversations, next_cursor
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Resumen del espacio ocupado por el archivo.
+
+        Returns:
+            Diccionario con conversations, raw_bytes (JSON sin comprimir),
+            packed_bytes (registros indexados), pack_bytes (tamaño de los
+            packs en disco, incluidos los bytes muertos) y packs.
+        """
+        count, raw, packed = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(length), 0) FROM archived"
+        ).fetchone()
+        packs = self._pack_names()
+        return {
+            "conversations": count,
+            "raw_bytes": raw,
+            "packed_bytes": packed,
+            "pack_bytes": sum(os.path.getsize(self._pack_path(p)) for p in packs),
+            "packs": len(packs),
+        }
+
+    def repack(self) -> int:
+        """
+        Reescribe los packs en los que menos de REPACK_LIVE_RATIO de los bytes
+        sigue indexada y elimina los que ya no tienen registros.
+
+        Cada pack se copia con _write_lock tomado: una restauración o un
+        borrado (remove) que llegue a la vez espera a que termine la copia y
+        quita la fila nueva, en lugar de que la copia devuelva al índice una
+        conversación ya quitada.
+
+        Returns:
+            Número de packs eliminados.
+        """
+        conn = self._connect()
+        live = dict(conn.execute("SELECT pack, SUM(length) FROM archived GROUP BY pack").fetchall())
+        removed = 0
+        for pack in self._pack_names()[:-1]:  # el último sigue recibiendo registros
+            size = os.path.getsize(self._pack_path(pack))
+            if live.get(pack, 0) >= size * REPACK_LIVE_RATIO:
+                continue
+            with self._write_lock:
+                rows = conn.execute(
+                    "SELECT id, offset, length, raw_size FROM archived WHERE pack = ?", (pack,)
+                ).fetchall()
+                records = []
+                for _, offset, length, raw_size in rows:
+                    # Los registros ya comprimidos se copian tal cual
+                    blob = self._read(pack, offset, length)
+                    records.append((json.loads(zlib.decompress(blob)), raw_size, blob))
+                if records:
+                    self._append(records)
+                self._unmap(pack)
+                os.remove(self._pack_path(pack))
+                removed += 1
+        return removed
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT value FROM archive_meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._write_lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO archive_meta (key, value) VALUES (?, ?)", (key, value)
+            )
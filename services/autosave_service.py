@@ -0,0 +1,134 @@
+import atexit
+import threading
+import time
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+from config.settings import AUTOSAVE_DEBOUNCE_SECONDS
+from services.journal_store import message_hash
+from services.storage_service import save_conversation
+
+# Huella barata de una conversación: (número de mensajes, hash del último, nombre).
+# No depende del tamaño de la conversación, así que calcularla en cada rerun es O(1).
+Fingerprint = Tuple[int, Optional[str], str]
+
+
+def conversation_fingerprint(messages: List[Dict[str, Any]], name: str) -> Fingerprint:
+    """Calcula la huella usada para detectar cambios en una conversación."""
+    last = message_hash(messages[-1]) if messages else None
+    return (len(messages), last, name)
+
+
+class AutosaveWriter:
+    """
+    Guardado diferido en segundo plano.
+
+    Cada rerun llama a schedule(); solo si la huella de la conversación cambió
+    se toma una instantánea de la lista de mensajes y se encola. Un hilo
+    escritor agrupa los cambios de cada conversación y los persiste una vez
+    transcurrido el tiempo de debounce.
+    """
+
+    def __init__(self, save_fn: Callable[[str, List[Dict[str, Any]], str], bool],
+                 debounce: float = AUTOSAVE_DEBOUNCE_SECONDS):
+        self._save_fn = save_fn
+        self._debounce = debounce
+        self._fingerprints: Dict[str, Fingerprint] = {}
+        # conversation_id -> (momento límite, mensajes, nombre)
+        self._pending: Dict[str, Tuple[float, List[Dict[str, Any]], str]] = {}
+        self._in_flight: Optional[str] = None
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="autosave-writer", daemon=True)
+        self._thread.start()
+
+    def schedule(self, conversation_id: str, messages: List[Dict[str, Any]], name: str) -> bool:
+        """
+        Encola el guardado de una conversación si cambió desde el último.
+
+        Returns:
+            True si la conversación estaba modificada y se encoló.
+        """
+        fingerprint = conversation_fingerprint(messages, name)
+        with self._cond:
+            if self._fingerprints.get(conversation_id) == fingerprint:
+                return False
+            self._fingerprints[conversation_id] = fingerprint
+            due = self._pending[conversation_id][0] if conversation_id in self._pending \
+                else time.monotonic() + self._debounce
+            # Copia superficial: los mensajes existentes no se modifican en sitio
+            self._pending[conversation_id] = (due, list(messages), name)
+            self._cond.notify_all()
+        return True
+
+    def flush(self, conversation_id: Optional[str] = None, timeout: float = 10.0) -> None:
+        """
+        Fuerza la escritura inmediata de los cambios pendientes y espera a que termine.
+
+        Args:
+            conversation_id: Conversación a guardar, o None para todas.
+            timeout: Tiempo máximo de espera en segundos.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            for cid, (_, messages, name) in list(self._pending.items()):
+                if conversation_id is None or cid == conversation_id:
+                    self._pending[cid] = (0.0, messages, name)
+            self._cond.notify_all()
+            while self._has_pending(conversation_id):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+    def forget(self, conversation_id: str) -> None:
+        """Descarta cambios pendientes y la huella de una conversación eliminada."""
+        with self._cond:
+            self._pending.pop(conversation_id, None)
+            self._fingerprints.pop(conversation_id, None)
+
+    def _has_pending(self, conversation_id: Optional[str]) -> bool:
+        if conversation_id is None:
+            return bool(self._pending) or self._in_flight is not None
+        return conversation_id in self._pending or self._in_flight == conversation_id
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                cid = min(self._pending, key=lambda k: self._pending[k][0])
+                due = self._pending[cid][0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                _, messages, name = self._pending.pop(cid)
+                self._in_flight = cid
+
+            try:
+                saved = self._save_fn(cid, messages, name)
+            except Exception as e:
+                print(f"Error in autosave for {cid}: {e}")
+                saved = False
+            try:
+                if not saved:
+                    # Permite que el próximo rerun vuelva a intentarlo
+                    with self._cond:
+                        self._fingerprints.pop(cid, None)
+            finally:
+                with self._cond:
+                    self._in_flight = None
+                    self._cond.notify_all()
+
+
+_writer: Optional[AutosaveWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_autosave_writer() -> AutosaveWriter:
+    """Devuelve el escritor compartido por todas las sesiones del proceso."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = AutosaveWriter(save_conversation)
+            atexit.register(_writer.flush)
+        return _writer
@@ -0,0 +1,206 @@
+"""
+Headless batch inference over the chat service.
+
+Reads a JSONL file where each line is a prompt or a conversation:
+
+    {"id": "q1", "prompt": "What is a monad?"}
+    {"id": "q2", "messages": [{"role": "user", "content": "..."}], "model": "...", "temperature": 0.2}
+
+and runs every item through generate_chat_response with a fixed number of
+requests in flight. <think> sections are split out with the same
+ThinkStreamParser the chat UI uses. Each result is appended to the output
+JSONL as soon as it finishes, with its timing and token counts, so memory
+stays bounded by the concurrency and not by the size of the input.
+
+The output file doubles as the checkpoint: with --resume, items whose id
+already has a successful result are skipped and new results are appended,
+so an interrupted run can be continued. Failed items are retried.
+
+Usage:
+    python -m services.batch_runner input.jsonl output.jsonl [--model deepseek-r1:14b]
+        [--temperature 0.7] [--concurrency 2] [--resume]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, Set, TextIO, Tuple
+
+from config.settings import DEFAULT_MODEL, DEFAULT_TEMPERATURE, OLLAMA_MAX_CONCURRENT_REQUESTS
+from services.ollama_service import generate_chat_response, truncation_reason
+from services.telemetry import build_telemetry
+from utils.helpers import extract_chunk_content
+from utils.thinking import ThinkStreamParser
+
+
+def read_items(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the items of an input file one at a time.
+
+    Items without an id get "line-<n>" (1-based line number). A "prompt"
+    becomes a single user message.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            item.setdefault("id", f"line-{number}")
+            if "messages" not in item:
+                item["messages"] = [{"role": "user", "content": item["prompt"]}]
+            yield item
+
+
+def completed_ids(path: str) -> Set[str]:
+    """
+    Ids with a successful result in an existing output file.
+
+    A line cut off by an interrupted run is dropped from the file, so new
+    results are appended after the last complete line.
+    """
+    if not os.path.exists(path):
+        return set()
+    done = set()
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not record.get("error"):
+                done.add(record["id"])
+    return done
+
+
+def run_item(item: Dict[str, Any], model: str, temperature: float, submitted_at: float) -> Dict[str, Any]:
+    """Generate the answer to one item and return its output record."""
+    model = item.get("model", model)
+    started_at = time.perf_counter()
+    timings: Dict[str, float] = {}
+    parser = ThinkStreamParser()
+    stream = generate_chat_response(model, item["messages"], item.get("temperature", temperature))
+    for chunk in stream:
+        content_chunk = extract_chunk_content(chunk)
+        if not content_chunk:
+            continue
+        timings.setdefault("first_token", time.perf_counter())
+        text_delta, _ = parser.feed(content_chunk)
+        if text_delta.strip():
+            timings.setdefault("first_visible", time.perf_counter())
+    parser.close()
+    telemetry = build_telemetry(
+        model, getattr(stream, "stats", {}), submitted_at, started_at, timings, time.perf_counter()
+    )
+    return {
+        "id": item["id"],
+        "model": model,
+        "content": parser.text,
+        "thinking": parser.thinking,
+        "unclosed_thinking": parser.in_thinking,
+        "truncated": truncation_reason(stream),
+        "telemetry": telemetry.to_dict(),
+        "error": None,
+    }
+
+
+def _write(out: TextIO, record: Dict[str, Any]) -> None:
+    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    out.flush()
+
+
+def run_batch(
+    input_path: str,
+    output_path: str,
+    model: str = DEFAULT_MODEL,
+    temperature: float = DEFAULT_TEMPERATURE,
+    concurrency: int = OLLAMA_MAX_CONCURRENT_REQUESTS,
+    resume: bool = False
+) -> Tuple[int, int, int]:
+    """
+    Run every item of input_path and append the results to output_path.
+
+    Args:
+        input_path: Input JSONL of prompts or conversations
+        output_path: Output JSONL; also read as the checkpoint when resuming
+        model: Model for items that do not name one
+        temperature: Temperature for items that do not set one
+        concurrency: Requests in flight at once
+        resume: Skip items that already have a successful result
+
+    Returns:
+        (succeeded, failed, skipped)
+    """
+    done = completed_ids(output_path) if resume else set()
+    succeeded = failed = skipped = 0
+    in_flight: Dict[Future, str] = {}
+
+    def collect(futures) -> None:
+        nonlocal succeeded, failed
+        for future in futures:
+            item_id = in_flight.pop(future)
+            try:
+                record = future.result()
+                succeeded += 1
+            except Exception as e:
+                record = {"id": item_id, "error": f"{type(e).__name__}: {e}"}
+                failed += 1
+            _write(out, record)
+
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as executor:
+        try:
+            for item in read_items(input_path):
+                if item["id"] in done:
+                    skipped += 1
+                    continue
+                # Reading ahead only as far as the pool can take keeps memory bounded
+                while len(in_flight) >= concurrency:
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(finished)
+                future = executor.submit(run_item, item, model, temperature, time.perf_counter())
+                in_flight[future] = item["id"]
+            collect(wait(in_flight).done)
+        except KeyboardInterrupt:
+            # Let the requests in flight finish so their results are not lost;
+            # items not read yet run with --resume
+            print(f"Interrupted; finishing {len(in_flight)} requests in flight", file=sys.stderr)
+            collect(wait(in_flight).done)
+            raise
+    return succeeded, failed, skipped
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--temperature", type=float, default=DEFAULT_TEMPERATURE)
+    parser.add_argument("--concurrency", type=int, default=OLLAMA_MAX_CONCURRENT_REQUESTS)
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip items that already have a result in the output file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        succeeded, failed, skipped = run_batch(
+            args.input, args.output, args.model, args.temperature, args.concurrency, args.resume
+        )
+    except KeyboardInterrupt:
+        print("Interrupted; continue with --resume", file=sys.stderr)
+        sys.exit(130)
+    print(
+        f"{succeeded} succeeded, {failed} failed, {skipped} skipped "
+        f"in {time.perf_counter() - start:.1f}s",
+        file=sys.stderr
+    )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from config.settings import (
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_TRIM_RATIO,
+    CHARS_PER_TOKEN,
+    MESSAGE_TOKEN_OVERHEAD,
+    SUMMARY_MAX_TOKENS,
+    SUMMARY_MODEL,
+    SUMMARY_THINKING_MAX_TOKENS
+)
+from services.request_scheduler import ScheduledRequest, get_request_scheduler
+from utils.helpers import extract_chunk_content
+from utils.thinking import ThinkStreamParser
+
+SUMMARY_PROMPT = """Summarize the conversation below so it can replace the original messages as context for an assistant.
+Keep facts, decisions, names, numbers and open questions. Be concise and write in the language of the conversation.
+
+Previous summary:
+{summary}
+
+New messages:
+{transcript}
+
+Updated summary:"""
+
+class SummaryCancelledError(RuntimeError):
+    """Raised when the summary request is cancelled before it finishes."""
+
+@dataclass
+class ContextReport:
+    """Size of the prompt sent for one request."""
+    prompt_tokens: int
+    total_messages: int
+    window_messages: int
+    summarized_messages: int
+    summary_tokens: int
+
+def estimate_tokens(message: Dict[str, Any]) -> int:
+    """
+    Estimate the prompt tokens of a message.
+
+    The estimate is cached on the message under "token_estimate" together with
+    the content length it was computed for, so it is only recomputed if the
+    content changes.
+
+    Args:
+        message: Message dict with a "content" field
+
+    Returns:
+        Estimated number of tokens
+    """
+    content = message.get("content") or ""
+    if not isinstance(content, str):
+        content = str(content)
+    cached = message.get("token_estimate")
+    if cached and cached.get("chars") == len(content):
+        return cached["tokens"]
+    tokens = int(len(content) / CHARS_PER_TOKEN) + MESSAGE_TOKEN_OVERHEAD
+    message["token_estimate"] = {"chars": len(content), "tokens": tokens}
+    return tokens
+
+def _text_tokens(text: str) -> int:
+    return int(len(text) / CHARS_PER_TOKEN) + MESSAGE_TOKEN_OVERHEAD if text else 0
+
+def summarize_messages(model: str, previous_summary: str, messages: List[Dict[str, Any]],
+                       session_id: str,
+                       on_request: Optional[Callable[[ScheduledRequest], None]] = None) -> str:
+    """
+    Fold messages into a rolling summary using the model.
+
+    The request goes through the shared scheduler like any chat request, so
+    it counts against the concurrency limit and uses the same num_ctx and
+    keep_alive (a different num_ctx would make Ollama reload the model and
+    drop its cache). Falls back to an extractive summary (the start of each
+    message) if the request fails or the model thinks past
+    SUMMARY_THINKING_MAX_TOKENS.
+
+    Args:
+        model: Model to summarize with (SUMMARY_MODEL overrides it)
+        previous_summary: Summary of the messages already folded
+        messages: Messages to add to the summary
+        session_id: Session the request is scheduled for
+        on_request: Called with the scheduled request once it is submitted,
+            so the caller can cancel it from another thread
+
+    Returns:
+        Updated summary text
+
+    Raises:
+        SummaryCancelledError: If the request was cancelled
+    """
+    transcript = "\n".join(f"{m['role']}: {m.get('content', '')}" for m in messages)
+    prompt = SUMMARY_PROMPT.format(summary=previous_summary or "(none)", transcript=transcript)
+    request = None
+    try:
+        request = get_request_scheduler().submit(
+            session_id=session_id,
+            model=SUMMARY_MODEL or model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.0,
+            num_predict=SUMMARY_THINKING_MAX_TOKENS + SUMMARY_MAX_TOKENS,
+            thinking_limit=SUMMARY_THINKING_MAX_TOKENS
+        )
+        if on_request is not None:
+            on_request(request)
+        # Reasoning models wrap their reasoning in <think>; keep only the answer
+        parser = ThinkStreamParser()
+        for chunk in request:
+            content = extract_chunk_content(chunk)
+            if content:
+                parser.feed(content)
+        parser.close()
+        summary = parser.text.strip()
+        if summary and not request.cancelled:
+            return summary
+    except Exception as e:
+        if request is None or not request.cancelled:
+            print(f"Error summarizing context: {e}")
+    if request is not None and request.cancelled:
+        # A partial summary must not replace the rolling one
+        raise SummaryCancelledError("The summary request was cancelled")
+    return _extractive_summary(previous_summary, messages)
+
+def _extractive_summary(previous_summary: str, messages: List[Dict[str, Any]]) -> str:
+    lines = [previous_summary] if previous_summary else []
+    for m in messages:
+        content = " ".join(str(m.get("content", "")).split())
+        lines.append(f"{m['role']}: {content[:200]}")
+    max_chars = int(SUMMARY_MAX_TOKENS * CHARS_PER_TOKEN)
+    return "\n".join(lines)[-max_chars:]
+
+class ContextWindowManager:
+    """
+    Keeps the prompt for one conversation within a token budget.
+
+    The newest messages are sent verbatim; older ones are folded into a
+    rolling summary that is sent as a system message. When the window
+    overflows it is trimmed down to CONTEXT_TRIM_RATIO of the budget, so the
+    summary is only regenerated every few turns rather than on every one.
+    """
+
+    def __init__(
+        self,
+        budget: int = CONTEXT_TOKEN_BUDGET,
+        trim_ratio: float = CONTEXT_TRIM_RATIO,
+        summarize_fn: Callable[..., str] = summarize_messages
+    ):
+        self.budget = budget
+        self.trim_ratio = trim_ratio
+        self._summarize = summarize_fn
+        self.summary = ""
+        self.summary_covered = 0
+        self.window_start = 0
+        self.last_report: Optional[ContextReport] = None
+
+    def reset(self) -> None:
+        self.summary = ""
+        self.summary_covered = 0
+        self.window_start = 0
+
+    def build(self, messages: List[Dict[str, Any]], model: str, session_id: str,
+              on_request: Optional[Callable[[ScheduledRequest], None]] = None) -> List[Dict[str, Any]]:
+        """
+        Select the messages to send for the next request.
+
+        Summarizing dropped turns is a model request, so this can block as
+        long as one.
+
+        Args:
+            messages: Full conversation history
+            model: Model the request is for (used for summarizing)
+            session_id: Session a summary request is scheduled for
+            on_request: Passed to the summarizer (see summarize_messages)
+
+        Returns:
+            Messages to send, starting with a summary message if older turns were dropped
+
+        Raises:
+            SummaryCancelledError: If the summary request was cancelled; the
+                summary is left as it was and retried on the next build
+        """
+        if self.window_start > len(messages):
+            # The history was cleared or replaced
+            self.reset()
+
+        window_tokens = sum(estimate_tokens(m) for m in messages[self.window_start:])
+        summary_tokens = _text_tokens(self.summary)
+        if window_tokens + summary_tokens > self.budget:
+            target = int(self.budget * self.trim_ratio) - summary_tokens
+            # Always keep the last message, and start the window on a user turn
+            while self.window_start < len(messages) - 1 and window_tokens > target:
+                window_tokens -= estimate_tokens(messages[self.window_start])
+                self.window_start += 1
+            while self.window_start < len(messages) - 1 and messages[self.window_start]["role"] != "user":
+                window_tokens -= estimate_tokens(messages[self.window_start])
+                self.window_start += 1
+
+        if self.window_start > self.summary_covered:
+            self.summary = self._summarize(
+                model, self.summary, messages[self.summary_covered:self.window_start], session_id, on_request
+            )
+            self.summary_covered = self.window_start
+            summary_tokens = _text_tokens(self.summary)
+
+        window = list(messages[self.window_start:])
+        if self.summary:
+            window.insert(0, {
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{self.summary}"
+            })
+
+        self.last_report = ContextReport(
+            prompt_tokens=window_tokens + summary_tokens,
+            total_messages=len(messages),
+            window_messages=len(messages) - self.window_start,
+            summarized_messages=self.summary_covered,
+            summary_tokens=summary_tokens
+        )
+        return window
@@ -0,0 +1,343 @@
+import threading
+import time
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.settings import GENERATION_RESULT_TTL_SECONDS
+from services.autosave_service import get_autosave_writer
+from services.context_manager import ContextReport, ContextWindowManager, SummaryCancelledError
+from services.ollama_service import truncation_reason, STOP_CANCELLED
+from services.prompt_assembler import PromptAssembler
+from services.request_scheduler import get_request_scheduler
+from services.response_cache import get_response_cache, response_cache_key, CachedStream, RecordingStream
+from services.semantic_cache import get_semantic_cache
+from services.telemetry import build_telemetry, log_telemetry
+from services.warmup_service import get_model_warmer
+from utils.helpers import extract_chunk_content, format_error_message
+from utils.messages import new_message
+from utils.thinking import ThinkStreamParser
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+
+def open_response_stream(
+    prompt_messages: List[Dict[str, Any]],
+    model: str,
+    temperature: float,
+    session_id: str,
+    bypass_cache: bool = False
+) -> Any:
+    """
+    Open the stream of an answer: replayed from the response cache if the
+    request is deterministic and was already answered, from the semantic
+    cache if a similar question was, or requested from Ollama through the
+    shared scheduler.
+
+    Args:
+        prompt_messages: Messages sent to the model
+        model: Name of the model to use
+        temperature: Response temperature
+        session_id: Browser session, the scheduler's unit of fairness
+        bypass_cache: Always ask the model (the new answer replaces the cached one)
+
+    Returns:
+        Stream of chat chunks with stats, stop_reason, cached and cancel()
+    """
+    cache = get_response_cache()
+    key = None
+    if cache.is_cacheable(temperature):
+        key = response_cache_key(model, prompt_messages, temperature)
+        cached = None if bypass_cache else cache.get(key)
+        if cached is not None:
+            return cache.replay(cached)
+
+    # The semantic cache only answers standalone questions: inside a
+    # conversation the same question may need a different answer
+    semantic = get_semantic_cache()
+    question = prompt_messages[-1]["content"]
+    question_vector = None
+    if semantic is not None and [m["role"] for m in prompt_messages] == ["user"]:
+        try:
+            question_vector = semantic.embed(question)
+            match = None if bypass_cache else semantic.lookup(model, question_vector)
+            if match is not None:
+                return CachedStream(match.answer, source="semantic", score=match.score)
+        except Exception as e:
+            print(f"Error in semantic cache: {e}")
+            question_vector = None
+
+    stream = get_request_scheduler().submit(
+        session_id=session_id,
+        model=model,
+        messages=prompt_messages,
+        temperature=temperature
+    )
+    if key:
+        stream = cache.record(key, model, stream)
+    if question_vector is not None:
+        stream = RecordingStream(
+            stream, lambda answer: semantic.add(model, question, question_vector, answer)
+        )
+    return stream
+
+class GenerationJob:
+    """
+    One answer generated on a background thread.
+
+    The thread appends the content chunks of the response to a server-side
+    buffer and splits them into answer and thinking with ThinkStreamParser.
+    Script runs only read the buffer (read() returns just the chunks they
+    have not seen yet), so the answer keeps generating through reruns, page
+    switches and reconnects. The prompt is built on the thread too, since
+    summarizing older turns is a model request of its own. The finished
+    assistant message is left in `result` for the sessions to pick up, and is
+    persisted through the autosave writer when autosave is on.
+    """
+
+    def __init__(
+        self,
+        conversation_id: str,
+        conversation_name: str,
+        base_messages: List[Dict[str, Any]],
+        context_manager: ContextWindowManager,
+        prompt_assembler: PromptAssembler,
+        model: str,
+        temperature: float,
+        session_id: str,
+        metadata: Dict[str, Any],
+        bypass_cache: bool = False,
+        autosave: bool = True
+    ):
+        self.conversation_id = conversation_id
+        self.conversation_name = conversation_name
+        self.base_messages = list(base_messages)
+        self.model = model
+        self.metadata = dict(metadata)
+        self.status = QUEUED
+        # Assistant message once done; None if it was stopped before any output
+        self.result: Optional[Dict[str, Any]] = None
+        self.finished_at: Optional[float] = None
+        # Size of the prompt, once it has been built
+        self.context_report: Optional[ContextReport] = None
+        self._context_manager = context_manager
+        self._prompt_assembler = prompt_assembler
+        self._temperature = temperature
+        self._session_id = session_id
+        self._bypass_cache = bypass_cache
+        self._autosave = autosave
+        self._parser = ThinkStreamParser()
+        self._chunks: List[str] = []
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._stream: Any = None
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"generation-{conversation_id}", daemon=True)
+
+    def start(self) -> None:
+        if self._autosave:
+            # The question is saved right away, so it is not lost if the process stops mid-answer
+            get_autosave_writer().schedule(self.conversation_id, self.base_messages, self.conversation_name)
+        self._thread.start()
+
+    @property
+    def done(self) -> bool:
+        return self.status == DONE
+
+    def read(self, position: int, timeout: float) -> Tuple[List[str], int, bool]:
+        """
+        Content chunks received after the first `position` ones, waiting up
+        to `timeout` seconds for new ones.
+
+        Returns:
+            (new chunks, position to read from next time, whether the job is done)
+        """
+        with self._changed:
+            if len(self._chunks) == position and self.status != DONE:
+                self._changed.wait(timeout)
+            return self._chunks[position:], len(self._chunks), self.status == DONE
+
+    def queue_position(self) -> Optional[int]:
+        """Requests ahead in the scheduler queue, or None once the answer has started."""
+        position = getattr(self._stream, "position", None)
+        return position() if self.status == QUEUED and position else None
+
+    def cancel(self) -> None:
+        """Stop the answer and keep what was generated (safe to call from any thread)."""
+        self._cancelled.set()
+        stream = self._stream
+        if stream is not None:
+            # Scheduled and cached streams can be cancelled from another thread
+            stream.cancel()
+
+    def _track_request(self, request: Any) -> None:
+        # The summary request is cancelled by cancel() like the answer itself
+        self._stream = request
+        if self._cancelled.is_set():
+            request.cancel()
+
+    def _open_stream(self, prompt_messages: List[Dict[str, Any]]) -> Any:
+        return open_response_stream(
+            prompt_messages, self.model, self._temperature, self._session_id, self._bypass_cache
+        )
+
+    def _build_prompt(self) -> List[Dict[str, Any]]:
+        # Only the recent turns that fit the budget are sent; older ones are summarized
+        prompt_messages = self._context_manager.build(
+            self.base_messages, self.model, self._session_id, on_request=self._track_request
+        )
+        self.context_report = self._context_manager.last_report
+        self.metadata["prompt_tokens"] = self.context_report.prompt_tokens
+        # Earlier turns are sent byte-identical so Ollama can reuse its KV cache
+        prompt_messages = self._prompt_assembler.assemble(prompt_messages)
+        self.metadata["prompt_prefix"] = asdict(self._prompt_assembler.last_report)
+        return prompt_messages
+
+    def _run(self) -> None:
+        try:
+            result = self._generate()
+        except Exception as e:
+            error_message = format_error_message(e)
+            result = new_message(
+                "assistant",
+                f"Ocurrió un error: {error_message}",
+                metadata={**self.metadata, "error": True}
+            )
+
+        if self._autosave and result is not None:
+            get_autosave_writer().schedule(
+                self.conversation_id, self.base_messages + [result], self.conversation_name
+            )
+        with self._changed:
+            self.result = result
+            self.status = DONE
+            self.finished_at = time.monotonic()
+            self._changed.notify_all()
+
+    def _generate(self) -> Optional[Dict[str, Any]]:
+        """The assistant message, or None if it was stopped before any output."""
+        timings: Dict[str, float] = {}
+        metadata = self.metadata
+        try:
+            prompt_messages = self._build_prompt()
+        except SummaryCancelledError:
+            return None
+        if self._cancelled.is_set():
+            # Stopped while the prompt was built: the answer is never requested
+            return None
+        submitted_at = time.perf_counter()
+        self._stream = stream = self._open_stream(prompt_messages)
+        if self._cancelled.is_set():
+            stream.cancel()
+        wait_started = getattr(stream, "wait_started", None)
+        if wait_started is not None:
+            # A request cancelled while queued never starts
+            while not wait_started(timeout=0.5) and not self._cancelled.is_set():
+                pass
+        started_at = time.perf_counter()
+        with self._lock:
+            self.status = RUNNING
+
+        for chunk in stream:
+            if self._cancelled.is_set():
+                stream.cancel()
+                break
+            content_chunk = extract_chunk_content(chunk)
+            if not content_chunk:
+                continue
+            timings.setdefault("first_token", time.perf_counter())
+            with self._changed:
+                self._chunks.append(content_chunk)
+                text_delta, _ = self._parser.feed(content_chunk)
+                self._changed.notify_all()
+            if text_delta.strip():
+                timings.setdefault("first_visible", time.perf_counter())
+
+        with self._lock:
+            self._parser.close()
+            text, thinking = self._parser.text, self._parser.thinking
+        telemetry = build_telemetry(
+            self.model, getattr(stream, "stats", {}), submitted_at, started_at,
+            timings, time.perf_counter(), cached=getattr(stream, "cached", False)
+        )
+        metadata["telemetry"] = telemetry.to_dict()
+        if telemetry.cached and stream.source == "semantic":
+            metadata.update(cached="semantic", cache_score=stream.score)
+        elif telemetry.cached:
+            metadata["cached"] = "exact"
+        else:
+            get_model_warmer().mark_used(self.model)
+        truncated = truncation_reason(stream)
+        if truncated:
+            metadata["truncated"] = truncated
+        metadata["prompt_eval_count"] = getattr(stream, "stats", {}).get("prompt_eval_count")
+        result = new_message("assistant", text, thinking, metadata)
+        log_telemetry(telemetry, conversation_id=self.conversation_id, message_id=result["id"])
+        if truncated == STOP_CANCELLED and not (text or thinking):
+            # Stopped before any output: there is nothing to keep
+            return None
+        return result
+
+class GenerationRegistry:
+    """
+    Background generations of the process, one per conversation.
+
+    Jobs are looked up by conversation id rather than by browser session, so
+    a reloaded page (a new session that reopens the conversation from the
+    URL) attaches to the answer that is still being generated. A finished
+    job stays for GENERATION_RESULT_TTL_SECONDS, or until the conversation
+    starts its next answer, so every session open on the conversation can
+    pick up its result.
+    """
+
+    def __init__(self, result_ttl: float = GENERATION_RESULT_TTL_SECONDS):
+        self.result_ttl = result_ttl
+        self._jobs: Dict[str, GenerationJob] = {}
+        self._lock = threading.Lock()
+
+    def start(self, job: GenerationJob) -> GenerationJob:
+        """
+        Start a job.
+
+        Raises:
+            RuntimeError: If the conversation already has an answer in progress
+        """
+        with self._lock:
+            self._prune()
+            current = self._jobs.get(job.conversation_id)
+            if current is not None and not current.done:
+                raise RuntimeError("This conversation is already generating an answer")
+            self._jobs[job.conversation_id] = job
+        job.start()
+        return job
+
+    def get(self, conversation_id: str) -> Optional[GenerationJob]:
+        with self._lock:
+            self._prune()
+            return self._jobs.get(conversation_id)
+
+    def discard(self, job: GenerationJob) -> None:
+        """Forget a job, e.g. when its conversation is cleared."""
+        with self._lock:
+            if self._jobs.get(job.conversation_id) is job:
+                del self._jobs[job.conversation_id]
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        expired = [
+            cid for cid, job in self._jobs.items()
+            if job.done and now - job.finished_at > self.result_ttl
+        ]
+        for cid in expired:
+            del self._jobs[cid]
+
+_registry: Optional[GenerationRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_generation_registry() -> GenerationRegistry:
+    """Return the registry shared by all sessions of this process."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = GenerationRegistry()
+        return _registry
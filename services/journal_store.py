@@ -0,0 +1,256 @@
+import hashlib
+import json
+import os
+import threading
+from typing import List, Dict, Any, Optional
+
+from config.settings import JOURNAL_COMPACT_MIN_RECORDS, JOURNAL_COMPACT_RATIO
+
+# Cuántos bytes del final del journal se leen para obtener los metadatos
+# sin reproducir el archivo completo.
+TAIL_READ_BYTES = 8192
+
+
+class _JournalState:
+    """Estado en memoria de un journal ya escrito en disco."""
+
+    def __init__(self, count: int = 0, last_hash: Optional[str] = None,
+                 records: int = 0, name: Optional[str] = None, torn: bool = False):
+        self.count = count          # Mensajes persistidos
+        self.last_hash = last_hash  # Hash del último mensaje persistido
+        self.records = records      # Líneas escritas en el journal
+        self.name = name            # Último nombre registrado
+        self.torn = torn            # El archivo termina en una línea incompleta
+
+
+# Estado por ruta de journal; evita releer el archivo en cada guardado.
+_states: Dict[str, _JournalState] = {}
+_lock = threading.RLock()
+
+
+def message_hash(message: Dict[str, Any]) -> str:
+    """Calcula un hash estable de un mensaje serializado."""
+    data = json.dumps(message, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def _meta_record(conversation_id: str, name: str, last_updated: str, count: int,
+                 schema_version: int) -> Dict[str, Any]:
+    return {
+        "op": "meta",
+        "id": conversation_id,
+        "name": name,
+        "last_updated": last_updated,
+        "message_count": count,
+        "schema_version": schema_version,
+    }
+
+
+def _dumps(record: Dict[str, Any]) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def replay(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Reproduce un journal y reconstruye la conversación.
+
+    Una última línea incompleta (por ejemplo, tras un corte durante una
+    escritura) se ignora.
+
+    Args:
+        path: Ruta del archivo .jsonl.
+
+    Returns:
+        Diccionario con id, name, last_updated, schema_version, messages,
+        records y torn, o None si el archivo no existe.
+    """
+    if not os.path.exists(path):
+        return None
+
+    meta: Dict[str, Any] = {}
+    messages: List[Dict[str, Any]] = []
+    records = 0
+    torn = False
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                torn = True
+                continue
+            torn = False
+            records += 1
+            op = record.get("op")
+            if op == "msg":
+                index = record["i"]
+                # Un índice ya existente indica una reescritura desde ese punto
+                del messages[index:]
+                messages.append(record["m"])
+            elif op == "meta":
+                meta = record
+
+    return {
+        "id": meta.get("id", "unknown"),
+        "name": meta.get("name", "(unnamed)"),
+        "last_updated": meta.get("last_updated", "unknown"),
+        # Los journals anteriores al esquema versionado no guardan la versión
+        "schema_version": meta.get("schema_version", 1),
+        "messages": messages,
+        "records": records,
+        "torn": torn,
+    }
+
+
+def read_metadata(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Obtiene los metadatos de un journal leyendo solo su último registro "meta".
+
+    Cada guardado termina con un registro "meta", así que normalmente basta
+    con leer el final del archivo; si no se encuentra, se reproduce completo.
+    """
+    try:
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            f.seek(max(0, size - TAIL_READ_BYTES))
+            tail = f.read().decode("utf-8", errors="ignore")
+    except OSError:
+        return None
+
+    for line in reversed(tail.splitlines()):
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if record.get("op") == "meta" and "message_count" in record:
+            return {
+                "id": record.get("id", "unknown"),
+                "name": record.get("name", "(unnamed)"),
+                "last_updated": record.get("last_updated", "unknown"),
+                "message_count": record["message_count"],
+            }
+
+    data = replay(path)
+    if data is None:
+        return None
+    return {
+        "id": data["id"],
+        "name": data["name"],
+        "last_updated": data["last_updated"],
+        "message_count": len(data["messages"]),
+    }
+
+
+def _load_state(path: str) -> _JournalState:
+    state = _states.get(path)
+    if state is None:
+        data = replay(path)
+        if data is None:
+            state = _JournalState()
+        else:
+            messages = data["messages"]
+            state = _JournalState(
+                count=len(messages),
+                last_hash=message_hash(messages[-1]) if messages else None,
+                records=data["records"],
+                name=data["name"],
+                torn=data["torn"],
+            )
+        _states[path] = state
+    return state
+
+
+def compact(path: str, conversation_id: str, name: str, last_updated: str,
+            messages: List[Dict[str, Any]], schema_version: int = 1) -> None:
+    """
+    Reescribe el journal con un registro por mensaje.
+
+    Se escribe en un archivo temporal que luego reemplaza al original de forma
+    atómica, de modo que un corte nunca deja el journal a medias.
+    """
+    tmp_path = f"{path}.tmp"
+    with _lock:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for i, msg in enumerate(messages):
+                f.write(_dumps({"op": "msg", "i": i, "m": msg}))
+            f.write(_dumps(_meta_record(
+                conversation_id, name, last_updated, len(messages), schema_version
+            )))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        _states[path] = _JournalState(
+            count=len(messages),
+            last_hash=message_hash(messages[-1]) if messages else None,
+            records=len(messages) + 1,
+            name=name,
+        )
+
+
+def append(path: str, conversation_id: str, name: str, last_updated: str,
+           messages: List[Dict[str, Any]], schema_version: int = 1) -> None:
+    """
+    Persiste una conversación añadiendo solo los mensajes nuevos al journal.
+
+    Si la lista ya no extiende lo persistido (se borró o se reemplazó un
+    mensaje) o el journal acumula demasiados registros, se compacta.
+
+    Args:
+        path: Ruta del archivo .jsonl.
+        conversation_id: Identificador único de la conversación.
+        name: Nombre de la conversación.
+        last_updated: Marca de tiempo ISO del guardado.
+        messages: Lista completa de mensajes ya serializados.
+        schema_version: Versión del esquema de los mensajes.
+    """
+    with _lock:
+        state = _load_state(path)
+
+        count = len(messages)
+        diverged = count < state.count or (
+            state.count > 0 and message_hash(messages[state.count - 1]) != state.last_hash
+        )
+        # Añadir tras una línea incompleta la uniría con el siguiente registro
+        if diverged or state.torn:
+            compact(path, conversation_id, name, last_updated, messages, schema_version)
+            return
+
+        new_messages = messages[state.count:]
+        if not new_messages and name == state.name:
+            return
+
+        threshold = max(JOURNAL_COMPACT_MIN_RECORDS, JOURNAL_COMPACT_RATIO * (count + 1))
+        if state.records + len(new_messages) + 1 > threshold:
+            compact(path, conversation_id, name, last_updated, messages, schema_version)
+            return
+
+        with open(path, "a", encoding="utf-8") as f:
+            for offset, msg in enumerate(new_messages):
+                f.write(_dumps({"op": "msg", "i": state.count + offset, "m": msg}))
+            f.write(_dumps(_meta_record(conversation_id, name, last_updated, count, schema_version)))
+        state.records += len(new_messages) + 1
+        state.count = count
+        if new_messages:
+            state.last_hash = message_hash(new_messages[-1])
+        state.name = name
+
+
+def forget(path: str) -> None:
+    """Descarta el estado en memoria de un journal (por ejemplo, al eliminarlo)."""
+    with _lock:
+        _states.pop(path, None)
+
+
+def remove_if_unchanged(path: str, last_updated: str) -> bool:
+    """
+    Elimina un journal si su último guardado sigue siendo last_updated.
+
+    Se comprueba bajo el mismo cerrojo que append(), así que un guardado
+    concurrente no puede perderse entre la comprobación y el borrado.
+    """
+    with _lock:
+        metadata = read_metadata(path)
+        if metadata is None or metadata.get("last_updated") != last_updated:
+            return False
+        os.remove(path)
+        _states.pop(path, None)
+        return True
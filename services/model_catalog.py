@@ -0,0 +1,174 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from config.settings import MODEL_CATALOG_TTL_SECONDS, MODEL_CATALOG_INITIAL_TIMEOUT
+from services.ollama_client import get_ollama_client
+
+@dataclass
+class ModelInfo:
+    """Metadata about a locally installed Ollama model."""
+    name: str
+    size: Optional[int] = None
+    digest: Optional[str] = None
+    family: Optional[str] = None
+    parameter_size: Optional[str] = None
+    quantization: Optional[str] = None
+    context_length: Optional[int] = None
+
+def _field(obj: Any, key: str) -> Any:
+    """Read a field from either a dict response or a typed response object."""
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(key)
+    return getattr(obj, key, None)
+
+def _parse_model_list(response: Any) -> List[ModelInfo]:
+    """
+    Normalize the different shapes returned by ollama.list() across library versions.
+
+    Args:
+        response: Raw response from ollama.list()
+
+    Returns:
+        List of ModelInfo
+    """
+    entries = response if isinstance(response, list) else _field(response, "models") or []
+    models = []
+    for entry in entries:
+        name = _field(entry, "model") or _field(entry, "name")
+        if not name:
+            continue
+        details = _field(entry, "details")
+        models.append(ModelInfo(
+            name=name,
+            size=_field(entry, "size"),
+            digest=_field(entry, "digest"),
+            family=_field(details, "family"),
+            parameter_size=_field(details, "parameter_size"),
+            quantization=_field(details, "quantization_level"),
+        ))
+    return models
+
+def _parse_context_length(response: Any) -> Optional[int]:
+    """Extract the context length from an ollama.show() response, if present."""
+    info = _field(response, "modelinfo") or _field(response, "model_info") or {}
+    for key, value in info.items():
+        if key.endswith(".context_length"):
+            return int(value)
+    return None
+
+class ModelCatalog:
+    """
+    Process-wide cache of the installed models.
+
+    Reads never wait on the Ollama daemon once the first fetch has finished:
+    a stale catalog is returned immediately while a single background thread
+    refreshes it (stale-while-revalidate). Only reads before the first fetch
+    completes wait, and at most MODEL_CATALOG_INITIAL_TIMEOUT seconds.
+    """
+
+    def __init__(
+        self,
+        ttl: float = MODEL_CATALOG_TTL_SECONDS,
+        list_fn: Optional[Callable[[], Any]] = None,
+        show_fn: Optional[Callable[[str], Any]] = None
+    ):
+        self._ttl = ttl
+        self._list_fn = list_fn or (lambda: get_ollama_client().list())
+        self._show_fn = show_fn or (lambda name: get_ollama_client().show(name))
+        self._models: Dict[str, ModelInfo] = {}
+        # digest -> context length, so unchanged models are not re-queried
+        self._context_lengths: Dict[str, Optional[int]] = {}
+        self._fetched_at: Optional[float] = None
+        self._last_error: Optional[Exception] = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._loaded = threading.Event()
+
+    def models(self) -> List[ModelInfo]:
+        """Return the cached models, triggering a background refresh if stale."""
+        self._maybe_refresh()
+        if not self._loaded.is_set():
+            self._loaded.wait(MODEL_CATALOG_INITIAL_TIMEOUT)
+        with self._lock:
+            return list(self._models.values())
+
+    def get(self, name: str) -> Optional[ModelInfo]:
+        """Return cached metadata for a model without contacting Ollama."""
+        with self._lock:
+            return self._models.get(name)
+
+    @property
+    def last_error(self) -> Optional[Exception]:
+        """Error of the last refresh, or None if it succeeded."""
+        return self._last_error
+
+    def invalidate(self) -> None:
+        """
+        Mark the catalog as stale so the next read refreshes it.
+
+        Unlike a TTL expiry, the next read waits for the new list (at most
+        MODEL_CATALOG_INITIAL_TIMEOUT seconds), so an explicit refresh shows
+        newly pulled models at once.
+        """
+        with self._lock:
+            if self._fetched_at is not None:
+                self._fetched_at = 0.0
+            if not self._refreshing:
+                self._loaded.clear()
+
+    def _maybe_refresh(self) -> None:
+        with self._lock:
+            fresh = self._fetched_at is not None and time.monotonic() - self._fetched_at < self._ttl
+            if fresh or self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name="model-catalog-refresh", daemon=True).start()
+
+    def _refresh(self) -> None:
+        try:
+            models = _parse_model_list(self._list_fn())
+            for model in models:
+                model.context_length = self._context_lengths.get(model.digest or model.name)
+            # Publish the list first; context lengths need one extra request per new model
+            with self._lock:
+                self._models = {m.name: m for m in models}
+                self._fetched_at = time.monotonic()
+                self._last_error = None
+            self._loaded.set()
+            for model in models:
+                if (model.digest or model.name) not in self._context_lengths:
+                    model.context_length = self._fetch_context_length(model)
+        except Exception as e:
+            print(f"Error fetching models: {e}")
+            with self._lock:
+                self._last_error = e
+                # Keep serving the previous (possibly empty) catalog; retry after another TTL
+                self._fetched_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._refreshing = False
+            self._loaded.set()
+
+    def _fetch_context_length(self, model: ModelInfo) -> Optional[int]:
+        try:
+            context_length = _parse_context_length(self._show_fn(model.name))
+        except Exception as e:
+            print(f"Error fetching details for {model.name}: {e}")
+            return None
+        self._context_lengths[model.digest or model.name] = context_length
+        return context_length
+
+_catalog: Optional[ModelCatalog] = None
+_catalog_lock = threading.Lock()
+
+def get_model_catalog() -> ModelCatalog:
+    """Return the catalog shared by all sessions of this process."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = ModelCatalog()
+        return _catalog
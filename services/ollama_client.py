@@ -0,0 +1,59 @@
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+import ollama
+
+from config.settings import (
+    OLLAMA_HOST,
+    OLLAMA_CONNECT_TIMEOUT,
+    OLLAMA_READ_TIMEOUT,
+    OLLAMA_POOL_MAX_CONNECTIONS,
+    OLLAMA_POOL_MAX_KEEPALIVE,
+    OLLAMA_HTTP_KEEPALIVE_EXPIRY
+)
+
+def client_options() -> Dict[str, Any]:
+    """
+    Connection settings shared by the sync and async Ollama clients.
+
+    Returns:
+        Keyword arguments for ollama.Client / ollama.AsyncClient (extra ones
+        are passed through to httpx)
+    """
+    return {
+        "host": OLLAMA_HOST,
+        # The read timeout applies between chunks, so it must cover loading a
+        # model and thinking before the first token, not the whole response
+        "timeout": httpx.Timeout(OLLAMA_READ_TIMEOUT, connect=OLLAMA_CONNECT_TIMEOUT),
+        "limits": httpx.Limits(
+            max_connections=OLLAMA_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=OLLAMA_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=OLLAMA_HTTP_KEEPALIVE_EXPIRY
+        ),
+    }
+
+_client: Optional[ollama.Client] = None
+_client_lock = threading.Lock()
+
+def get_ollama_client() -> ollama.Client:
+    """
+    Return the sync client shared by all service calls of this process.
+
+    The underlying httpx client is thread-safe and keeps a pool of
+    keep-alive connections to the Ollama server.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ollama.Client(**client_options())
+        return _client
+
+def create_async_client() -> ollama.AsyncClient:
+    """
+    Create an async client with the shared connection settings.
+
+    An AsyncClient is tied to the event loop it is first used on, so each
+    loop needs its own (see RequestScheduler).
+    """
+    return ollama.AsyncClient(**client_options())
@@ -1,37 +1,191 @@
 import ollama
-from typing import List, Dict, Any, Generator, Optional
+from typing import List, Dict, Any, AsyncIterator, Generator, Optional
+from config.settings import (
+    DEFAULT_MODEL,
+    OLLAMA_NUM_CTX,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_KEEP_ALIVE_BY_MODEL,
+    OLLAMA_NUM_PREDICT,
+    OLLAMA_NUM_PREDICT_BY_MODEL,
+    OLLAMA_THINKING_MAX_TOKENS,
+    OLLAMA_THINKING_MAX_TOKENS_BY_MODEL
+)
+from services.model_catalog import ModelInfo, get_model_catalog
+from services.ollama_client import get_ollama_client
+from utils.helpers import extract_chunk_content
+from utils.messages import prompt_content
+from utils.thinking import ThinkStreamParser
 
 def get_available_models() -> List[str]:
     """
-    Get list of available models from Ollama.
+    Get list of available models from the shared model catalog.
+
+    The catalog is cached and refreshed in the background, so this does not
+    block on the Ollama daemon except on the very first call.
     
     Returns:
         List of model names
+
+    Raises:
+        Exception: The last catalog error, if no models were ever fetched
     """
-    try:
-        models = ollama.list()
-        # Print the raw response for debugging
-        print(f"Ollama response: {models}")
+    catalog = get_model_catalog()
+    models = catalog.models()
+    if not models:
+        if catalog.last_error is not None:
+            raise catalog.last_error
+        # Fallback to your installed model
+        return [DEFAULT_MODEL]
+    return [model.name for model in models]
+
+def get_models_error() -> Optional[Exception]:
+    """Return the error of the last catalog refresh, or None if it succeeded."""
+    return get_model_catalog().last_error
+
+def refresh_available_models() -> None:
+    """Make the next get_available_models() call fetch the list from Ollama again."""
+    get_model_catalog().invalidate()
+
+def get_model_info(model: str) -> Optional[ModelInfo]:
+    """
+    Get cached metadata (size, quantization, context length) for a model.
+    
+    Args:
+        model: Name of the model
         
-        # Handle different response formats
-        if isinstance(models, dict) and "models" in models:
-            return [model["name"] for model in models["models"]]
-        elif isinstance(models, list):
-            return [model["name"] for model in models]
-        elif isinstance(models, dict):
-            # Fallback to adding your specific model
-            return ["deepseek-r1:14b"]
-        else:
-            print(f"Unexpected response format: {type(models)}")
-            return ["deepseek-r1:14b"]  # Fallback to your installed model
-    except Exception as e:
-        print(f"Error fetching models: {e}")
-        # Even if there's an error, add your known model
-        return ["deepseek-r1:14b"]
+    Returns:
+        ModelInfo or None if the model is not in the catalog
+    """
+    return get_model_catalog().get(model)
+
+# Fields of the final chunk of a chat stream kept by ChatStream
+STREAM_STAT_FIELDS = (
+    "total_duration",
+    "load_duration",
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration",
+    "done_reason",
+)
+
+# Why a stream ended before Ollama finished the answer
+STOP_CANCELLED = "cancelled"
+STOP_THINKING_LIMIT = "thinking_limit"
+# done_reason Ollama reports when num_predict is reached
+STOP_LENGTH = "length"
+
+def _model_setting(overrides: Dict[str, Any], model: str, default: Any) -> Any:
+    """Per-model override (full name first, then the name without tag) or the default."""
+    if model in overrides:
+        return overrides[model]
+    return overrides.get(model.split(":")[0], default)
+
+def get_keep_alive(model: str) -> Any:
+    """
+    How long Ollama should keep a model loaded after a request.
+
+    Args:
+        model: Model name, e.g. "deepseek-r1:14b"
+
+    Returns:
+        keep_alive value from OLLAMA_KEEP_ALIVE_BY_MODEL (full name first,
+        then the name without tag) or OLLAMA_KEEP_ALIVE
+    """
+    return _model_setting(OLLAMA_KEEP_ALIVE_BY_MODEL, model, OLLAMA_KEEP_ALIVE)
+
+def get_num_predict(model: str) -> Optional[int]:
+    """Maximum tokens Ollama generates for one answer of the model (None = no limit)."""
+    return _model_setting(OLLAMA_NUM_PREDICT_BY_MODEL, model, OLLAMA_NUM_PREDICT)
+
+def get_thinking_limit(model: str) -> Optional[int]:
+    """Maximum <think> tokens streamed for one answer of the model (None = no limit)."""
+    return _model_setting(OLLAMA_THINKING_MAX_TOKENS_BY_MODEL, model, OLLAMA_THINKING_MAX_TOKENS)
+
+class ThinkingBudget:
+    """
+    Counts the <think> tokens of a stream and tells when the limit is passed.
+
+    Ollama streams one token per chunk, so each chunk that adds thinking
+    text counts as one token.
+    """
+
+    def __init__(self, limit: Optional[int]):
+        self.limit = limit
+        self.used = 0
+        self._parser = ThinkStreamParser()
+
+    def exceeded(self, chunk: Any) -> bool:
+        if self.limit is None:
+            return False
+        content = extract_chunk_content(chunk)
+        if content:
+            _, thinking_delta = self._parser.feed(content)
+            if thinking_delta:
+                self.used += 1
+        return self.used > self.limit
+
+def normalize_prompt_text(text: str) -> str:
+    """Normalize line endings and surrounding whitespace so equal text renders to equal bytes."""
+    return text.replace("\r\n", "\n").replace("\r", "\n").strip()
+
+class ChatStream:
+    """
+    Iterates over a chat stream and keeps the statistics of its final chunk.
+
+    The HTTP response is closed, so Ollama stops generating, as soon as the
+    thinking budget runs out or cancel() is called; stop_reason then says why.
+    """
+
+    def __init__(self, stream, budget: Optional[ThinkingBudget] = None):
+        self._stream = stream
+        self._budget = budget
+        self.stats: Dict[str, Any] = {}
+        self.stop_reason: Optional[str] = None
+
+    def __iter__(self):
+        try:
+            for chunk in self._stream:
+                if self.stop_reason:
+                    break
+                if self._budget is not None and self._budget.exceeded(chunk):
+                    self.stop_reason = STOP_THINKING_LIMIT
+                    break
+                if chunk and chunk.get("done"):
+                    self.stats = {key: chunk.get(key) for key in STREAM_STAT_FIELDS}
+                yield chunk
+        finally:
+            self._close()
+
+    def cancel(self) -> None:
+        """Stop the generation; called from the thread consuming the stream."""
+        if not self.stats and not self.stop_reason:
+            self.stop_reason = STOP_CANCELLED
+        self._close()
+
+    def _close(self) -> None:
+        close = getattr(self._stream, "close", None)
+        if close is not None:
+            close()
+
+def truncation_reason(stream: Any) -> Optional[str]:
+    """
+    Why an answer was cut short: STOP_THINKING_LIMIT, STOP_LENGTH (num_predict
+    reached), STOP_CANCELLED, or None if it finished normally.
+    """
+    reason = getattr(stream, "stop_reason", None)
+    if reason:
+        return reason
+    if getattr(stream, "stats", {}).get("done_reason") == STOP_LENGTH:
+        return STOP_LENGTH
+    return None
 
 def convert_to_ollama_messages(streamlit_messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
     """
     Convert Streamlit message format to Ollama format.
+
+    Only the final answer text is sent; stored reasoning is never fed back
+    to the model.
     
     Args:
         streamlit_messages: List of messages in Streamlit format
@@ -42,10 +196,61 @@ def convert_to_ollama_messages(streamlit_messages: List[Dict[str, str]]) -> List
     ollama_messages = []
     for msg in streamlit_messages:
         # Convert from Streamlit's format to Ollama's format
-        role = "assistant" if msg["role"] == "assistant" else "user"
-        ollama_messages.append({"role": role, "content": msg["content"]})
+        role = msg["role"] if msg["role"] in ("assistant", "system") else "user"
+        ollama_messages.append({"role": role, "content": normalize_prompt_text(prompt_content(msg))})
     return ollama_messages
 
+def chat_request_kwargs(
+    model: str,
+    ollama_messages: List[Dict[str, str]],
+    temperature: float,
+    stream: bool,
+    num_predict: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Arguments of a chat request, shared by the sync and async clients.
+
+    num_predict overrides the model's output cap (see get_num_predict).
+    """
+    # Pass options dict instead of direct temperature parameter;
+    # num_ctx matches the budget used by the context manager and must
+    # stay constant, since changing it reloads the model and drops its cache
+    options = {"temperature": temperature, "num_ctx": OLLAMA_NUM_CTX}
+    if num_predict is None:
+        num_predict = get_num_predict(model)
+    if num_predict is not None:
+        options["num_predict"] = num_predict
+    return {
+        "model": model,
+        "messages": ollama_messages,
+        "stream": stream,
+        "options": options,
+        "keep_alive": get_keep_alive(model),
+    }
+
+async def generate_chat_response_async(
+    client: ollama.AsyncClient,
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float = 0.7,
+    num_predict: Optional[int] = None
+) -> AsyncIterator[Any]:
+    """
+    Stream a chat response using an async Ollama client.
+
+    Args:
+        client: AsyncClient bound to the running event loop
+        model: Name of the model to use
+        messages: List of conversation messages
+        temperature: Response temperature (higher = more creative)
+        num_predict: Output cap overriding the model's setting
+
+    Returns:
+        Async iterator yielding response chunks
+    """
+    ollama_messages = convert_to_ollama_messages(messages)
+    return await client.chat(**chat_request_kwargs(model, ollama_messages, temperature, True, num_predict))
+
 def generate_chat_response(
     model: str, 
     messages: List[Dict[str, str]], 
@@ -62,24 +267,19 @@ def generate_chat_response(
         stream: Whether to stream the response
         
     Returns:
-        Generator yielding response chunks
+        Generator yielding response chunks (a ChatStream when streaming)
     """
     ollama_messages = convert_to_ollama_messages(messages)
     
     # Check the Ollama version to determine the correct API parameters
     try:
         # Some versions of the Ollama library don't accept temperature in the chat method
-        return ollama.chat(
-            model=model,
-            messages=ollama_messages,
-            stream=stream,
-            # Pass options dict instead of direct temperature parameter
-            options={"temperature": temperature}
-        )
+        response = get_ollama_client().chat(**chat_request_kwargs(model, ollama_messages, temperature, stream))
+        return ChatStream(response, ThinkingBudget(get_thinking_limit(model))) if stream else response
     except TypeError as e:
         print(f"Falling back to basic chat without temperature: {e}")
         # Fallback to basic parameters if the above doesn't work
-        return ollama.chat(
+        return get_ollama_client().chat(
             model=model,
             messages=ollama_messages,
             stream=stream
@@ -107,15 +307,17 @@ def generate_completion(
     """
     try:
         # First try with the options parameter
-        options = {"temperature": temperature}
+        # Same num_ctx as chat requests, so a completion does not reload the model
+        options = {"temperature": temperature, "num_ctx": OLLAMA_NUM_CTX}
         if max_tokens:
             options["num_predict"] = max_tokens
             
-        return ollama.generate(
+        return get_ollama_client().generate(
             model=model,
             prompt=prompt,
             options=options,
-            stream=stream
+            stream=stream,
+            keep_alive=get_keep_alive(model)
         )
     except TypeError:
         # Fallback to direct parameters if needed
@@ -131,10 +333,10 @@ def generate_completion(
             if max_tokens:
                 params["max_tokens"] = max_tokens
                 
-            return ollama.generate(**params)
+            return get_ollama_client().generate(**params)
         except TypeError:
             # Last resort - just use the minimal required parameters
-            return ollama.generate(
+            return get_ollama_client().generate(
                 model=model,
                 prompt=prompt,
                 stream=stream
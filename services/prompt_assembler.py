@@ -0,0 +1,78 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from services.ollama_service import convert_to_ollama_messages
+
+@dataclass
+class PrefixReport:
+    """How much of a prompt repeats the previous prompt of the conversation."""
+    total_messages: int
+    reused_messages: int
+
+def cache_hit_ratio(prompt_tokens: int, prompt_eval_count: Optional[int]) -> Optional[float]:
+    """
+    Estimate the share of the prompt served from Ollama's KV cache.
+
+    Ollama only evaluates the tokens after the cached prefix, so
+    prompt_eval_count is lower than the prompt size when the cache is reused.
+
+    Args:
+        prompt_tokens: Estimated size of the whole prompt
+        prompt_eval_count: Tokens Ollama reported as evaluated
+
+    Returns:
+        Ratio between 0 and 1, or None if it cannot be computed
+    """
+    if prompt_eval_count is None or prompt_tokens <= 0:
+        return None
+    return min(1.0, max(0.0, 1.0 - prompt_eval_count / prompt_tokens))
+
+class PromptAssembler:
+    """
+    Builds the exact messages sent to Ollama for one conversation.
+
+    Ollama only reuses its KV cache for the part of the prompt that is
+    identical to the previous request. Each message is rendered once and the
+    result is frozen by message id, so earlier turns are sent byte-for-byte
+    the same on every request even if the stored message is later reloaded,
+    upgraded or otherwise rewritten.
+    """
+
+    def __init__(self):
+        self._rendered: Dict[str, Dict[str, str]] = {}
+        self._last_prompt: List[Dict[str, str]] = []
+        self.last_report: Optional[PrefixReport] = None
+
+    def assemble(self, messages: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """
+        Render messages into Ollama's format, reusing earlier renderings.
+
+        Args:
+            messages: Messages selected for the prompt (see ContextWindowManager)
+
+        Returns:
+            Messages in Ollama format
+        """
+        prompt = [self._render(m) for m in messages]
+        if len(self._rendered) > 2 * len(messages) + 16:
+            # Forget messages that are no longer part of the conversation
+            ids = {m.get("id") for m in messages}
+            self._rendered = {k: v for k, v in self._rendered.items() if k in ids}
+
+        reused = 0
+        for previous, current in zip(self._last_prompt, prompt):
+            if previous != current:
+                break
+            reused += 1
+        self.last_report = PrefixReport(total_messages=len(prompt), reused_messages=reused)
+        self._last_prompt = prompt
+        return prompt
+
+    def _render(self, message: Dict[str, Any]) -> Dict[str, str]:
+        message_id = message.get("id")
+        if message_id and message_id in self._rendered:
+            return self._rendered[message_id]
+        rendered = convert_to_ollama_messages([message])[0]
+        if message_id:
+            self._rendered[message_id] = rendered
+        return rendered
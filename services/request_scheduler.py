@@ -0,0 +1,246 @@
+import asyncio
+import queue
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+import ollama
+
+from config.settings import (
+    OLLAMA_MAX_CONCURRENT_REQUESTS,
+    OLLAMA_MAX_QUEUED_REQUESTS,
+    OLLAMA_MAX_QUEUED_PER_SESSION
+)
+from services.ollama_client import create_async_client
+from services.ollama_service import (
+    STREAM_STAT_FIELDS,
+    STOP_CANCELLED,
+    STOP_THINKING_LIMIT,
+    ThinkingBudget,
+    generate_chat_response_async,
+    get_thinking_limit
+)
+
+_END = object()
+
+class SchedulerBusyError(RuntimeError):
+    """Raised when a request is rejected because the queue is full."""
+
+class ScheduledRequest:
+    """
+    A chat request waiting for or holding a slot in the scheduler.
+
+    Iterating over it blocks until the request starts and then yields the
+    response chunks, so it can be consumed like the stream returned by
+    generate_chat_response. Stopping the iteration early cancels the request.
+    When the request stops before Ollama finishes, stop_reason says why.
+    """
+
+    def __init__(self, scheduler: "RequestScheduler", session_id: str,
+                 start_fn: Callable[[ollama.AsyncClient], Awaitable[Any]],
+                 budget: Optional[ThinkingBudget] = None):
+        self.session_id = session_id
+        self.stats: Dict[str, Any] = {}
+        self.stop_reason: Optional[str] = None
+        self.budget = budget
+        self._scheduler = scheduler
+        self._start_fn = start_fn
+        self._chunks: "queue.Queue[Any]" = queue.Queue()
+        self._started = threading.Event()
+        # Task streaming the response, once the request has started
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.cancelled = False
+        self.cached = False
+
+    def position(self) -> Optional[int]:
+        """Requests that will start before this one, or None once it has started."""
+        return self._scheduler.position(self)
+
+    def wait_started(self, timeout: Optional[float] = None) -> bool:
+        return self._started.wait(timeout)
+
+    def cancel(self) -> None:
+        """Drop the request if it is queued, or close its stream if it is running."""
+        if not self.stats and not self.stop_reason:
+            self.stop_reason = STOP_CANCELLED
+        self.cancelled = True
+        self._scheduler.discard(self)
+
+    def __iter__(self):
+        finished = False
+        try:
+            while True:
+                item = self._chunks.get()
+                if item is _END:
+                    finished = True
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                if item and item.get("done"):
+                    self.stats = {key: item.get(key) for key in STREAM_STAT_FIELDS}
+                yield item
+        finally:
+            if not finished:
+                # The consumer stopped early or the stream failed
+                self.cancel()
+
+class RequestScheduler:
+    """
+    Shares the Ollama daemon fairly between all sessions of the process.
+
+    Requests run on one asyncio event loop in a background thread with a
+    single AsyncClient. At most max_concurrent responses stream at once;
+    waiting requests are queued per session and started round-robin, so one
+    session cannot starve the others. Submissions beyond the queue limits
+    are rejected immediately with SchedulerBusyError.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = OLLAMA_MAX_CONCURRENT_REQUESTS,
+        max_queued: int = OLLAMA_MAX_QUEUED_REQUESTS,
+        max_queued_per_session: int = OLLAMA_MAX_QUEUED_PER_SESSION,
+        client_factory: Callable[[], ollama.AsyncClient] = create_async_client
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.max_queued_per_session = max_queued_per_session
+        self._client_factory = client_factory
+        self._client: Optional[ollama.AsyncClient] = None
+        # Sessions in round-robin order; the first one starts next
+        self._queues: "OrderedDict[str, Deque[ScheduledRequest]]" = OrderedDict()
+        self._running = 0
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="ollama-scheduler", daemon=True).start()
+
+    def submit(self, session_id: str, model: str, messages: List[Dict[str, Any]],
+               temperature: float = 0.7, num_predict: Optional[int] = None,
+               thinking_limit: Optional[int] = None) -> ScheduledRequest:
+        """
+        Queue a streamed chat request.
+
+        Args:
+            session_id: Session the request belongs to (the unit of fairness)
+            model: Name of the model to use
+            messages: List of conversation messages
+            temperature: Response temperature
+            num_predict: Output cap overriding the model's setting
+            thinking_limit: Thinking budget overriding the model's setting
+
+        Returns:
+            ScheduledRequest to iterate over
+
+        Raises:
+            SchedulerBusyError: If the global or per-session queue is full
+        """
+        request = ScheduledRequest(
+            self, session_id,
+            lambda client: generate_chat_response_async(client, model, messages, temperature, num_predict),
+            ThinkingBudget(thinking_limit if thinking_limit is not None else get_thinking_limit(model))
+        )
+        self.submit_request(request)
+        return request
+
+    def submit_request(self, request: ScheduledRequest) -> None:
+        with self._lock:
+            queued = sum(len(q) for q in self._queues.values())
+            if queued >= self.max_queued:
+                raise SchedulerBusyError(f"Too many queued requests ({queued}); try again shortly")
+            if len(self._queues.get(request.session_id, ())) >= self.max_queued_per_session:
+                raise SchedulerBusyError("This session already has requests waiting")
+            self._queues.setdefault(request.session_id, deque()).append(request)
+        self._loop.call_soon_threadsafe(self._dispatch)
+
+    def position(self, request: ScheduledRequest) -> Optional[int]:
+        """Number of requests that will start before the given one, or None if it is not queued."""
+        with self._lock:
+            order = self._round_robin_order()
+        try:
+            return order.index(request)
+        except ValueError:
+            return None
+
+    def discard(self, request: ScheduledRequest) -> None:
+        """Remove a request that has not started yet, or stop one that is running."""
+        with self._lock:
+            pending = self._queues.get(request.session_id)
+            if pending and request in pending:
+                pending.remove(request)
+                if not pending:
+                    del self._queues[request.session_id]
+            task = request._task
+        if task is not None:
+            # While the prompt is evaluated or the model loads no chunk arrives to
+            # check the cancelled flag, so the task itself is cancelled: its stream
+            # is closed and the slot freed right away
+            self._loop.call_soon_threadsafe(task.cancel)
+        request._chunks.put(_END)
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def _round_robin_order(self) -> List[ScheduledRequest]:
+        order = []
+        queues = [list(q) for q in self._queues.values()]
+        depth = 0
+        while queues:
+            queues = [q for q in queues if len(q) > depth]
+            order.extend(q[depth] for q in queues)
+            depth += 1
+        return order
+
+    def _dispatch(self) -> None:
+        # Runs on the event loop thread
+        while True:
+            with self._lock:
+                if self._running >= self.max_concurrent or not self._queues:
+                    return
+                session_id, pending = next(iter(self._queues.items()))
+                request = pending.popleft()
+                del self._queues[session_id]
+                if pending:
+                    # Move the session to the back of the round-robin order
+                    self._queues[session_id] = pending
+                self._running += 1
+                request._task = self._loop.create_task(self._run(request))
+            request._started.set()
+
+    async def _run(self, request: ScheduledRequest) -> None:
+        stream = None
+        try:
+            if request.cancelled:
+                return
+            if self._client is None:
+                self._client = self._client_factory()
+            stream = await request._start_fn(self._client)
+            async for chunk in stream:
+                if request.cancelled:
+                    break
+                if request.budget is not None and request.budget.exceeded(chunk):
+                    # Closing the stream below stops the runaway reasoning and frees the slot
+                    request.stop_reason = STOP_THINKING_LIMIT
+                    break
+                request._chunks.put(chunk)
+        except Exception as e:
+            request._chunks.put(e)
+        finally:
+            if stream is not None and hasattr(stream, "aclose"):
+                # Closes the HTTP response so Ollama stops generating
+                await stream.aclose()
+            request._chunks.put(_END)
+            with self._lock:
+                self._running -= 1
+            self._dispatch()
+
+_scheduler: Optional[RequestScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_request_scheduler() -> RequestScheduler:
+    """Return the scheduler shared by all sessions of this process."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
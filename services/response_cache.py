@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from config.settings import (
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_MAX_TEMPERATURE,
+    RESPONSE_CACHE_MEMORY_ENTRIES,
+    RESPONSE_CACHE_DISK_MAX_ENTRIES,
+    RESPONSE_CACHE_DB,
+    RESPONSE_CACHE_REPLAY_CHUNK_CHARS
+)
+from services.ollama_service import chat_request_kwargs
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_created ON responses (created_at);
+"""
+
+def response_cache_key(model: str, ollama_messages: List[Dict[str, str]], temperature: float) -> str:
+    """
+    Hash of everything that determines a deterministic answer.
+
+    Args:
+        model: Model name
+        ollama_messages: Prompt messages as sent to Ollama (already normalized
+            by convert_to_ollama_messages)
+        temperature: Response temperature
+
+    Returns:
+        Hex digest
+    """
+    request = chat_request_kwargs(model, ollama_messages, temperature, True)
+    payload = {
+        "model": request["model"],
+        "options": request["options"],
+        "messages": [{"role": m["role"], "content": m["content"]} for m in request["messages"]],
+    }
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+class CachedStream:
+    """
+    Replays a cached answer as chat chunks, like a live stream.
+
+    source is "exact" for this cache and "semantic" for the semantic cache,
+    which also sets the similarity score of the matched question.
+    """
+
+    def __init__(self, content: str, chunk_chars: int = RESPONSE_CACHE_REPLAY_CHUNK_CHARS,
+                 source: str = "exact", score: Optional[float] = None):
+        self._content = content
+        self._chunk_chars = chunk_chars
+        self.stats: Dict[str, Any] = {}
+        self.stop_reason: Optional[str] = None
+        self.cached = True
+        self.source = source
+        self.score = score
+
+    def cancel(self) -> None:
+        pass
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for start in range(0, len(self._content), self._chunk_chars):
+            piece = self._content[start:start + self._chunk_chars]
+            yield {"message": {"role": "assistant", "content": piece}, "done": False}
+        yield {"message": {"role": "assistant", "content": ""}, "done": True, "done_reason": "cache"}
+
+class RecordingStream:
+    """Passes a live stream through and hands the answer to on_complete once it completes."""
+
+    def __init__(self, stream: Iterable[Any], on_complete: Callable[[str], None]):
+        self._stream = stream
+        self._on_complete = on_complete
+        self.cached = False
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return getattr(self._stream, "stats", {})
+
+    @property
+    def stop_reason(self) -> Optional[str]:
+        return getattr(self._stream, "stop_reason", None)
+
+    def cancel(self) -> None:
+        self._stream.cancel()
+
+    def __getattr__(self, name: str) -> Any:
+        # Anything else (wait_started, position, ...) comes from the wrapped stream,
+        # so a wrapped scheduled request still reports its place in the queue
+        return getattr(self._stream, name)
+
+    def __iter__(self) -> Iterator[Any]:
+        parts = []
+        completed = False
+        for chunk in self._stream:
+            message = chunk.get("message") if chunk else None
+            if message and message.get("content"):
+                parts.append(message["content"])
+            if chunk and chunk.get("done"):
+                # Only answers that finished normally are worth replaying
+                completed = chunk.get("done_reason") in (None, "stop")
+            yield chunk
+        if completed and parts:
+            self._on_complete("".join(parts))
+
+class ResponseCache:
+    """
+    Exact-match cache of deterministic chat answers.
+
+    A bounded in-memory LRU sits in front of a SQLite table, so answers
+    survive restarts and are shared by all sessions of the process. Only
+    requests at or below RESPONSE_CACHE_MAX_TEMPERATURE are cached, since
+    only those produce the same answer for the same prompt.
+    """
+
+    def __init__(
+        self,
+        db_path: str = RESPONSE_CACHE_DB,
+        memory_entries: int = RESPONSE_CACHE_MEMORY_ENTRIES,
+        disk_max_entries: int = RESPONSE_CACHE_DISK_MAX_ENTRIES
+    ):
+        self.db_path = db_path
+        self.memory_entries = memory_entries
+        self.disk_max_entries = disk_max_entries
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def is_cacheable(temperature: float) -> bool:
+        return RESPONSE_CACHE_ENABLED and temperature <= RESPONSE_CACHE_MAX_TEMPERATURE
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached answer for a key, counting the hit or miss."""
+        with self._lock:
+            content = self._memory.get(key)
+            if content is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return content
+        row = self._connect().execute(
+            "SELECT content FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, row[0])
+        return row[0]
+
+    def put(self, key: str, model: str, content: str) -> None:
+        with self._lock:
+            self._remember(key, content)
+            self._writes += 1
+            prune = self._writes % 100 == 0
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, model, content, created_at) VALUES (?, ?, ?, ?)",
+            (key, model, content, time.time())
+        )
+        if prune:
+            conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.disk_max_entries,)
+            )
+
+    def replay(self, content: str) -> CachedStream:
+        return CachedStream(content)
+
+    def record(self, key: str, model: str, stream: Iterable[Any]) -> RecordingStream:
+        return RecordingStream(stream, lambda content: self.put(key, model, content))
+
+    def _remember(self, key: str, content: str) -> None:
+        # Called with the lock held
+        self._memory[key] = content
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+def get_response_cache() -> ResponseCache:
+    """Return the response cache shared by all sessions of this process."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
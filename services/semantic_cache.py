@@ -0,0 +1,268 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; without it the semantic cache is disabled
+    np = None
+
+from config.settings import (
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_DIR,
+    SEMANTIC_CACHE_EMBED_MODEL,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_INITIAL_ENTRIES
+)
+from services.ollama_client import get_ollama_client
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS namespaces (
+    name TEXT PRIMARY KEY,
+    file TEXT NOT NULL,
+    dim INTEGER NOT NULL,
+    capacity INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    slot INTEGER NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (namespace, slot)
+);
+"""
+
+@dataclass
+class SemanticMatch:
+    """A cached answer to a similar question."""
+    question: str
+    answer: str
+    score: float
+
+def is_available() -> bool:
+    return SEMANTIC_CACHE_ENABLED and np is not None
+
+def _normalize(vector: Sequence[float]) -> "np.ndarray":
+    array = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(array))
+    return array / norm if norm else array
+
+class SemanticIndex:
+    """
+    Question embeddings of one namespace in a memory-mapped matrix.
+
+    Rows are unit vectors, so cosine similarity is a single matrix-vector
+    product. The file starts with room for SEMANTIC_CACHE_INITIAL_ENTRIES
+    rows and doubles when full, up to capacity; from then on the least
+    recently used row is overwritten.
+    """
+
+    def __init__(self, path: str, dim: int, capacity: int, count: int = 0,
+                 last_used: Optional["np.ndarray"] = None):
+        self.path = path
+        self.dim = dim
+        self.capacity = capacity
+        self.count = count
+        self.last_used = last_used if last_used is not None else np.zeros(capacity)
+        if os.path.exists(path):
+            rows = os.path.getsize(path) // (dim * np.dtype(np.float32).itemsize)
+            self.vectors = self._map("r+", max(rows, count, 1))
+        else:
+            self.vectors = self._map("w+", max(min(SEMANTIC_CACHE_INITIAL_ENTRIES, capacity), count, 1))
+
+    def search(self, vector: "np.ndarray") -> Optional[tuple]:
+        """Return (slot, score) of the most similar row, or None if the index is empty."""
+        if not self.count:
+            return None
+        scores = self.vectors[:self.count] @ vector
+        slot = int(np.argmax(scores))
+        return slot, float(scores[slot])
+
+    def next_slot(self) -> int:
+        if self.count < self.capacity:
+            if self.count == len(self.vectors):
+                self._grow()
+            self.count += 1
+            return self.count - 1
+        return int(np.argmin(self.last_used))
+
+    def _map(self, mode: str, rows: int) -> "np.memmap":
+        # In r+ mode numpy extends the file when the shape is larger than it
+        return np.memmap(self.path, dtype=np.float32, mode=mode, shape=(rows, self.dim))
+
+    def _grow(self) -> None:
+        self.vectors.flush()
+        rows = min(2 * len(self.vectors), self.capacity)
+        self.vectors = self._map("r+", rows)
+
+    def write(self, slot: int, vector: "np.ndarray", now: float) -> None:
+        self.vectors[slot] = vector
+        self.last_used[slot] = now
+
+class SemanticCache:
+    """
+    Serves stored answers to questions similar to earlier ones.
+
+    The last user turn is embedded with a local Ollama embedding model and
+    compared against the questions answered before. Answers are namespaced
+    by chat model and embedding model; entries and their last use are kept in
+    SQLite next to one memory-mapped vector file per namespace.
+    """
+
+    def __init__(
+        self,
+        directory: str = SEMANTIC_CACHE_DIR,
+        embed_model: str = SEMANTIC_CACHE_EMBED_MODEL,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        capacity: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        embed_fn: Optional[Callable[[str, str], Sequence[float]]] = None
+    ):
+        self.directory = directory
+        self.embed_model = embed_model
+        self.threshold = threshold
+        self.capacity = capacity
+        self._embed_fn = embed_fn or (
+            lambda model, text: get_ollama_client().embed(model=model, input=text)["embeddings"][0]
+        )
+        self._indexes: Dict[str, SemanticIndex] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.directory, "entries.db"), timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def namespace(self, model: str) -> str:
+        return f"{model}|{self.embed_model}"
+
+    def embed(self, text: str) -> "np.ndarray":
+        """Embed a question as a unit vector."""
+        return _normalize(self._embed_fn(self.embed_model, text))
+
+    def lookup(self, model: str, vector: "np.ndarray") -> Optional[SemanticMatch]:
+        """
+        Find the stored answer to the most similar question.
+
+        Args:
+            model: Chat model the answer must come from
+            vector: Embedding of the question (see embed)
+
+        Returns:
+            SemanticMatch if the best score reaches the threshold, else None
+        """
+        namespace = self.namespace(model)
+        with self._lock:
+            index = self._index(namespace, len(vector), create=False)
+            best = index.search(vector) if index is not None else None
+            if best is None or best[1] < self.threshold:
+                self.misses += 1
+                return None
+            slot, score = best
+            now = time.time()
+            index.last_used[slot] = now
+            self.hits += 1
+        conn = self._connect()
+        conn.execute(
+            "UPDATE entries SET last_used = ? WHERE namespace = ? AND slot = ?",
+            (now, namespace, slot)
+        )
+        row = conn.execute(
+            "SELECT question, answer FROM entries WHERE namespace = ? AND slot = ?",
+            (namespace, slot)
+        ).fetchone()
+        if row is None:
+            return None
+        return SemanticMatch(question=row[0], answer=row[1], score=score)
+
+    def add(self, model: str, question: str, vector: "np.ndarray", answer: str) -> None:
+        """Store the answer to a question, evicting the least recently used entry if full."""
+        self.add_many(model, [question], [vector], [answer])
+
+    def add_many(self, model: str, questions: List[str], vectors: Sequence["np.ndarray"],
+                 answers: List[str]) -> None:
+        """Store several answers in one transaction."""
+        if not questions:
+            return
+        namespace = self.namespace(model)
+        now = time.time()
+        rows = []
+        with self._lock:
+            index = self._index(namespace, len(vectors[0]), create=True)
+            for question, vector, answer in zip(questions, vectors, answers):
+                slot = index.next_slot()
+                index.write(slot, vector, now)
+                rows.append((namespace, slot, question, answer, now))
+            index.vectors.flush()
+        conn = self._connect()
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT OR REPLACE INTO entries (namespace, slot, question, answer, last_used) "
+            "VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        conn.execute("COMMIT")
+
+    def _index(self, namespace: str, dim: int, create: bool) -> Optional[SemanticIndex]:
+        # Called with the lock held
+        index = self._indexes.get(namespace)
+        if index is not None and index.dim == dim:
+            return index
+
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT file, dim, capacity FROM namespaces WHERE name = ?", (namespace,)
+        ).fetchone()
+        if row is not None and row[1] == dim:
+            file, _, capacity = row
+            last_used = np.zeros(capacity)
+            count = 0
+            for slot, used in conn.execute(
+                "SELECT slot, last_used FROM entries WHERE namespace = ?", (namespace,)
+            ):
+                last_used[slot] = used
+                count = max(count, slot + 1)
+            index = SemanticIndex(os.path.join(self.directory, file), dim, capacity, count, last_used)
+        elif create:
+            # New namespace, or the embedding size changed: start from scratch
+            file = hashlib.sha1(namespace.encode("utf-8")).hexdigest()[:16] + ".f32"
+            path = os.path.join(self.directory, file)
+            if os.path.exists(path):
+                os.remove(path)
+            conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+            conn.execute(
+                "INSERT OR REPLACE INTO namespaces (name, file, dim, capacity) VALUES (?, ?, ?, ?)",
+                (namespace, file, dim, self.capacity)
+            )
+            index = SemanticIndex(path, dim, self.capacity)
+        else:
+            return None
+        self._indexes[namespace] = index
+        return index
+
+_cache: Optional[SemanticCache] = None
+_cache_lock = threading.Lock()
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """Return the semantic cache shared by the process, or None if it is disabled."""
+    global _cache
+    if not is_available():
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SemanticCache()
+        return _cache
@@ -0,0 +1,477 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from typing import List, Dict, Any, Optional, Tuple, Callable
+
+from services import journal_store
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    last_updated TEXT NOT NULL,
+    message_count INTEGER NOT NULL,
+    last_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_updated
+    ON conversations (last_updated DESC, id DESC);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    conversation_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    UNIQUE (conversation_id, position)
+);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3 4'
+);
+"""
+
+# Versión del índice de búsqueda; si cambia, se reconstruye al abrir la base de datos
+FTS_VERSION = "1"
+
+# Longitud mínima de la última palabra para buscarla como prefijo
+MIN_PREFIX_LENGTH = 2
+
+# Coincidencias más recientes que se puntúan por consulta
+SEARCH_CANDIDATE_LIMIT = 5000
+
+# Palabras alrededor de la primera coincidencia que se muestran en el fragmento
+SNIPPET_WORDS = 16
+
+# Marcadores de resaltado en los fragmentos (negrita en Markdown)
+SNIPPET_START = "**"
+SNIPPET_END = "**"
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def searchable_text(message: Dict[str, Any]) -> str:
+    """Texto de un mensaje que se indexa para la búsqueda."""
+    content = message.get("content", "")
+    if isinstance(content, dict):
+        content = content.get("content") or ""
+    return content if isinstance(content, str) else str(content)
+
+
+def _fold(text: str) -> str:
+    """Minúsculas y sin diacríticos, como el tokenizador unicode61."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def make_snippet(text: str, terms: List[str]) -> str:
+    """
+    Extrae un fragmento del texto alrededor de la primera coincidencia y
+    resalta las palabras buscadas (la última se compara como prefijo).
+    """
+    words = list(_WORD_RE.finditer(text))
+    if not words or not terms:
+        return text[:200]
+
+    exact, last = set(terms[:-1]), terms[-1]
+
+    def matches(word: str) -> bool:
+        folded = _fold(word)
+        return folded in exact or folded.startswith(last)
+
+    hits = [i for i, w in enumerate(words) if matches(w.group())]
+    first = hits[0] if hits else 0
+    lo = max(0, first - SNIPPET_WORDS // 2)
+    hi = min(len(words), lo + SNIPPET_WORDS)
+
+    parts = ["…" if lo > 0 else ""]
+    cursor = words[lo].start()
+    for w in words[lo:hi]:
+        parts.append(text[cursor:w.start()])
+        if matches(w.group()):
+            parts.append(f"{SNIPPET_START}{w.group()}{SNIPPET_END}")
+        else:
+            parts.append(w.group())
+        cursor = w.end()
+    if hi < len(words):
+        parts.append("…")
+    return " ".join("".join(parts).split())
+
+
+def build_match_query(query: str) -> str:
+    """
+    Convierte lo que escribe el usuario en una consulta FTS5 segura.
+
+    Cada palabra se cita para que los operadores de FTS5 no se interpreten y
+    la última se trata como prefijo, de modo que la búsqueda funcione
+    mientras se escribe.
+    """
+    terms = [t.replace('"', '""') for t in query.split()]
+    if not terms:
+        return ""
+    quoted = [f'"{t}"' for t in terms]
+    if len(terms[-1]) >= MIN_PREFIX_LENGTH:
+        quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def encode_cursor(last_updated: str, conversation_id: str) -> str:
+    """Codifica la posición de la última fila de una página."""
+    return f"{last_updated}|{conversation_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Inverso de encode_cursor."""
+    last_updated, _, conversation_id = cursor.rpartition("|")
+    return last_updated, conversation_id
+
+
+class SQLiteConversationStore:
+    """
+    Almacén de conversaciones en SQLite (modo WAL).
+
+    Los metadatos de cada conversación viven en una tabla indexada por fecha,
+    de modo que listar no requiere leer los mensajes. Cada hilo usa su propia
+    conexión.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        if self.get_meta("fts_version") != FTS_VERSION:
+            self.rebuild_search_index()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def save(self, conversation_id: str, name: str, last_updated: str,
+             messages: List[Dict[str, Any]]) -> None:
+        """
+        Guarda una conversación insertando solo los mensajes nuevos.
+
+        Si la lista ya no extiende lo guardado, se reemplazan todos sus mensajes.
+        """
+        conn = self._connect()
+        count = len(messages)
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT message_count, last_hash FROM conversations WHERE id = ?",
+                    (conversation_id,)
+                ).fetchone()
+                stored_count, stored_hash = row if row else (0, None)
+
+                diverged = count < stored_count or (
+                    stored_count > 0
+                    and journal_store.message_hash(messages[stored_count - 1]) != stored_hash
+                )
+                if diverged:
+                    self._delete_messages(conn, conversation_id)
+                    stored_count = 0
+
+                self._insert_messages(conn, conversation_id, stored_count, messages[stored_count:])
+
+                conn.execute(
+                    """
+                    INSERT INTO conversations (id, name, last_updated, message_count, last_hash)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET
+                        name = excluded.name,
+                        last_updated = excluded.last_updated,
+                        message_count = excluded.message_count,
+                        last_hash = excluded.last_hash
+                    """,
+                    (
+                        conversation_id, name, last_updated, count,
+                        journal_store.message_hash(messages[-1]) if messages else None,
+                    )
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _insert_messages(self, conn: sqlite3.Connection, conversation_id: str,
+                         start: int, messages: List[Dict[str, Any]]) -> None:
+        # El índice de búsqueda se actualiza solo con los mensajes nuevos
+        for i, msg in enumerate(messages):
+            rowid = conn.execute(
+                "INSERT INTO messages (conversation_id, position, data) VALUES (?, ?, ?)",
+                (conversation_id, start + i, json.dumps(msg, ensure_ascii=False))
+            ).lastrowid
+            conn.execute(
+                "INSERT INTO messages_fts (rowid, content) VALUES (?, ?)",
+                (rowid, searchable_text(msg))
+            )
+
+    def _delete_messages(self, conn: sqlite3.Connection, conversation_id: str) -> None:
+        conn.execute(
+            "DELETE FROM messages_fts WHERE rowid IN "
+            "(SELECT id FROM messages WHERE conversation_id = ?)",
+            (conversation_id,)
+        )
+        conn.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+
+    def rebuild_search_index(self) -> None:
+        """Reconstruye el índice de búsqueda a partir de todos los mensajes."""
+        conn = self._connect()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM messages_fts")
+                rows = conn.execute("SELECT id, data FROM messages").fetchall()
+                conn.executemany(
+                    "INSERT INTO messages_fts (rowid, content) VALUES (?, ?)",
+                    [(rowid, searchable_text(json.loads(data))) for rowid, data in rows]
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO store_meta (key, value) VALUES ('fts_version', ?)",
+                    (FTS_VERSION,)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def exists(self, conversation_id: str) -> bool:
+        row = self._connect().execute(
+            "SELECT 1 FROM conversations WHERE id = ?", (conversation_id,)
+        ).fetchone()
+        return row is not None
+
+    def load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Devuelve la conversación con sus mensajes, o None si no existe."""
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT id, name, last_updated FROM conversations WHERE id = ?",
+            (conversation_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        messages = [
+            json.loads(data) for (data,) in conn.execute(
+                "SELECT data FROM messages WHERE conversation_id = ? ORDER BY position",
+                (conversation_id,)
+            )
+        ]
+        return {"id": row[0], "name": row[1], "last_updated": row[2], "messages": messages}
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Busca mensajes que coincidan con la consulta, ordenados por relevancia (BM25).
+
+        Solo se puntúan las SEARCH_CANDIDATE_LIMIT coincidencias más recientes:
+        FTS5 las recorre por rowid y se detiene, así que el coste no crece con
+        términos que aparecen en casi todos los mensajes.
+
+        Returns:
+            Lista de resultados con id y nombre de la conversación, posición del
+            mensaje, rol y un fragmento con las coincidencias resaltadas.
+        """
+        match = build_match_query(query)
+        if not match:
+            return []
+        rows = self._connect().execute(
+            """
+            SELECT m.conversation_id, c.name, c.last_updated, m.position, m.data
+            FROM (
+                SELECT rowid, bm25(messages_fts) AS score
+                FROM messages_fts
+                WHERE messages_fts MATCH ?
+                ORDER BY rowid DESC
+                LIMIT ?
+            ) AS hits
+            JOIN messages m ON m.id = hits.rowid
+            JOIN conversations c ON c.id = m.conversation_id
+            ORDER BY hits.score
+            LIMIT ?
+            """,
+            (match, SEARCH_CANDIDATE_LIMIT, limit)
+        ).fetchall()
+
+        terms = [_fold(t) for t in query.split()]
+        results = []
+        for conversation_id, name, last_updated, position, data in rows:
+            message = json.loads(data)
+            results.append({
+                "id": conversation_id,
+                "name": name,
+                "last_updated": last_updated,
+                "position": position,
+                "role": message.get("role", ""),
+                "snippet": make_snippet(searchable_text(message), terms),
+            })
+        return results
+
+    def list_page(self, limit: Optional[int] = None,
+                  cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Lista metadatos de conversaciones, de la más reciente a la más antigua.
+
+        Args:
+            limit: Tamaño de página, o None para todas.
+            cursor: Cursor devuelto por la página anterior.
+
+        Returns:
+            Tupla (conversaciones, cursor de la página siguiente o None).
+        """
+        conn = self._connect()
+        query = "SELECT id, name, last_updated, message_count FROM conversations"
+        params: List[Any] = []
+        if cursor:
+            query += " WHERE (last_updated, id) < (?, ?)"
+            params.extend(decode_cursor(cursor))
+        query += " ORDER BY last_updated DESC, id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit + 1)
+
+        rows = conn.execute(query, params).fetchall()
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][2], rows[-1][0])
+
+        conversations = [
+            {"id": r[0], "name": r[1], "last_updated": r[2], "message_count": r[3]}
+            for r in rows
+        ]
+        return conversations, next_cursor
+
+    def list_stale(self, before: str) -> List[Dict[str, Any]]:
+        """Metadatos de las conversaciones cuya última modificación es anterior a before."""
+        rows = self._connect().execute(
+            "SELECT id, name, last_updated, message_count FROM conversations"
+            " WHERE last_updated < ? ORDER BY last_updated",
+            (before,)
+        ).fetchall()
+        return [
+            {"id": r[0], "name": r[1], "last_updated": r[2], "message_count": r[3]}
+            for r in rows
+        ]
+
+    def delete(self, conversation_id: str, last_updated: Optional[str] = None) -> bool:
+        """
+        Elimina una conversación; devuelve False si no existía.
+
+        Si se indica last_updated, solo se elimina si no se modificó desde entonces.
+        """
+        conn = self._connect()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if last_updated is not None:
+                    row = conn.execute(
+                        "SELECT last_updated FROM conversations WHERE id = ?", (conversation_id,)
+                    ).fetchone()
+                    if row is None or row[0] != last_updated:
+                        conn.execute("ROLLBACK")
+                        return False
+                self._delete_messages(conn, conversation_id)
+                deleted = conn.execute(
+                    "DELETE FROM conversations WHERE id = ?", (conversation_id,)
+                ).rowcount
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return deleted > 0
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT value FROM store_meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._write_lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)", (key, value)
+            )
+
+    def migrate_messages(self, transform: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]) -> int:
+        """
+        Reescribe los mensajes de todas las conversaciones aplicando una transformación.
+
+        Se usa para actualizar el esquema de los mensajes; el índice de búsqueda
+        se actualiza junto con las filas.
+
+        Returns:
+            Número de conversaciones modificadas.
+        """
+        conn = self._connect()
+        ids = [row[0] for row in conn.execute("SELECT id FROM conversations")]
+        changed = 0
+        for conversation_id in ids:
+            data = self.load(conversation_id)
+            messages = transform(data["messages"])
+            if messages != data["messages"]:
+                self.save(conversation_id, data["name"], data["last_updated"], messages)
+                changed += 1
+        return changed
+
+    def import_directory(
+        self,
+        directory: str,
+        transform: Optional[Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]] = None
+    ) -> int:
+        """
+        Importa los archivos conversation_*.json y conversation_*.jsonl de un directorio.
+
+        Las conversaciones que ya existen en la base de datos no se tocan y los
+        archivos originales se conservan. Si se indica, transform se aplica a
+        los mensajes antes de guardarlos.
+
+        Returns:
+            Número de conversaciones importadas.
+        """
+        if not os.path.isdir(directory):
+            return 0
+
+        imported = 0
+        for filename in sorted(os.listdir(directory)):
+            if not filename.startswith("conversation_"):
+                continue
+            path = os.path.join(directory, filename)
+            try:
+                if filename.endswith(".jsonl"):
+                    data = journal_store.replay(path)
+                elif filename.endswith(".json"):
+                    with open(path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                else:
+                    continue
+                if not data:
+                    continue
+                conversation_id = data.get("id") or filename[len("conversation_"):].rsplit(".", 1)[0]
+                if self.exists(conversation_id):
+                    continue
+                messages = data.get("messages", [])
+                self.save(
+                    conversation_id,
+                    data.get("name", "(unnamed)"),
+                    data.get("last_updated", ""),
+                    transform(messages) if transform else messages
+                )
+                imported += 1
+            except Exception as e:
+                print(f"Error importing {filename}: {e}")
+        return imported
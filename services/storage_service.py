@@ -1,27 +1,132 @@
 import json
 import os
-from typing import List, Dict, Any
-from datetime import datetime
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime, timedelta
 import streamlit as st
+from config.settings import (
+    STORAGE_BACKEND, SQLITE_DB_FILENAME,
+    ARCHIVE_ENABLED, ARCHIVE_AFTER_DAYS, ARCHIVE_DIRNAME, ARCHIVE_BATCH_SIZE
+)
+from services import journal_store
+from services.archive_store import ArchiveStore
+from services.sqlite_store import SQLiteConversationStore, encode_cursor
+from utils.messages import MESSAGE_SCHEMA_VERSION, upgrade_message, upgrade_messages
 
 # Directorio para almacenar el historial de conversaciones
 STORAGE_DIR = "conversation_history"
 
+_sqlite_store: Optional[SQLiteConversationStore] = None
+_sqlite_lock = threading.Lock()
+
+_archive_store: Optional[ArchiveStore] = None
+_archive_lock = threading.Lock()
+
 def ensure_storage_dir():
     """Asegura que exista el directorio de almacenamiento"""
     os.makedirs(STORAGE_DIR, exist_ok=True)
 
+def get_sqlite_store() -> SQLiteConversationStore:
+    """
+    Devuelve el almacén SQLite compartido por el proceso.
+
+    La primera vez que se crea la base de datos se importan una sola vez las
+    conversaciones existentes en STORAGE_DIR (.json y .jsonl). Los mensajes
+    guardados con un esquema anterior se actualizan al abrirla.
+    """
+    global _sqlite_store
+    with _sqlite_lock:
+        if _sqlite_store is None:
+            ensure_storage_dir()
+            store = SQLiteConversationStore(os.path.join(STORAGE_DIR, SQLITE_DB_FILENAME))
+            if store.get_meta("json_import") is None:
+                imported = store.import_directory(STORAGE_DIR, transform=upgrade_messages)
+                store.set_meta("json_import", datetime.now().isoformat())
+                if imported:
+                    print(f"Imported {imported} conversations into {store.db_path}")
+            if store.get_meta("message_schema") != str(MESSAGE_SCHEMA_VERSION):
+                upgraded = store.migrate_messages(upgrade_messages)
+                store.set_meta("message_schema", str(MESSAGE_SCHEMA_VERSION))
+                if upgraded:
+                    print(f"Upgraded {upgraded} conversations to message schema {MESSAGE_SCHEMA_VERSION}")
+            _sqlite_store = store
+        return _sqlite_store
+
+def get_archive_store() -> Optional[ArchiveStore]:
+    """
+    Devuelve el archivo de conversaciones frías, o None si está deshabilitado.
+
+    Aunque ARCHIVE_ENABLED sea False, si ya existe un archivo se sigue
+    abriendo para que sus conversaciones se puedan leer y restaurar.
+    """
+    global _archive_store
+    with _archive_lock:
+        if _archive_store is None:
+            directory = os.path.join(STORAGE_DIR, ARCHIVE_DIRNAME)
+            if not ARCHIVE_ENABLED and not os.path.isdir(directory):
+                return None
+            _archive_store = ArchiveStore(directory)
+        return _archive_store
+
+def _use_sqlite() -> bool:
+    return STORAGE_BACKEND == "sqlite"
+
 def get_conversation_filename(conversation_id: str) -> str:
-    """Obtiene la ruta completa para el archivo de una conversación"""
+    """Obtiene la ruta completa para el journal de una conversación"""
+    return os.path.join(STORAGE_DIR, f"conversation_{conversation_id}.jsonl")
+
+def get_legacy_filename(conversation_id: str) -> str:
+    """Obtiene la ruta del antiguo archivo .json de una conversación"""
     return os.path.join(STORAGE_DIR, f"conversation_{conversation_id}.json")
 
-def save_conversation(conversation_id: str, messages: List[Dict[str, Any]]) -> bool:
+def serialize_message(msg: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convierte un mensaje de la sesión al formato persistido.
+
+    El contenido, el pensamiento y los metadatos se guardan en campos separados
+    (esquema MESSAGE_SCHEMA_VERSION); el pensamiento ya no se mezcla en el
+    contenido como <think>...</think>.
+    """
+    return upgrade_message(msg)
+
+def _read_legacy(conversation_id: str) -> Optional[Dict[str, Any]]:
+    """Lee un archivo .json antiguo, o None si no existe."""
+    filename = get_legacy_filename(conversation_id)
+    if not os.path.exists(filename):
+        return None
+    with open(filename, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _migrate_legacy(conversation_id: str, data: Dict[str, Any]) -> None:
+    """Convierte un archivo .json antiguo en journal y elimina el original."""
+    data["messages"] = upgrade_messages(data.get("messages", []))
+    journal_store.compact(
+        get_conversation_filename(conversation_id),
+        conversation_id,
+        data.get("name", "(unnamed)"),
+        data.get("last_updated", datetime.now().isoformat()),
+        data["messages"],
+        MESSAGE_SCHEMA_VERSION
+    )
+    os.remove(get_legacy_filename(conversation_id))
+
+def save_conversation(
+    conversation_id: str,
+    messages: List[Dict[str, Any]],
+    name: Optional[str] = None
+) -> bool:
     """
-    Guarda el historial de una conversación en un archivo JSON.
+    Guarda el historial de una conversación en el backend configurado.
+
+    Solo se añaden los mensajes nuevos desde el último guardado, ya sea como
+    filas en SQLite o como líneas del journal JSONL (que se compacta
+    periódicamente).
     
     Args:
         conversation_id: Identificador único de la conversación.
         messages: Lista de diccionarios de mensajes.
+        name: Nombre de la conversación; por defecto se toma de session_state
+            (debe indicarse al guardar desde un hilo en segundo plano).
         
     Returns:
         True si se guarda correctamente, False en caso contrario.
@@ -29,37 +134,50 @@ def save_conversation(conversation_id: str, messages: List[Dict[str, Any]]) -> b
     ensure_storage_dir()
     
     try:
-        # Crear una copia de los mensajes para no modificar el original
-        messages_copy = []
-        for msg in messages:
-            msg_copy = msg.copy()
-            if isinstance(msg_copy.get("content"), dict):
-                thinking = msg_copy["content"].get("thinking")
-                content = msg_copy["content"].get("content")
-                if thinking:
-                    msg_copy["content"] = f"<think>{thinking}</think>\n\n{content}"
-                else:
-                    msg_copy["content"] = content
-            messages_copy.append(msg_copy)
+        if name is None:
+            name = st.session_state.get("conversation_name", "(unnamed)")
+        serialized = [serialize_message(msg) for msg in messages]
+        
+        if _use_sqlite():
+            get_sqlite_store().save(conversation_id, name, datetime.now().isoformat(), serialized)
+            _unarchive(conversation_id)
+            return True
         
-        # Agregar metadatos, incluyendo el nombre de la conversación
-        conversation_data = {
-            "id": conversation_id,
-            "last_updated": datetime.now().isoformat(),
-            "name": st.session_state.get("conversation_name", "(unnamed)"),
-            "messages": messages_copy
-        }
+        path = get_conversation_filename(conversation_id)
+        if not os.path.exists(path):
+            legacy = _read_legacy(conversation_id)
+            if legacy is not None:
+                _migrate_legacy(conversation_id, legacy)
         
-        with open(get_conversation_filename(conversation_id), 'w', encoding='utf-8') as f:
-            json.dump(conversation_data, f, ensure_ascii=False, indent=2)
+        journal_store.append(
+            path,
+            conversation_id,
+            name,
+            datetime.now().isoformat(),
+            serialized,
+            MESSAGE_SCHEMA_VERSION
+        )
+        _unarchive(conversation_id)
         return True
     except Exception as e:
         print(f"Error saving conversation: {e}")
         return False
 
+def _unarchive(conversation_id: str) -> None:
+    """Quita del archivo una conversación que vuelve a estar en el almacén activo."""
+    archive = get_archive_store()
+    # Comprobar primero con una lectura evita una transacción de escritura en cada guardado
+    if archive is not None and archive.contains(conversation_id):
+        archive.remove(conversation_id)
+
 def load_conversation(conversation_id: str) -> List[Dict[str, Any]]:
     """
-    Carga el historial de una conversación desde un archivo JSON.
+    Carga el historial de una conversación desde el backend configurado.
+
+    Con el backend JSONL se reproduce el journal; los archivos .json antiguos
+    se migran al formato journal al cargarlos. Si la conversación no está en
+    el almacén activo se lee del archivo sin restaurarla; pasa al almacén
+    activo la próxima vez que se guarde.
     
     Args:
         conversation_id: Identificador único de la conversación.
@@ -67,14 +185,17 @@ def load_conversation(conversation_id: str) -> List[Dict[str, Any]]:
     Returns:
         Lista de diccionarios de mensajes o lista vacía si no existe.
     """
-    filename = get_conversation_filename(conversation_id)
-    
-    if not os.path.exists(filename):
-        return []
-    
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            conversation_data = json.load(f)
+        if _use_sqlite():
+            conversation_data = get_sqlite_store().load(conversation_id)
+        else:
+            conversation_data = _load_journal(conversation_id)
+        if conversation_data is None:
+            archive = get_archive_store()
+            if archive is not None:
+                conversation_data = archive.load(conversation_id)
+        if conversation_data is None:
+            return []
         # Actualiza el nombre de conversación en session_state
         st.session_state["conversation_name"] = conversation_data.get("name", "(unnamed)")
         return conversation_data.get("messages", [])
@@ -82,6 +203,30 @@ def load_conversation(conversation_id: str) -> List[Dict[str, Any]]:
         print(f"Error loading conversation: {e}")
         return []
 
+def _load_journal(conversation_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Reproduce el journal de una conversación, migrando el .json antiguo si hace
+    falta. Los journals con un esquema de mensajes anterior se actualizan y
+    se compactan.
+    """
+    path = get_conversation_filename(conversation_id)
+    conversation_data = journal_store.replay(path)
+    if conversation_data is None:
+        conversation_data = _read_legacy(conversation_id)
+        if conversation_data is not None:
+            _migrate_legacy(conversation_id, conversation_data)
+    elif conversation_data["schema_version"] < MESSAGE_SCHEMA_VERSION:
+        conversation_data["messages"] = upgrade_messages(conversation_data["messages"])
+        journal_store.compact(
+            path,
+            conversation_id,
+            conversation_data["name"],
+            conversation_data["last_updated"],
+            conversation_data["messages"],
+            MESSAGE_SCHEMA_VERSION
+        )
+    return conversation_data
+
 def list_conversations() -> List[Dict[str, Any]]:
     """
     Lista todas las conversaciones guardadas con sus metadatos.
@@ -89,13 +234,83 @@ def list_conversations() -> List[Dict[str, Any]]:
     Returns:
         Lista de diccionarios con la información de cada conversación.
     """
+    conversations, _ = list_conversations_page()
+    return conversations
+
+def list_conversations_page(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Lista una página de conversaciones, de la más reciente a la más antigua.
+
+    Con SQLite se usa el índice de metadatos y un cursor (fecha, id); con el
+    backend JSONL el cursor es un desplazamiento sobre la lista completa. Las
+    conversaciones archivadas se mezclan en orden y llevan "archived": True.
+    
+    Args:
+        limit: Tamaño de página, o None para todas.
+        cursor: Cursor devuelto por la página anterior.
+        
+    Returns:
+        Tupla (conversaciones, cursor de la página siguiente o None).
+    """
+    archive = get_archive_store()
+    if _use_sqlite():
+        try:
+            conversations, next_cursor = get_sqlite_store().list_page(limit, cursor)
+            if archive is None:
+                return conversations, next_cursor
+            archived, archived_next = archive.list_page(limit, cursor)
+            merged = _merge_listings(conversations, archived)
+            if limit is None or len(merged) <= limit:
+                return merged, next_cursor or archived_next
+            merged = merged[:limit]
+            return merged, encode_cursor(merged[-1]["last_updated"], merged[-1]["id"])
+        except Exception as e:
+            print(f"Error listing conversations: {e}")
+            return [], None
+    
+    conversations = _list_journals()
+    if archive is not None:
+        conversations = _merge_listings(conversations, archive.list_page()[0])
+    start = int(cursor) if cursor else 0
+    if limit is None:
+        return conversations[start:], None
+    end = start + limit
+    next_cursor = str(end) if end < len(conversations) else None
+    return conversations[start:end], next_cursor
+
+def _merge_listings(live: List[Dict[str, Any]],
+                    archived: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Mezcla conversaciones activas y archivadas de la más reciente a la más
+    antigua. Si una está en ambos sitios (un archivado interrumpido) se
+    muestra la activa.
+    """
+    live_ids = {conv["id"] for conv in live}
+    merged = live + [conv for conv in archived if conv["id"] not in live_ids]
+    merged.sort(key=lambda c: (c.get("last_updated", ""), c.get("id", "")), reverse=True)
+    return merged
+
+def _list_journals() -> List[Dict[str, Any]]:
+    """Lista los journals (y .json antiguos) leyendo solo su último registro de metadatos."""
     ensure_storage_dir()
     conversations = []
     
     for filename in os.listdir(STORAGE_DIR):
-        if filename.startswith("conversation_") and filename.endswith(".json"):
-            try:
-                with open(os.path.join(STORAGE_DIR, filename), 'r', encoding='utf-8') as f:
+        if not filename.startswith("conversation_"):
+            continue
+        path = os.path.join(STORAGE_DIR, filename)
+        try:
+            if filename.endswith(".jsonl"):
+                metadata = journal_store.read_metadata(path)
+                if metadata is None:
+                    continue
+                metadata["filename"] = filename
+                conversations.append(metadata)
+            elif filename.endswith(".json"):
+                with open(path, 'r', encoding='utf-8') as f:
                     data = json.load(f)
                     conversations.append({
                         "id": data.get("id", "unknown"),
@@ -104,12 +319,34 @@ def list_conversations() -> List[Dict[str, Any]]:
                         "message_count": len(data.get("messages", [])),
                         "filename": filename
                     })
-            except Exception as e:
-                print(f"Error reading {filename}: {e}")
+        except Exception as e:
+            print(f"Error reading {filename}: {e}")
     
     conversations.sort(key=lambda x: x.get("last_updated", ""), reverse=True)
     return conversations
 
+def search_conversations(query: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Busca mensajes en las conversaciones guardadas usando el índice de texto completo.
+
+    Solo está disponible con el backend SQLite; con JSONL devuelve una lista
+    vacía. Las conversaciones archivadas no se indexan.
+    
+    Args:
+        query: Texto a buscar.
+        limit: Número máximo de resultados.
+        
+    Returns:
+        Lista de coincidencias ordenadas por relevancia.
+    """
+    if not _use_sqlite():
+        return []
+    try:
+        return get_sqlite_store().search(query, limit)
+    except Exception as e:
+        print(f"Error searching conversations: {e}")
+        return []
+
 def delete_conversation(conversation_id: str) -> bool:
     """
     Elimina una conversación guardada.
@@ -120,14 +357,110 @@ def delete_conversation(conversation_id: str) -> bool:
     Returns:
         True si se eliminó correctamente, False en caso contrario.
     """
-    filename = get_conversation_filename(conversation_id)
+    try:
+        archive = get_archive_store()
+        archived = archive.remove(conversation_id) if archive is not None else False
+    except Exception as e:
+        print(f"Error deleting archived conversation: {e}")
+        archived = False
     
-    if not os.path.exists(filename):
-        return False
+    if _use_sqlite():
+        try:
+            return get_sqlite_store().delete(conversation_id) or archived
+        except Exception as e:
+            print(f"Error deleting conversation: {e}")
+            return False
+    
+    filenames = [
+        f for f in (get_conversation_filename(conversation_id), get_legacy_filename(conversation_id))
+        if os.path.exists(f)
+    ]
+    
+    if not filenames:
+        return archived
     
     try:
-        os.remove(filename)
+        for filename in filenames:
+            os.remove(filename)
+        journal_store.forget(get_conversation_filename(conversation_id))
         return True
     except Exception as e:
         print(f"Error deleting conversation: {e}")
         return False
+
+def archive_stale_conversations(days: float = ARCHIVE_AFTER_DAYS) -> int:
+    """
+    Mueve al archivo las conversaciones sin modificar desde hace más de days días.
+
+    Cada lote se escribe en el pack y se indexa antes de borrar los
+    originales, y una conversación solo se borra si no se guardó mientras
+    tanto (en ese caso se retira del archivo), así que un corte o un guardado
+    concurrente nunca pierden mensajes.
+    
+    Args:
+        days: Antigüedad mínima de la última modificación.
+        
+    Returns:
+        Número de conversaciones archivadas.
+    """
+    archive = get_archive_store()
+    if archive is None:
+        return 0
+    cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+    
+    if _use_sqlite():
+        store = get_sqlite_store()
+        candidates = store.list_stale(cutoff)
+        load = store.load
+        remove = lambda cid, last_updated: store.delete(cid, last_updated)
+    else:
+        # Las fechas desconocidas ("unknown") nunca se consideran antiguas
+        candidates = [c for c in _list_journals() if c.get("last_updated", "") < cutoff]
+        load = _load_journal
+        remove = lambda cid, last_updated: journal_store.remove_if_unchanged(
+            get_conversation_filename(cid), last_updated
+        )
+    
+    archived = 0
+    for start in range(0, len(candidates), ARCHIVE_BATCH_SIZE):
+        batch = []
+        for conv in candidates[start:start + ARCHIVE_BATCH_SIZE]:
+            data = load(conv["id"])
+            if data is not None:
+                batch.append({
+                    "id": conv["id"],
+                    "name": data.get("name", "(unnamed)"),
+                    "last_updated": data["last_updated"],
+                    "messages": data.get("messages", []),
+                })
+        archive.add_many(batch)
+        for conv in batch:
+            if remove(conv["id"], conv["last_updated"]):
+                archived += 1
+            else:
+                archive.remove(conv["id"])
+    return archived
+
+def restore_conversation(conversation_id: str) -> bool:
+    """
+    Devuelve una conversación archivada al almacén activo.
+
+    Se guarda con la fecha actual para que el siguiente archivado no la
+    vuelva a mover de inmediato.
+    
+    Returns:
+        True si se restauró, False si no estaba archivada o falló el guardado.
+    """
+    archive = get_archive_store()
+    if archive is None:
+        return False
+    data = archive.load(conversation_id)
+    if data is None:
+        return False
+    # save_conversation retira la conversación del archivo tras guardarla
+    return save_conversation(conversation_id, data.get("messages", []), data.get("name", "(unnamed)"))
+
+def get_archive_stats() -> Optional[Dict[str, int]]:
+    """Espacio ocupado por el archivo (ver ArchiveStore.stats), o None si no hay archivo."""
+    archive = get_archive_store()
+    return archive.stats() if archive is not None else None
\ No newline at end of file
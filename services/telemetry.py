@@ -0,0 +1,192 @@
+"""
+Per-message generation telemetry.
+
+Combines the counters Ollama sends in the final chunk of a stream with
+timings measured by the client, and appends one JSON line per answer to
+METRICS_LOG_PATH so latency can be compared across models and releases.
+
+Usage (summary per model of the metrics log):
+    python -m services.telemetry [path]
+"""
+import json
+import os
+import statistics
+import sys
+import threading
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from config.settings import METRICS_LOG_ENABLED, METRICS_LOG_PATH
+
+@dataclass
+class GenerationTelemetry:
+    """Timings and token counts of one answer. Durations are in milliseconds."""
+    model: str
+    cached: bool = False
+    queue_wait_ms: Optional[float] = None
+    # Measured by the client from the moment the request is sent
+    ttft_ms: Optional[float] = None
+    first_visible_ms: Optional[float] = None
+    total_ms: Optional[float] = None
+    # Reported by Ollama
+    load_duration_ms: Optional[float] = None
+    prompt_eval_count: Optional[int] = None
+    prompt_eval_duration_ms: Optional[float] = None
+    eval_count: Optional[int] = None
+    eval_duration_ms: Optional[float] = None
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        if not self.eval_count or not self.eval_duration_ms:
+            return None
+        return self.eval_count / (self.eval_duration_ms / 1000)
+
+    @property
+    def prompt_tokens_per_second(self) -> Optional[float]:
+        if not self.prompt_eval_count or not self.prompt_eval_duration_ms:
+            return None
+        return self.prompt_eval_count / (self.prompt_eval_duration_ms / 1000)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["tokens_per_second"] = self.tokens_per_second
+        data["prompt_tokens_per_second"] = self.prompt_tokens_per_second
+        return data
+
+def _ns_to_ms(value: Optional[int]) -> Optional[float]:
+    return None if value is None else round(value / 1e6, 3)
+
+def _elapsed_ms(start: float, end: Optional[float]) -> Optional[float]:
+    return None if end is None else round((end - start) * 1000, 3)
+
+def build_telemetry(
+    model: str,
+    stats: Dict[str, Any],
+    submitted_at: float,
+    started_at: float,
+    timings: Dict[str, float],
+    finished_at: float,
+    cached: bool = False
+) -> GenerationTelemetry:
+    """
+    Build the telemetry of an answer.
+
+    Args:
+        model: Model that produced the answer
+        stats: Final chunk fields kept by the stream (see STREAM_STAT_FIELDS)
+        submitted_at: time.perf_counter() when the request was queued
+        started_at: time.perf_counter() when it was sent to Ollama
+        timings: First token / first visible token times recorded while consuming the stream
+        finished_at: time.perf_counter() when the stream ended
+        cached: Whether the answer was replayed from a cache
+
+    Returns:
+        GenerationTelemetry
+    """
+    return GenerationTelemetry(
+        model=model,
+        cached=cached,
+        queue_wait_ms=_elapsed_ms(submitted_at, started_at),
+        ttft_ms=_elapsed_ms(started_at, timings.get("first_token")),
+        first_visible_ms=_elapsed_ms(started_at, timings.get("first_visible")),
+        total_ms=_elapsed_ms(started_at, finished_at),
+        load_duration_ms=_ns_to_ms(stats.get("load_duration")),
+        prompt_eval_count=stats.get("prompt_eval_count"),
+        prompt_eval_duration_ms=_ns_to_ms(stats.get("prompt_eval_duration")),
+        eval_count=stats.get("eval_count"),
+        eval_duration_ms=_ns_to_ms(stats.get("eval_duration")),
+    )
+
+def format_telemetry(data: Dict[str, Any]) -> str:
+    """One-line summary of a telemetry dict (as stored in message metadata), in the chat's language."""
+    def seconds(ms: Optional[float]) -> str:
+        return f"{ms / 1000:.2f}s"
+
+    parts = []
+    if data.get("cached"):
+        parts.append("caché")
+    if data.get("queue_wait_ms") and data["queue_wait_ms"] >= 50:
+        parts.append(f"cola {seconds(data['queue_wait_ms'])}")
+    if data.get("ttft_ms") is not None:
+        parts.append(f"TTFT {seconds(data['ttft_ms'])}")
+    if data.get("first_visible_ms") is not None and data.get("first_visible_ms") != data.get("ttft_ms"):
+        parts.append(f"respuesta a los {seconds(data['first_visible_ms'])}")
+    if data.get("tokens_per_second"):
+        parts.append(f"{data['eval_count']} tok · {data['tokens_per_second']:.1f} tok/s")
+    if data.get("prompt_eval_count") is not None:
+        prompt = f"prompt {data['prompt_eval_count']} tok"
+        if data.get("prompt_eval_duration_ms"):
+            prompt += f" en {seconds(data['prompt_eval_duration_ms'])}"
+        parts.append(prompt)
+    if data.get("load_duration_ms") and data["load_duration_ms"] >= 100:
+        parts.append(f"carga {seconds(data['load_duration_ms'])}")
+    return " · ".join(parts)
+
+_log_lock = threading.Lock()
+
+def log_telemetry(telemetry: GenerationTelemetry, path: str = METRICS_LOG_PATH, **extra: Any) -> None:
+    """Append the telemetry of one answer to the JSONL metrics log."""
+    if not METRICS_LOG_ENABLED:
+        return
+    record = {"timestamp": datetime.now().isoformat(), **extra, **telemetry.to_dict()}
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    try:
+        with _log_lock:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+    except OSError as e:
+        print(f"Error writing metrics log: {e}")
+
+def read_metrics(path: str = METRICS_LOG_PATH) -> List[Dict[str, Any]]:
+    """Read the metrics log, skipping lines that cannot be parsed."""
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def summarize_metrics(records: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Aggregate metrics per model, ignoring cached answers.
+
+    Returns:
+        {model: {"answers", "ttft_p50_ms", "ttft_p95_ms", "first_visible_p50_ms",
+                 "tokens_per_second_avg", "prompt_tokens_per_second_avg"}}
+    """
+    by_model: Dict[str, List[Dict[str, Any]]] = {}
+    for record in records:
+        if not record.get("cached"):
+            by_model.setdefault(record.get("model", "?"), []).append(record)
+
+    summary = {}
+    for model, items in by_model.items():
+        def values(key: str) -> List[float]:
+            return [r[key] for r in items if r.get(key) is not None]
+
+        ttft, visible = values("ttft_ms"), values("first_visible_ms")
+        tps, prompt_tps = values("tokens_per_second"), values("prompt_tokens_per_second")
+        summary[model] = {
+            "answers": len(items),
+            "ttft_p50_ms": _percentile(ttft, 0.5) if ttft else None,
+            "ttft_p95_ms": _percentile(ttft, 0.95) if ttft else None,
+            "first_visible_p50_ms": _percentile(visible, 0.5) if visible else None,
+            "tokens_per_second_avg": round(statistics.mean(tps), 2) if tps else None,
+            "prompt_tokens_per_second_avg": round(statistics.mean(prompt_tps), 2) if prompt_tps else None,
+        }
+    return summary
+
+if __name__ == "__main__":
+    print(json.dumps(summarize_metrics(read_metrics(*sys.argv[1:2])), indent=2))
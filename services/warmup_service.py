@@ -0,0 +1,141 @@
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from config.settings import OLLAMA_NUM_CTX, MODEL_WARMUP_RETRY_SECONDS
+from services.ollama_client import get_ollama_client
+from services.ollama_service import get_keep_alive
+
+IDLE = "idle"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+@dataclass
+class WarmupState:
+    """Load state of one model."""
+    status: str = IDLE
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def load_seconds(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+def keep_alive_seconds(keep_alive: Any) -> Optional[float]:
+    """
+    Convert an Ollama keep_alive value to seconds.
+
+    Args:
+        keep_alive: Number of seconds or a duration string like "30m" or "1h30m"
+
+    Returns:
+        Seconds, or None if the model is kept loaded indefinitely (negative values)
+    """
+    if isinstance(keep_alive, (int, float)):
+        return None if keep_alive < 0 else float(keep_alive)
+    text = str(keep_alive).strip()
+    if text.startswith("-"):
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    return sum(float(value) * _DURATION_UNITS[unit] for value, unit in _DURATION_RE.findall(text))
+
+class ModelWarmer:
+    """
+    Preloads models in the background so the first message does not pay the load time.
+
+    Shared by all sessions of the process: a model that is already loading,
+    or was loaded less than its keep_alive ago, is not warmed again.
+    """
+
+    def __init__(self, generate_fn: Optional[Callable[..., Any]] = None):
+        self._generate_fn = generate_fn or (lambda **kwargs: get_ollama_client().generate(**kwargs))
+        self._states: Dict[str, WarmupState] = {}
+        self._lock = threading.Lock()
+
+    def state(self, model: str) -> WarmupState:
+        with self._lock:
+            return self._states.get(model, WarmupState())
+
+    def warm(self, model: str) -> WarmupState:
+        """
+        Start loading a model unless it is loading or still loaded.
+
+        Args:
+            model: Model name
+
+        Returns:
+            Current load state of the model
+        """
+        with self._lock:
+            state = self._states.get(model)
+            if state is not None and (
+                state.status == LOADING
+                or self._still_loaded(model, state)
+                or self._retry_pending(state)
+            ):
+                return state
+            state = WarmupState(status=LOADING, started_at=time.monotonic())
+            self._states[model] = state
+        threading.Thread(target=self._load, args=(model,), name=f"warmup-{model}", daemon=True).start()
+        return state
+
+    def mark_used(self, model: str) -> None:
+        """Record that a request just used the model, which resets its keep_alive timer."""
+        with self._lock:
+            state = self._states.get(model)
+            if state is not None and state.status == READY:
+                state.finished_at = time.monotonic()
+
+    def _still_loaded(self, model: str, state: WarmupState) -> bool:
+        if state.status != READY:
+            return False
+        ttl = keep_alive_seconds(get_keep_alive(model))
+        return ttl is None or time.monotonic() - state.finished_at < ttl
+
+    def _retry_pending(self, state: WarmupState) -> bool:
+        return state.status == FAILED and time.monotonic() - state.finished_at < MODEL_WARMUP_RETRY_SECONDS
+
+    def _load(self, model: str) -> None:
+        try:
+            # An empty prompt only loads the model. num_ctx must match chat
+            # requests, otherwise the first message would reload it anyway
+            self._generate_fn(
+                model=model,
+                prompt="",
+                keep_alive=get_keep_alive(model),
+                options={"num_ctx": OLLAMA_NUM_CTX}
+            )
+            status, error = READY, None
+        except Exception as e:
+            print(f"Error warming up {model}: {e}")
+            status, error = FAILED, str(e)
+        with self._lock:
+            self._states[model] = WarmupState(
+                status=status,
+                started_at=self._states[model].started_at,
+                finished_at=time.monotonic(),
+                error=error
+            )
+
+_warmer: Optional[ModelWarmer] = None
+_warmer_lock = threading.Lock()
+
+def get_model_warmer() -> ModelWarmer:
+    """Return the warmer shared by all sessions of this process."""
+    global _warmer
+    with _warmer_lock:
+        if _warmer is None:
+            _warmer = ModelWarmer()
+        return _warmer
@@ -0,0 +1,170 @@
+"""
+Tests for the shared Ollama client, run against the fake server from
+benchmarks.fake_ollama.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import socket
+import time
+
+import httpx
+import pytest
+
+from benchmarks.fake_ollama import FakeOllamaConfig, start_fake_ollama
+from services import ollama_client
+from services.model_catalog import ModelCatalog
+from services.ollama_service import generate_chat_response, generate_completion
+from services.request_scheduler import RequestScheduler
+from utils.helpers import extract_chunk_content
+
+MODEL = "deepseek-r1:14b"
+MESSAGES = [{"role": "user", "content": "Hello"}]
+
+
+@pytest.fixture
+def fake_ollama(monkeypatch):
+    """Start a fake server and point the shared client settings at it."""
+    servers = []
+
+    def start(**config):
+        server, url = start_fake_ollama(FakeOllamaConfig(think_chars=40, answer_chars=80, **config))
+        servers.append(server)
+        monkeypatch.setattr(ollama_client, "OLLAMA_HOST", url)
+        monkeypatch.setattr(ollama_client, "_client", None)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def closed_port_url() -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+def read_text(stream) -> str:
+    return "".join(extract_chunk_content(chunk) or "" for chunk in stream)
+
+
+def test_client_options_come_from_settings(monkeypatch):
+    monkeypatch.setattr(ollama_client, "OLLAMA_HOST", "http://ollama.test:1234")
+    monkeypatch.setattr(ollama_client, "OLLAMA_CONNECT_TIMEOUT", 1.5)
+    monkeypatch.setattr(ollama_client, "OLLAMA_READ_TIMEOUT", 42.0)
+    monkeypatch.setattr(ollama_client, "OLLAMA_POOL_MAX_CONNECTIONS", 3)
+    monkeypatch.setattr(ollama_client, "OLLAMA_POOL_MAX_KEEPALIVE", 2)
+
+    options = ollama_client.client_options()
+
+    assert options["host"] == "http://ollama.test:1234"
+    assert options["timeout"].connect == 1.5
+    assert options["timeout"].read == 42.0
+    assert options["limits"].max_connections == 3
+    assert options["limits"].max_keepalive_connections == 2
+
+
+def test_sync_client_is_shared(fake_ollama):
+    fake_ollama()
+    assert ollama_client.get_ollama_client() is ollama_client.get_ollama_client()
+
+
+def test_chat_stream_uses_configured_host(fake_ollama):
+    fake_ollama()
+    stream = generate_chat_response(MODEL, MESSAGES)
+
+    text = read_text(stream)
+
+    assert text.startswith("<think>") and "</think>" in text
+    assert stream.stats["eval_count"] == 30
+    assert stream.stats["done_reason"] == "stop"
+
+
+def test_completion_uses_configured_host(fake_ollama):
+    fake_ollama()
+    response = generate_completion(MODEL, "Hello", temperature=0.0, max_tokens=10)
+    assert "</think>" in response["response"]
+
+
+def test_sequential_requests_reuse_one_connection(fake_ollama):
+    server = fake_ollama()
+    for _ in range(3):
+        read_text(generate_chat_response(MODEL, MESSAGES))
+    generate_completion(MODEL, "Hello")
+    assert server.connections == 1
+
+
+def test_pool_limits_concurrent_connections(fake_ollama, monkeypatch):
+    monkeypatch.setattr(ollama_client, "OLLAMA_POOL_MAX_CONNECTIONS", 1)
+    # Waiting for a free connection is bounded by the read timeout too
+    monkeypatch.setattr(ollama_client, "OLLAMA_READ_TIMEOUT", 0.3)
+    server = fake_ollama()
+    first = iter(generate_chat_response(MODEL, MESSAGES))
+    next(first)
+
+    # The only connection is busy streaming the first answer
+    with pytest.raises(httpx.PoolTimeout):
+        read_text(generate_chat_response(MODEL, MESSAGES))
+
+    read_text(first)
+    read_text(generate_chat_response(MODEL, MESSAGES))
+    assert server.connections == 1
+
+
+def test_read_timeout_applies_before_the_first_chunk(fake_ollama, monkeypatch):
+    monkeypatch.setattr(ollama_client, "OLLAMA_READ_TIMEOUT", 0.2)
+    fake_ollama(first_chunk_delay=1.0)
+    with pytest.raises(httpx.ReadTimeout):
+        read_text(generate_chat_response(MODEL, MESSAGES))
+
+
+def test_read_timeout_does_not_cap_the_whole_response(fake_ollama, monkeypatch):
+    monkeypatch.setattr(ollama_client, "OLLAMA_READ_TIMEOUT", 0.5)
+    # About 1.2 s in total, but no gap between chunks comes near the timeout
+    fake_ollama(tokens_per_second=25)
+    assert "</think>" in read_text(generate_chat_response(MODEL, MESSAGES))
+
+
+def test_unreachable_host_raises_connect_error(monkeypatch):
+    monkeypatch.setattr(ollama_client, "OLLAMA_HOST", closed_port_url())
+    monkeypatch.setattr(ollama_client, "_client", None)
+    with pytest.raises(httpx.ConnectError):
+        read_text(generate_chat_response(MODEL, MESSAGES))
+
+
+def test_scheduler_streams_through_configured_async_client(fake_ollama):
+    fake_ollama()
+    scheduler = RequestScheduler()
+
+    request = scheduler.submit(session_id="test", model=MODEL, messages=MESSAGES)
+
+    assert "</think>" in read_text(request)
+    assert request.stats["done_reason"] == "stop"
+
+
+def test_scheduler_reports_unreachable_host(monkeypatch):
+    monkeypatch.setattr(ollama_client, "OLLAMA_HOST", closed_port_url())
+    scheduler = RequestScheduler()
+
+    request = scheduler.submit(session_id="test", model=MODEL, messages=MESSAGES)
+
+    with pytest.raises(httpx.ConnectError):
+        read_text(request)
+    # The slot is released right after the error is handed over
+    deadline = time.monotonic() + 2
+    while scheduler.running and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert scheduler.running == 0
+
+
+def test_model_catalog_lists_through_shared_client(fake_ollama):
+    fake_ollama()
+    catalog = ModelCatalog()
+
+    models = catalog.models()
+
+    assert [m.name for m in models] == [MODEL]
+    assert models[0].quantization == "Q4_K_M"
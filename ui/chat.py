@@ -1,38 +1,56 @@
+import uuid
 import streamlit as st
-import time
-import re
-from services.ollama_service import generate_chat_response
+from services.context_manager import ContextWindowManager
+from services.prompt_assembler import PromptAssembler, cache_hit_ratio
+from services.generation_service import GenerationJob, get_generation_registry
+from services.telemetry import format_telemetry
 from utils.helpers import format_error_message
-import base64
-import os
+from ui.stream_thinking import StreamRenderer, thinking_box_html, TRUNCATION_NOTES
+from ui.compare import (
+    get_compare_models,
+    stream_comparison,
+    has_pending_comparison,
+    set_pending_comparison,
+    render_pending_comparison
+)
+from config.settings import (
+    CHAT_RENDER_WINDOW,
+    CHAT_RENDER_PAGE_SIZE,
+    GENERATION_POLL_SECONDS
+)
+from utils.assets import load_asset_bytes
+from utils.messages import new_message
 
-def encode_image_to_base64(image_path):
-    """Convierte la imagen local en un string codificado en Base64."""
-    with open(image_path, "rb") as f:
-        data = f.read()
-    return base64.b64encode(data).decode("utf-8")
-
-def get_avatar(image_path, fallback_url, mime_type='png'):
+def get_avatar(image_path, fallback_url):
     """
-    Retorna el string Base64 si la imagen existe localmente, o la URL de respaldo si no.
+    Retorna los bytes de la imagen si existe localmente, o la URL de respaldo si no.
+
+    Los bytes se leen una vez por proceso (se releen solo si cambia el archivo).
+    Al recibir bytes, Streamlit sirve la imagen desde su endpoint de medios y
+    cada mensaje solo incluye la URL, en lugar de un data URI en Base64.
     
     :param image_path: Ruta local de la imagen.
     :param fallback_url: URL pública para usar en caso de que la imagen no exista localmente.
-    :param mime_type: Tipo de imagen ('png', 'jpeg', etc.).
     """
-    if os.path.exists(image_path):
-        encoded = encode_image_to_base64(image_path)
-        return f"data:image/{mime_type};base64,{encoded}"
-    else:
-        return fallback_url
+    data = load_asset_bytes(image_path)
+    return data if data is not None else fallback_url
 
 def render_chat_interface():
     """Muestra el historial y el campo de entrada al final."""
     render_chat_messages()
     
-    user_input = st.chat_input("Pregunta algo...")
+    # Con una comparación pendiente, hay que elegir una respuesta antes de seguir
+    comparing = has_pending_comparison()
+    if comparing:
+        render_pending_comparison()
+    
+    generating = is_generating()
+    user_input = st.chat_input("Pregunta algo...", disabled=comparing or generating)
     if user_input:
         handle_user_input(user_input)
+    elif generating:
+        # La respuesta en curso se sigue mostrando aunque el script se haya vuelto a ejecutar
+        render_live_generation()
 
 def render_chat_messages():
     """
@@ -47,185 +65,342 @@ def render_chat_messages():
     fallback_assistant_url = "https://via.placeholder.com/150?text=Assistant"
 
     # Obtén el avatar usando la función get_avatar (local si existe, sino fallback)
-    user_avatar_url = get_avatar(user_image_path, fallback_user_url, mime_type='png')
-    assistant_avatar_url = get_avatar(assistant_image_path, fallback_assistant_url, mime_type='jpeg')
+    user_avatar_url = get_avatar(user_image_path, fallback_user_url)
+    assistant_avatar_url = get_avatar(assistant_image_path, fallback_assistant_url)
 
     # Inicializa el historial de mensajes si aún no existe
     if "messages" not in st.session_state:
         st.session_state.messages = [
-            {"role": "user", "content": "Hola, chatbot."},
-            {"role": "assistant", "content": "¡Hola! ¿En qué puedo ayudarte hoy?"}
+            new_message("user", "Hola, chatbot."),
+            new_message("assistant", "¡Hola! ¿En qué puedo ayudarte hoy?")
         ]
 
+    # Solo se muestran los últimos mensajes; los anteriores se cargan por páginas
+    messages = st.session_state.messages
+    start = get_render_window_start(messages)
+    if start > 0:
+        st.button(
+            f"Cargar mensajes anteriores ({start} ocultos)",
+            on_click=load_earlier_messages,
+            key="load_earlier_messages"
+        )
+    visible = messages[start:]
+    show_thinking = st.session_state.get("show_thinking", True)
+    render_cache = get_render_cache(visible, show_thinking)
+
     # Recorre y muestra cada mensaje, asignando el avatar correspondiente
-    for msg in st.session_state.messages:
+    for msg in visible:
         role = msg["role"]
-        content = msg.get("content", "")
-        thinking = msg.get("thinking", "")
+        rendered = render_cache.get(msg.get("id"))
+        if rendered is None:
+            rendered = render_message(msg, show_thinking)
+            if msg.get("id"):
+                render_cache[msg["id"]] = rendered
 
         avatar_url = assistant_avatar_url if role == "assistant" else user_avatar_url
 
         with st.chat_message(role, avatar=avatar_url):
             # Si es el asistente y tiene contenido de "pensamiento", se muestra en un recuadro especial
-            if role == "assistant" and thinking and st.session_state.get("show_thinking", True):
-                st.markdown(
-                    f"""
-                    <div style="background:#1E293B; color:#fff; padding:10px; margin-bottom:5px; 
-                                border-left:4px solid #3B82F6; border-radius:4px;">
-                        <strong>💭 Pensamiento:</strong><br/>
-                        {thinking}
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
-            st.markdown(content, unsafe_allow_html=True)
+            if rendered["thinking_html"]:
+                st.markdown(rendered["thinking_html"], unsafe_allow_html=True)
+            st.markdown(rendered["content"], unsafe_allow_html=True)
+            if rendered["caption"]:
+                st.caption(rendered["caption"])
+
+def render_message(msg, show_thinking):
+    """Prepara lo que se muestra de un mensaje (recuadro de pensamiento, texto y telemetría)."""
+    is_assistant = msg["role"] == "assistant"
+    thinking = msg.get("thinking", "")
+    metadata = msg.get("metadata") or {}
+    captions = []
+    if is_assistant and metadata.get("telemetry"):
+        captions.append(format_telemetry(metadata["telemetry"]))
+    if is_assistant and metadata.get("truncated") in TRUNCATION_NOTES:
+        captions.append(TRUNCATION_NOTES[metadata["truncated"]])
+    if is_assistant and metadata.get("cached") == "semantic":
+        captions.append(f"⚡ Respuesta reutilizada de una pregunta similar (similitud {metadata['cache_score']:.2f})")
+    elif is_assistant and metadata.get("cached") == "exact":
+        captions.append("⚡ Respuesta servida desde la caché")
+    if is_assistant and metadata.get("prompt_tokens"):
+        note = prompt_cache_note(
+            metadata["prompt_tokens"], metadata.get("prompt_eval_count"), metadata.get("prompt_prefix")
+        )
+        if note:
+            captions.append(note)
+    return {
+        "thinking_html": thinking_box_html(thinking, "Pensamiento") if is_assistant and thinking and show_thinking else "",
+        "content": msg.get("content", ""),
+        "caption": " · ".join(captions),
+    }
+
+def get_render_cache(visible, show_thinking):
+    """
+    Devuelve la caché de mensajes renderizados, indexada por id de mensaje.
+
+    Los mensajes no cambian una vez añadidos, así que en cada rerun solo se
+    preparan los nuevos. Se vacía si cambia la opción de mostrar el
+    pensamiento y se podan las entradas que ya no están en la ventana.
+    """
+    cache = st.session_state.get("render_cache")
+    if cache is None or st.session_state.get("render_cache_thinking") != show_thinking:
+        cache = {}
+        st.session_state.render_cache = cache
+        st.session_state.render_cache_thinking = show_thinking
+    if len(cache) > 2 * len(visible) + CHAT_RENDER_PAGE_SIZE:
+        ids = {m.get("id") for m in visible}
+        for key in [k for k in cache if k not in ids]:
+            del cache[key]
+    return cache
+
+def get_render_window_start(messages):
+    """Índice del primer mensaje visible; la ventana empieza siempre en un turno del usuario."""
+    limits = st.session_state.setdefault("chat_render_limits", {})
+    limit = limits.get(st.session_state.get("conversation_id", ""), CHAT_RENDER_WINDOW)
+    start = max(0, len(messages) - limit)
+    while start > 0 and messages[start]["role"] != "user":
+        start -= 1
+    return start
+
+def load_earlier_messages():
+    """Amplía la ventana de mensajes visibles de la conversación actual en una página."""
+    limits = st.session_state.setdefault("chat_render_limits", {})
+    conversation_id = st.session_state.get("conversation_id", "")
+    limits[conversation_id] = limits.get(conversation_id, CHAT_RENDER_WINDOW) + CHAT_RENDER_PAGE_SIZE
 
 def handle_user_input(prompt):
     """
     Añade el mensaje del usuario al historial y genera la respuesta del asistente.
     """
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    st.session_state.messages.append(new_message("user", prompt))
     
     with st.chat_message("user"):
         st.write(prompt)
     
-    generate_assistant_response()
+    compare_models = get_compare_models()
+    if len(compare_models) > 1:
+        generate_comparison(compare_models)
+    else:
+        generate_assistant_response()
+
+def get_context_manager():
+    """Devuelve el gestor de contexto de la conversación actual (uno por conversación)."""
+    managers = st.session_state.setdefault("context_managers", {})
+    conversation_id = st.session_state.get("conversation_id", "")
+    if conversation_id not in managers:
+        managers[conversation_id] = ContextWindowManager()
+    return managers[conversation_id]
+
+def get_session_id():
+    """Identificador de la sesión del navegador, usado para repartir el servidor entre sesiones."""
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = str(uuid.uuid4())
+    return st.session_state.session_id
+
+def get_prompt_assembler():
+    """Devuelve el ensamblador de prompts de la conversación actual (uno por conversación)."""
+    assemblers = st.session_state.setdefault("prompt_assemblers", {})
+    conversation_id = st.session_state.get("conversation_id", "")
+    if conversation_id not in assemblers:
+        assemblers[conversation_id] = PromptAssembler()
+    return assemblers[conversation_id]
+
+def prompt_cache_note(prompt_tokens, prompt_eval_count, prefix=None):
+    """
+    Texto con cuántos tokens del prompt evaluó Ollama y cuántos reutilizó de su caché.
+
+    prefix es el PrefixReport del ensamblador (como dict): cuántos mensajes
+    del prompt eran idénticos al prompt anterior y podían salir de la caché.
+    """
+    ratio = cache_hit_ratio(prompt_tokens, prompt_eval_count)
+    if ratio is None:
+        return ""
+    note = (
+        f"Evaluados {prompt_eval_count:,} de ~{prompt_tokens:,} tokens del prompt"
+        f" · ~{ratio:.0%} desde caché"
+    )
+    if prefix:
+        note += f" · prefijo idéntico en {prefix['reused_messages']} de {prefix['total_messages']} mensajes"
+    return note
+
+def render_context_report(report, placeholder=st):
+    """Muestra el tamaño estimado del prompt enviado al modelo."""
+    text = f"Prompt: ~{report.prompt_tokens:,} tokens · {report.window_messages} mensajes"
+    if report.summarized_messages:
+        text += f" · {report.summarized_messages} anteriores resumidos"
+    placeholder.caption(text)
 
 def generate_assistant_response():
     """
-    Llama a Ollama en modo streaming y separa en tiempo real lo que esté entre <think> y </think>.
+    Lanza la respuesta del asistente en segundo plano y muestra su progreso.
+
+    La generación, incluido el resumen de los turnos antiguos, corre en un
+    hilo del servidor (services.generation_service) que escribe en un búfer,
+    así que un rerun, un cambio de página o recargar el navegador no la
+    interrumpen.
+    """
+    model = st.session_state.model
+    temperature = getattr(st.session_state, "temperature", 0.7)
+    metadata = {"model": model, "temperature": temperature}
+    try:
+        get_generation_registry().start(GenerationJob(
+            conversation_id=st.session_state.conversation_id,
+            conversation_name=st.session_state.get("conversation_name", "(unnamed)"),
+            base_messages=st.session_state.messages,
+            context_manager=get_context_manager(),
+            prompt_assembler=get_prompt_assembler(),
+            model=model,
+            temperature=temperature,
+            session_id=get_session_id(),
+            metadata=metadata,
+            bypass_cache=st.session_state.get("bypass_response_cache", False),
+            autosave=st.session_state.get("autosave", True)
+        ))
+    except Exception as e:
+        error_message = format_error_message(e)
+        st.error(error_message)
+        st.session_state.messages.append(new_message(
+            "assistant",
+            f"Ocurrió un error: {error_message}",
+            metadata={**metadata, "error": True}
+        ))
+        return
+    # La nueva ejecución desactiva la entrada y sigue la respuesta desde un fragmento
+    st.rerun()
+
+def get_generation_job():
+    """Generación en segundo plano de la conversación actual (en curso o sin incorporar), o None."""
+    return get_generation_registry().get(st.session_state.get("conversation_id", ""))
+
+def is_generating():
+    """Indica si la conversación actual tiene una respuesta generándose."""
+    job = get_generation_job()
+    return job is not None and not job.done
+
+def adopt_finished_generation():
     """
+    Incorpora al historial la respuesta terminada en segundo plano de la
+    conversación actual. Se llama al principio de cada ejecución, en
+    cualquier página; cada sesión abierta en la conversación la incorpora
+    una sola vez.
+    """
+    job = get_generation_job()
+    if job is None or not job.done or job.result is None:
+        return
+    messages = st.session_state.messages
+    ids = [m.get("id") for m in messages]
+    if job.result["id"] in ids:
+        return
+    base_ids = [m.get("id") for m in job.base_messages]
+    if ids != base_ids[:len(ids)]:
+        # La sesión cambió el historial desde que se hizo la pregunta
+        return
+    # Una sesión nueva (navegador recargado) puede no tener aún los últimos mensajes
+    messages.extend(job.base_messages[len(ids):])
+    messages.append(job.result)
+
+def has_unadopted_generation():
+    """
+    Indica si la conversación actual tiene una respuesta en segundo plano que
+    esta sesión aún no incorporó; mientras tanto es el trabajo quien la guarda.
+    """
+    job = get_generation_job()
+    if job is None:
+        return False
+    if not job.done:
+        return True
+    return job.result is not None and job.result["id"] not in {m.get("id") for m in st.session_state.messages}
+
+@st.fragment(run_every=GENERATION_POLL_SECONDS)
+def render_live_generation():
+    """
+    Muestra la respuesta que se genera en segundo plano según llega.
+
+    Cada ejecución del fragmento lee sin esperar solo los fragmentos nuevos
+    del búfer y devuelve el control a Streamlit, así que Detener y el resto
+    de la interfaz responden aunque la respuesta siga en cola o pensando. La
+    posición leída y el renderer se guardan en la sesión; un rerun o una
+    recarga no interrumpen la generación. Al terminar recarga la página para
+    que la respuesta pase al historial.
+    """
+    job = get_generation_job()
+    if job is None or job.done:
+        st.session_state.pop("live_generation", None)
+        st.rerun()
+    live = st.session_state.get("live_generation")
+    if live is None or live["job"] is not job:
+        live = st.session_state.live_generation = {"job": job, "position": 0, "renderer": None}
+    
+    report_placeholder = st.empty()       # Para el tamaño del prompt, cuando esté construido
     with st.chat_message("assistant"):
-        normal_placeholder = st.empty()   # Para el texto normal
+        st.button(
+            "⏹ Detener",
+            key="stop_generation",
+            on_click=job.cancel,
+            help="Stop the answer and keep what was generated"
+        )
+        queue_placeholder = st.empty()    # Para la posición en la cola
         think_placeholder = st.empty()    # Para el recuadro de pensamiento
-        
-        try:
-            temperature = getattr(st.session_state, "temperature", 0.7)
-            stream = generate_chat_response(
-                model=st.session_state.model,
-                messages=st.session_state.messages,
-                temperature=temperature,
-                stream=True
-            )
-            
-            # Procesa la respuesta en streaming, separando el texto normal de lo que está en <think>...</think>
-            final_text, final_thinking = process_streamed_response(
-                stream,
-                normal_placeholder,
-                think_placeholder
-            )
-            
-            # Almacena la respuesta en el historial
-            st.session_state.messages.append({
-                "role": "assistant",
-                "content": final_text,
-                "thinking": final_thinking
-            })
-            
-        except Exception as e:
-            error_message = format_error_message(e)
-            normal_placeholder.error(error_message)
-            st.session_state.messages.append({
-                "role": "assistant",
-                "content": f"Ocurrió un error: {error_message}",
-                "thinking": ""
-            })
-
-def process_streamed_response(stream, normal_placeholder, think_placeholder):
-    """
-    Procesa la respuesta en streaming, separando el contenido normal del bloque <think>... </think>.
-    
-    Retorna:
-      final_text: Texto final sin el contenido de <think>.
-      final_thinking: Contenido acumulado de los bloques <think>.
-    """
-    final_text = ""
-    final_thinking = ""
-    normal_text = ""
-    thinking_text = ""
-    inside_think = False
-
-    for chunk in stream:
-        if not chunk or 'message' not in chunk or 'content' not in chunk['message']:
-            continue
-        
-        content_chunk = chunk['message']['content']
-        i = 0
-        while i < len(content_chunk):
-            if not inside_think:
-                # Buscar apertura de <think>
-                idx_open = content_chunk.find('<think>', i)
-                if idx_open == -1:
-                    normal_text += content_chunk[i:]
-                    i = len(content_chunk)
-                else:
-                    normal_text += content_chunk[i:idx_open]
-                    inside_think = True
-                    i = idx_open + len('<think>')
-            else:
-                # Dentro de <think>, buscar el cierre </think>
-                idx_close = content_chunk.find('</think>', i)
-                if idx_close == -1:
-                    thinking_text += content_chunk[i:]
-                    i = len(content_chunk)
-                else:
-                    thinking_text += content_chunk[i:idx_close]
-                    inside_think = False
-                    i = idx_close + len('</think>')
-        
-        # Actualiza la visualización en tiempo real
-        normal_placeholder.markdown(normal_text + "▌", unsafe_allow_html=True)
-        if inside_think:
-            think_placeholder.markdown(
-                f"""
-                <div style="background:#1E293B; color:#fff; padding:10px; margin-bottom:5px;
-                            border-left:4px solid #3B82F6; border-radius:4px;">
-                    <strong>💭 Pensamiento (en vivo):</strong><br/>
-                    {thinking_text}▌
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+        normal_placeholder = st.empty()   # Para el texto normal
+        if live["renderer"] is None:
+            live["renderer"] = StreamRenderer(normal_placeholder, think_placeholder)
         else:
-            if thinking_text:
-                think_placeholder.markdown(
-                    f"""
-                    <div style="background:#1E293B; color:#fff; padding:10px; margin-bottom:5px;
-                                border-left:4px solid #3B82F6; border-radius:4px;">
-                        <strong>💭 Pensamiento:</strong><br/>
-                        {thinking_text}
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
-        time.sleep(0.01)  # Pausa para simular el streaming
-    
-    # Finaliza la actualización
-    normal_placeholder.markdown(normal_text, unsafe_allow_html=True)
-    if inside_think:
-        think_placeholder.markdown(
-            f"""
-            <div style="background:#1E293B; color:#fff; padding:10px; margin-bottom:5px;
-                        border-left:4px solid #3B82F6; border-radius:4px;">
-                <strong>💭 Pensamiento (sin cerrar):</strong><br/>
-                {thinking_text}
-            </div>
-            """,
-            unsafe_allow_html=True
+            live["renderer"].attach(normal_placeholder, think_placeholder)
+        live["position"], done = render_job_output(
+            job, live["renderer"], live["position"], queue_placeholder=queue_placeholder,
+            report_placeholder=report_placeholder
         )
+    if done:
+        st.session_state.pop("live_generation", None)
+        st.rerun()
+
+def render_job_output(job, renderer, position, timeout=0, queue_placeholder=None, report_placeholder=None):
+    """
+    Pasa al renderer los fragmentos del búfer de una generación en segundo
+    plano leídos desde position, y la posición en la cola y el tamaño del
+    prompt si se dan sus placeholders.
+
+    Solo se leen los fragmentos nuevos, así que, como al recorrer el stream
+    directamente, cada bloque de Markdown completo se procesa una vez y solo
+    se redibuja el bloque abierto. Espera hasta timeout segundos a que llegue
+    algo (0 desde la interfaz, que no debe bloquearse).
+
+    Retorna:
+      (posición desde la que leer la próxima vez, si la generación terminó)
+    """
+    chunks, position, done = job.read(position, timeout=timeout)
+    if report_placeholder is not None and job.context_report is not None:
+        render_context_report(job.context_report, report_placeholder)
+    for chunk in chunks:
+        renderer.feed_text(chunk)
+    if done:
+        renderer.finish()
     else:
-        if thinking_text:
-            think_placeholder.markdown(
-                f"""
-                <div style="background:#1E293B; color:#fff; padding:10px; margin-bottom:5px;
-                            border-left:4px solid #3B82F6; border-radius:4px;">
-                    <strong>💭 Pensamiento:</strong><br/>
-                    {thinking_text}
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
-    
-    final_text = normal_text
-    final_thinking = thinking_text
-    return final_text, final_thinking
+        renderer.redraw()
+    if queue_placeholder is not None:
+        queued = job.queue_position()
+        if queued:
+            queue_placeholder.info(f"⏳ En cola: {queued} petición(es) por delante...")
+    return position, done
+
+def generate_comparison(models):
+    """
+    Pide la respuesta a varios modelos a la vez y la muestra en columnas.
+
+    El prompt se construye una sola vez con el presupuesto del modelo
+    seleccionado. Las respuestas no pasan por las cachés y quedan pendientes
+    hasta que el usuario conserva una.
+    """
+    temperature = getattr(st.session_state, "temperature", 0.7)
+    try:
+        context_manager = get_context_manager()
+        prompt_messages = context_manager.build(
+            st.session_state.messages, st.session_state.model, get_session_id()
+        )
+        render_context_report(context_manager.last_report)
+        prompt_messages = get_prompt_assembler().assemble(prompt_messages)
+        candidates = stream_comparison(models, prompt_messages, temperature, get_session_id())
+    except Exception as e:
+        st.error(format_error_message(e))
+        return
+    set_pending_comparison(candidates)
+    st.rerun()
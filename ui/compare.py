@@ -0,0 +1,221 @@
+import queue
+import threading
+import time
+import streamlit as st
+from services.ollama_service import STOP_CANCELLED, truncation_reason
+from services.request_scheduler import get_request_scheduler
+from services.telemetry import build_telemetry, format_telemetry, log_telemetry
+from services.warmup_service import get_model_warmer
+from utils.helpers import format_error_message
+from utils.messages import new_message
+from ui.stream_thinking import StreamRenderer, thinking_box_html, TRUNCATION_NOTES
+
+def get_compare_models():
+    """Modelos elegidos para el modo comparación, o lista vacía si está desactivado."""
+    if not st.session_state.get("compare_mode"):
+        return []
+    return list(st.session_state.get("compare_models", []))
+
+def merge_streams(streams, stop):
+    """
+    Recorre varios streams a la vez y produce sus eventos según llegan.
+
+    Cada stream se consume en su propio hilo, así que un modelo lento no
+    retrasa a los demás. Produce tuplas (índice, tipo, valor) con tipo
+    "start" (valor: momento en que empezó), "chunk", "end" o "error". Al
+    activar el evento stop, los hilos dejan de leer y cancelan sus peticiones.
+    """
+    events = queue.Queue()
+
+    def consume(index, stream):
+        try:
+            if hasattr(stream, "wait_started"):
+                # Una petición cancelada en la cola nunca empieza
+                while not stream.wait_started(timeout=0.5):
+                    if stop.is_set() or stream.cancelled:
+                        events.put((index, "end", None))
+                        return
+            events.put((index, "start", time.perf_counter()))
+            for chunk in stream:
+                if stop.is_set():
+                    break
+                events.put((index, "chunk", chunk))
+            events.put((index, "end", None))
+        except Exception as e:
+            events.put((index, "error", e))
+
+    for index, stream in enumerate(streams):
+        threading.Thread(target=consume, args=(index, stream), name=f"compare-{index}", daemon=True).start()
+
+    remaining = len(streams)
+    while remaining:
+        event = events.get()
+        if event[1] in ("end", "error"):
+            remaining -= 1
+        yield event
+
+def stream_comparison(models, prompt_messages, temperature, session_id):
+    """
+    Envía la misma conversación a varios modelos a la vez y muestra sus
+    respuestas en columnas mientras llegan.
+
+    Todas las peticiones se encolan en el planificador con la sesión del
+    usuario, así que cuentan para su límite de cola y su turno frente a las
+    demás sesiones. Si hay huecos libres empiezan a la vez y el tiempo total
+    se acerca al del modelo más lento, no a la suma.
+
+    Retorna:
+      Lista de candidatas (modelo, contenido, pensamiento, metadatos y error)
+      en el orden de models.
+    """
+    stop_placeholder = st.empty()
+    stop_placeholder.button("⏹ Detener", key="stop_comparison", help="Stop every answer and keep what was generated")
+    columns = st.columns(len(models))
+    renderers, status_placeholders, caption_placeholders = [], [], []
+    timings = [{} for _ in models]
+    started_at = [None] * len(models)
+    candidates = [
+        {"model": model, "content": "", "thinking": "", "error": None,
+         "metadata": {"model": model, "temperature": temperature}}
+        for model in models
+    ]
+
+    for column, model, timing in zip(columns, models, timings):
+        with column:
+            st.markdown(f"**{model}**")
+            status = st.empty()
+            status.info("⏳ En cola...")
+            think_placeholder = st.empty()
+            normal_placeholder = st.empty()
+            caption_placeholders.append(st.empty())
+            status_placeholders.append(status)
+            renderers.append(StreamRenderer(normal_placeholder, think_placeholder, timing))
+
+    submitted_at = time.perf_counter()
+    scheduler = get_request_scheduler()
+    requests = []
+    for model in models:
+        try:
+            requests.append(scheduler.submit(
+                session_id=session_id,
+                model=model,
+                messages=prompt_messages,
+                temperature=temperature
+            ))
+        except Exception:
+            for request in requests:
+                request.cancel()
+            raise
+
+    stop = threading.Event()
+    finished = set()
+    try:
+        for index, kind, value in merge_streams(requests, stop):
+            candidate = candidates[index]
+            if kind in ("end", "error"):
+                finished.add(index)
+            if kind == "start":
+                started_at[index] = value
+                status_placeholders[index].empty()
+            elif kind == "chunk":
+                renderers[index].feed(value)
+            elif kind == "error":
+                candidate["error"] = format_error_message(value)
+                status_placeholders[index].error(candidate["error"])
+            else:
+                candidate["content"], candidate["thinking"] = renderers[index].finish()
+                telemetry = build_telemetry(
+                    candidate["model"],
+                    requests[index].stats,
+                    submitted_at,
+                    started_at[index] or submitted_at,
+                    timings[index],
+                    time.perf_counter()
+                )
+                candidate["metadata"]["telemetry"] = telemetry.to_dict()
+                truncated = truncation_reason(requests[index])
+                if truncated:
+                    candidate["metadata"]["truncated"] = truncated
+                caption_placeholders[index].caption(format_telemetry(candidate["metadata"]["telemetry"]))
+                get_model_warmer().mark_used(candidate["model"])
+                log_telemetry(
+                    telemetry,
+                    conversation_id=st.session_state.get("conversation_id"),
+                    compare=True
+                )
+    except BaseException as e:
+        if not isinstance(e, Exception):
+            # Detener (o cualquier otro widget) interrumpe el script con un rerun:
+            # las respuestas a medias quedan pendientes de elegir
+            for index, candidate in enumerate(candidates):
+                if index not in finished:
+                    candidate["content"], candidate["thinking"] = renderers[index].partial()
+                    candidate["metadata"]["truncated"] = STOP_CANCELLED
+            set_pending_comparison(candidates)
+        raise
+    finally:
+        stop.set()
+        # Cierra las conexiones que sigan abiertas para que Ollama deje de generar
+        for index, request in enumerate(requests):
+            if index not in finished:
+                request.cancel()
+    stop_placeholder.empty()
+    return candidates
+
+def has_pending_comparison():
+    """Indica si la conversación actual tiene respuestas comparadas sin elegir."""
+    pending = st.session_state.get("compare_pending")
+    return pending is not None and pending["conversation_id"] == st.session_state.get("conversation_id")
+
+def set_pending_comparison(candidates):
+    """Guarda las respuestas comparadas hasta que el usuario elija una."""
+    st.session_state.compare_pending = {
+        "conversation_id": st.session_state.get("conversation_id"),
+        "candidates": candidates,
+    }
+
+def keep_compare_answer(index):
+    """Añade al historial la respuesta elegida; las demás se descartan."""
+    candidates = st.session_state.compare_pending["candidates"]
+    chosen = candidates[index]
+    metadata = dict(chosen["metadata"])
+    metadata["compared_with"] = [c["model"] for i, c in enumerate(candidates) if i != index]
+    st.session_state.messages.append(
+        new_message("assistant", chosen["content"], chosen["thinking"], metadata)
+    )
+    st.session_state.compare_pending = None
+
+def discard_comparison():
+    """Descarta las respuestas comparadas junto con la pregunta que las originó."""
+    st.session_state.compare_pending = None
+    messages = st.session_state.messages
+    if messages and messages[-1]["role"] == "user":
+        messages.pop()
+
+def render_pending_comparison():
+    """Muestra las respuestas comparadas en columnas con un botón para conservar cada una."""
+    candidates = st.session_state.compare_pending["candidates"]
+    show_thinking = st.session_state.get("show_thinking", True)
+    columns = st.columns(len(candidates))
+    for index, (column, candidate) in enumerate(zip(columns, candidates)):
+        with column:
+            st.markdown(f"**{candidate['model']}**")
+            if candidate["error"]:
+                st.error(candidate["error"])
+                continue
+            if candidate["thinking"] and show_thinking:
+                st.markdown(thinking_box_html(candidate["thinking"], "Pensamiento"), unsafe_allow_html=True)
+            st.markdown(candidate["content"], unsafe_allow_html=True)
+            telemetry = candidate["metadata"].get("telemetry")
+            if telemetry:
+                st.caption(format_telemetry(telemetry))
+            if candidate["metadata"].get("truncated") in TRUNCATION_NOTES:
+                st.caption(TRUNCATION_NOTES[candidate["metadata"]["truncated"]])
+            st.button(
+                "Conservar esta respuesta",
+                key=f"compare_keep_{index}",
+                on_click=keep_compare_answer,
+                args=(index,),
+                use_container_width=True
+            )
+    st.button("Descartar comparación", key="compare_discard", on_click=discard_comparison)
@@ -1,11 +1,61 @@
 import streamlit as st
 import uuid
+from config.settings import HISTORY_PAGE_SIZE, ARCHIVE_AFTER_DAYS
 from services.storage_service import (
-    list_conversations, 
+    list_conversations_page, 
     load_conversation, 
     save_conversation, 
-    delete_conversation
+    delete_conversation,
+    search_conversations,
+    get_archive_stats
 )
+from services.autosave_service import get_autosave_writer
+from services.archive_service import get_archive_runner
+from ui.chat import has_unadopted_generation
+
+def _persist_current_conversation():
+    """Guarda de inmediato la conversación actual antes de cambiar a otra."""
+    # Mientras hay una respuesta en segundo plano sin incorporar, es ella quien guarda
+    if st.session_state.messages and st.session_state.autosave and not has_unadopted_generation():
+        writer = get_autosave_writer()
+        writer.schedule(
+            st.session_state.conversation_id,
+            st.session_state.messages,
+            st.session_state.get("conversation_name", "(unnamed)")
+        )
+        writer.flush(st.session_state.conversation_id)
+
+def _open_conversation(conversation_id):
+    """Carga una conversación guardada en la sesión actual."""
+    # Guardar antes de cargar: load_conversation cambia el nombre en sesión
+    _persist_current_conversation()
+    messages = load_conversation(conversation_id)
+    if messages is not None:
+        st.session_state.conversation_id = conversation_id
+        st.session_state.messages = messages
+        st.rerun()
+    else:
+        st.error("Failed to load conversation")
+
+def render_search():
+    """Muestra el buscador de texto completo sobre las conversaciones guardadas."""
+    query = st.text_input("Search conversations", key="history_search", placeholder="Search messages...")
+    if not query.strip():
+        return
+    
+    results = search_conversations(query)
+    if not results:
+        st.info("No matching messages found")
+        return
+    
+    for result in results:
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.markdown(f"**{result['name']}** · {result['role']} · {result['last_updated']}")
+            st.markdown(f"> {result['snippet']}")
+        with col2:
+            if st.button("Open", key=f"search_open_{result['id']}_{result['position']}", use_container_width=True):
+                _open_conversation(result['id'])
 
 def render_history_management():
     """Renderiza la interfaz para gestionar el historial de conversaciones."""
@@ -16,9 +66,7 @@ def render_history_management():
     new_name = st.text_input("Conversation Name", key="new_convo_name")
     
     if st.button("Create New Conversation"):
-        current_id = st.session_state.conversation_id
-        if st.session_state.messages and st.session_state.autosave:
-            save_conversation(current_id, st.session_state.messages)
+        _persist_current_conversation()
         
         # Crear una nueva conversación y asignar el nombre
         st.session_state.conversation_id = str(uuid.uuid4())
@@ -43,18 +91,30 @@ def render_history_management():
     
     with col2:
         if st.button("Save Conversation", use_container_width=True):
-            success = save_conversation(current_id, st.session_state.messages)
-            if success:
-                st.success("Conversation saved successfully!")
+            if has_unadopted_generation():
+                # Guardar ahora el historial de la sesión borraría la respuesta que ya guardó el trabajo
+                st.info("The answer being generated saves the conversation when it finishes")
             else:
-                st.error("Failed to save conversation")
+                # Los guardados automáticos pendientes van antes, para que no sobrescriban este
+                get_autosave_writer().flush(current_id)
+                success = save_conversation(current_id, st.session_state.messages)
+                if success:
+                    st.success("Conversation saved successfully!")
+                else:
+                    st.error("Failed to save conversation")
     
     # --- Sección: Listar conversaciones guardadas ---
     st.subheader("Saved Conversations")
-    conversations = list_conversations()
+    render_search()
+    
+    # Pila de cursores de las páginas visitadas; la primera página no tiene cursor
+    if "history_cursors" not in st.session_state:
+        st.session_state.history_cursors = [None]
+    cursor = st.session_state.history_cursors[-1]
+    conversations, next_cursor = list_conversations_page(HISTORY_PAGE_SIZE, cursor)
     
     if conversations:
-        for i, conv in enumerate(conversations):
+        for conv in conversations:
             with st.container():
                 col1, col2 = st.columns([3, 1])
                 with col1:
@@ -62,23 +122,86 @@ def render_history_management():
                     st.write(f"**ID:** {conv['id']}")
                     st.write(f"Last updated: {conv['last_updated']}")
                     st.write(f"Messages: {conv['message_count']}")
+                    if conv.get("archived"):
+                        st.caption("📦 Archived")
                 with col2:
-                    if st.button("Load", key=f"load_{i}", use_container_width=True):
-                        messages = load_conversation(conv['id'])
-                        if messages is not None:
-                            if st.session_state.messages and st.session_state.autosave:
-                                save_conversation(current_id, st.session_state.messages)
-                            st.session_state.conversation_id = conv['id']
-                            st.session_state.messages = messages
-                            st.rerun()
-                        else:
-                            st.error("Failed to load conversation")
-                    if st.button("Delete", key=f"delete_{i}", use_container_width=True):
+                    if st.button("Load", key=f"load_{conv['id']}", use_container_width=True):
+                        _open_conversation(conv['id'])
+                    if conv.get("archived") and st.button(
+                        "Restore", key=f"restore_{conv['id']}", use_container_width=True
+                    ):
+                        get_archive_runner().restore([conv['id']])
+                        st.toast("Restoring conversation in the background")
+                    if st.button("Delete", key=f"delete_{conv['id']}", use_container_width=True):
+                        get_autosave_writer().forget(conv['id'])
                         success = delete_conversation(conv['id'])
                         if success:
                             st.success("Conversation deleted")
                             st.rerun()
                         else:
                             st.error("Failed to delete conversation")
+        render_pagination(next_cursor)
     else:
         st.info("No saved conversations found")
+    
+    render_archive_management()
+
+def _format_bytes(size):
+    """Formatea un tamaño en bytes de forma legible."""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+def render_archive_management():
+    """Muestra el espacio ahorrado por el archivo y lanza los trabajos de archivado."""
+    stats = get_archive_stats()
+    if stats is None:
+        return
+    
+    st.subheader("Archive")
+    if stats["conversations"]:
+        saved = 1 - stats["packed_bytes"] / stats["raw_bytes"] if stats["raw_bytes"] else 0
+        st.write(
+            f"{stats['conversations']} archived conversations: "
+            f"{_format_bytes(stats['raw_bytes'])} of JSON stored in "
+            f"{_format_bytes(stats['packed_bytes'])} ({saved:.0%} saved)"
+        )
+        dead = stats["pack_bytes"] - stats["packed_bytes"]
+        st.caption(
+            f"{stats['packs']} pack files, {_format_bytes(stats['pack_bytes'])} on disk"
+            + (f", {_format_bytes(dead)} reclaimable" if dead > 0 else "")
+        )
+    else:
+        st.caption("No archived conversations")
+    
+    runner = get_archive_runner()
+    if st.button(f"Archive conversations idle for {ARCHIVE_AFTER_DAYS}+ days"):
+        if runner.archive():
+            st.toast("Archiving in the background")
+    
+    status = runner.status()
+    if status["running"]:
+        st.caption(f"Running {status['running']} job...")
+    elif status["last"]:
+        last = status["last"]
+        if last["error"]:
+            st.caption(f"Last {last['kind']} job failed: {last['error']}")
+        else:
+            st.caption(f"Last {last['kind']} job moved {last['count']} conversations at {last['finished_at']}")
+
+def render_pagination(next_cursor):
+    """Muestra los botones para moverse entre páginas del historial."""
+    cursors = st.session_state.history_cursors
+    col_prev, col_page, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        if st.button("← Previous", disabled=len(cursors) == 1, use_container_width=True):
+            cursors.pop()
+            st.rerun()
+    with col_page:
+        st.caption(f"Page {len(cursors)}")
+    with col_next:
+        if st.button("Next →", disabled=next_cursor is None, use_container_width=True):
+            cursors.append(next_cursor)
+            st.rerun()
@@ -0,0 +1,27 @@
+import time
+from typing import Callable
+
+from config.settings import STREAM_RENDER_MAX_HZ
+
+class RenderScheduler:
+    """
+    Limita cuántas veces por segundo se redibuja una respuesta en streaming.
+
+    Los fragmentos que llegan entre dos redibujados se acumulan en el parser y
+    se muestran juntos en el siguiente; el llamador debe redibujar siempre al
+    terminar el stream.
+    """
+
+    def __init__(self, max_hz: float = STREAM_RENDER_MAX_HZ,
+                 clock: Callable[[], float] = time.monotonic):
+        self._interval = 1.0 / max_hz if max_hz > 0 else 0.0
+        self._clock = clock
+        self._last = float("-inf")
+
+    def due(self) -> bool:
+        """Indica si ya toca redibujar; en ese caso reinicia el intervalo."""
+        now = self._clock()
+        if now - self._last >= self._interval:
+            self._last = now
+            return True
+        return False
@@ -1,5 +1,9 @@
 import streamlit as st
-from services.ollama_service import get_available_models
+from services.ollama_service import get_available_models, get_model_info, get_models_error, refresh_available_models
+from services.response_cache import get_response_cache
+from services.semantic_cache import get_semantic_cache
+from services.generation_service import get_generation_registry
+from services.warmup_service import get_model_warmer, LOADING, READY, FAILED
 from utils.helpers import get_model_index
 from config.settings import (
     SIDEBAR_HEADER, 
@@ -9,7 +13,9 @@ from config.settings import (
     NO_MODELS_ERROR,
     MODEL_INSTALL_INSTRUCTION,
     CONNECTION_ERROR,
-    DEFAULT_MODEL
+    DEFAULT_MODEL,
+    MODEL_WARMUP_ENABLED,
+    COMPARE_MAX_MODELS
 )
 
 def render_sidebar():
@@ -18,8 +24,13 @@ def render_sidebar():
         st.header(SIDEBAR_HEADER)
         
         # Model selection
+        st.button("🔄 Refresh models", on_click=refresh_available_models)
         try:
             model_names = get_available_models()
+            # A failed refresh keeps serving the last list; say it may be outdated
+            models_error = get_models_error()
+            if models_error is not None:
+                st.warning(f"Could not refresh the model list: {models_error}")
             
             # Always ensure the default model is in the list
             if DEFAULT_MODEL not in model_names:
@@ -35,6 +46,10 @@ def render_sidebar():
                 index=current_model_index
             )
             st.session_state.model = selected_model
+            render_model_details(selected_model)
+            if MODEL_WARMUP_ENABLED:
+                render_warmup_status(selected_model)
+            render_compare_controls(model_names)
             
             if len(model_names) == 1 and model_names[0] == DEFAULT_MODEL:
                 st.info(f"Using model: {DEFAULT_MODEL}")
@@ -54,12 +69,90 @@ def render_sidebar():
             step=0.1
         )
         st.session_state.temperature = temperature
+        render_response_cache_controls(temperature)
         
         # Clear conversation button
         if st.button(CLEAR_BUTTON_TEXT):
+            # An answer still being generated would otherwise come back after the clear
+            registry = get_generation_registry()
+            job = registry.get(st.session_state.get("conversation_id", ""))
+            if job is not None:
+                job.cancel()
+                registry.discard(job)
             st.session_state.messages = []
             st.rerun()
         
         # Footer
         st.markdown("---")
-        st.markdown(SIDEBAR_FOOTER)
\ No newline at end of file
+        st.markdown(SIDEBAR_FOOTER)
+
+def render_compare_controls(model_names):
+    """Pick the models that answer side by side when compare mode is on"""
+    if not st.toggle(
+        "Compare models",
+        key="compare_mode",
+        help="Send each question to several models at once and keep the best answer"
+    ):
+        return
+    # Drop selections for models that are no longer installed
+    selected = [m for m in st.session_state.get("compare_models", [st.session_state.model]) if m in model_names]
+    st.session_state.compare_models = selected
+    st.multiselect(
+        "Models to compare",
+        options=model_names,
+        key="compare_models",
+        max_selections=COMPARE_MAX_MODELS
+    )
+    if len(st.session_state.compare_models) < 2:
+        st.caption("Select at least two models to compare")
+
+def render_response_cache_controls(temperature):
+    """Show the response cache counters and a toggle to bypass the caches"""
+    cache = get_response_cache()
+    semantic = get_semantic_cache()
+    if not cache.is_cacheable(temperature) and semantic is None:
+        return
+    st.checkbox(
+        "Bypass response cache",
+        key="bypass_response_cache",
+        help="Always ask the model; the new answer replaces the cached one"
+    )
+    if cache.is_cacheable(temperature):
+        st.caption(f"Response cache: {cache.hits} hits · {cache.misses} misses")
+    if semantic is not None:
+        st.caption(f"Semantic cache: {semantic.hits} hits · {semantic.misses} misses")
+
+def render_warmup_status(model_name):
+    """Preload the selected model in the background and show its load state"""
+    state = get_model_warmer().warm(model_name)
+    if state.status == LOADING:
+        poll_warmup_status(model_name)
+    elif state.status == READY:
+        st.caption(f"✅ Model loaded in {state.load_seconds:.1f}s")
+    elif state.status == FAILED:
+        st.caption(f"⚠️ Could not preload the model: {state.error}")
+
+@st.fragment(run_every=1.0)
+def poll_warmup_status(model_name):
+    """Refresh the loading indicator until the warm-up finishes"""
+    if get_model_warmer().state(model_name).status != LOADING:
+        st.rerun()
+    st.caption("⏳ Loading model...")
+
+def render_model_details(model_name):
+    """Show cached metadata for the selected model without querying Ollama"""
+    info = get_model_info(model_name)
+    if info is None:
+        return
+    
+    details = []
+    if info.parameter_size:
+        details.append(info.parameter_size)
+    if info.quantization:
+        details.append(info.quantization)
+    if info.size:
+        details.append(f"{info.size / 1024 ** 3:.1f} GB")
+    if info.context_length:
+        details.append(f"{info.context_length:,} ctx")
+    if details:
+        st.caption(" · ".join(details))
\ No newline at end of file
@@ -1,43 +1,144 @@
-import streamlit as st
 import time
-import re
+import streamlit as st
+from config.settings import STREAM_THINKING_PREVIEW_CHARS
+from services.ollama_service import STOP_CANCELLED, STOP_THINKING_LIMIT, STOP_LENGTH
+from utils.helpers import extract_chunk_content
+from utils.thinking import ThinkStreamParser
+from utils.markdown_blocks import MarkdownBlockSplitter
+from ui.render_scheduler import RenderScheduler
+
+# Aviso bajo una respuesta cortada, según el motivo
+TRUNCATION_NOTES = {
+    STOP_CANCELLED: "⏹ Respuesta detenida",
+    STOP_THINKING_LIMIT: "✂️ Razonamiento cortado al superar el límite de tokens de pensamiento",
+    STOP_LENGTH: "✂️ Respuesta cortada al alcanzar el límite de tokens",
+}
+
+def thinking_box_html(thinking_text, label):
+    """Construye el recuadro HTML con el contenido de pensamiento."""
+    return f"""
+    <div style="background:#1E293B; color:#fff; padding:10px; margin-bottom:5px;
+                border-left:4px solid #3B82F6; border-radius:4px;">
+        <strong>💭 {label}:</strong><br/>
+        {thinking_text}
+    </div>
+    """
 
-def render_thinking_in_realtime(stream, message_placeholder):
+class StreamRenderer:
     """
-    Procesa la respuesta en streaming separando el contenido visible y el pensamiento,
-    y renderiza en tiempo real el bloque de pensamiento.
-    Retorna una tupla: (visible_text, thinking_text)
+    Renderiza una respuesta en streaming fragmento a fragmento.
+
+    Separa el texto normal de los bloques <think> con ThinkStreamParser y
+    escribe cada bloque de Markdown completo una sola vez; solo el bloque
+    abierto se vuelve a renderizar, como mucho STREAM_RENDER_MAX_HZ veces por
+    segundo. Mientras se piensa, el recuadro muestra solo los últimos
+    STREAM_THINKING_PREVIEW_CHARS caracteres.
+
+    Al recibir los fragmentos con feed() o feed_text() en lugar de recorrer
+    el stream, varias respuestas pueden renderizarse a la vez desde un mismo
+    bucle, y una respuesta generada en segundo plano puede renderizarse desde
+    su búfer. Con attach() el mismo renderer sigue en los placeholders de una
+    nueva ejecución (por ejemplo, de un fragmento de Streamlit) sin volver a
+    procesar el texto ya recibido.
     """
-    full_response = ""
-    visible_text = ""
-    thinking_text = ""
-    thinking_container = st.empty()
-    
-    for chunk in stream:
-        if chunk and 'message' in chunk and 'content' in chunk['message']:
-            content_chunk = chunk['message']['content']
-            full_response += content_chunk
-            
-            # Buscar el bloque <think> en la respuesta completa
-            match = re.search(r'<think>(.*?)</think>', full_response, re.DOTALL)
-            if match:
-                thinking_text = match.group(1).strip()
-                thinking_container.markdown(
-                    f"<div style='background-color: #1E293B; border-left: 4px solid #3B82F6; padding: 10px; border-radius: 4px;'>"
-                    f"<span style='color: #3B82F6; font-weight: bold;'>💭 Pensando en vivo:</span><br/>"
-                    f"<span style='color: #E2E8F0;'>{thinking_text}</span>"
-                    f"</div>",
-                    unsafe_allow_html=True
-                )
-            else:
-                thinking_container.empty()
-            
-            # Eliminar el bloque <think> para obtener el contenido visible
-            visible_text = re.sub(r'<think>.*?</think>', '', full_response, flags=re.DOTALL).strip()
-            message_placeholder.markdown(visible_text + "▌")
-            time.sleep(0.01)
-    
-    message_placeholder.markdown(visible_text)
-    thinking_container.empty()
-    
-    return visible_text, thinking_text
+
+    def __init__(self, normal_placeholder, think_placeholder, timings=None):
+        """
+        Si se pasa el diccionario timings, se anotan en él (time.perf_counter)
+        la llegada del primer token ("first_token") y del primer texto visible
+        fuera de <think> ("first_visible").
+        """
+        self.parser = ThinkStreamParser()
+        self._splitter = MarkdownBlockSplitter()
+        self._scheduler = RenderScheduler()
+        self._timings = timings
+        self._frozen_blocks = []
+        self._pending_blocks = []
+        self._thinking_preview = ""
+        self.attach(normal_placeholder, think_placeholder)
+
+    def attach(self, normal_placeholder, think_placeholder):
+        """
+        Pasa a dibujar en otros placeholders, reescribiendo en ellos los
+        bloques ya completos (una ejecución nueva empieza con la página vacía).
+        """
+        self._think_placeholder = think_placeholder
+        # Los bloques completos se añaden al contenedor; la cola abierta va debajo
+        with normal_placeholder.container():
+            self._frozen_container = st.container()
+            self._tail_placeholder = st.empty()
+        for block in self._frozen_blocks:
+            self._frozen_container.markdown(block, unsafe_allow_html=True)
+
+    def feed(self, chunk):
+        """Procesa un fragmento del stream y redibuja si ya toca."""
+        content_chunk = extract_chunk_content(chunk)
+        if content_chunk:
+            self.feed_text(content_chunk)
+
+    def feed_text(self, content_chunk):
+        """Procesa el texto de un fragmento (por ejemplo, leído del búfer de una generación en segundo plano)."""
+        timings = self._timings
+        if timings is not None and "first_token" not in timings:
+            timings["first_token"] = time.perf_counter()
+        
+        # Separa el texto normal del contenido de <think>, aunque las etiquetas lleguen partidas
+        text_delta, thinking_delta = self.parser.feed(content_chunk)
+        if text_delta:
+            self._pending_blocks.extend(self._splitter.feed(text_delta))
+            if timings is not None and "first_visible" not in timings and text_delta.strip():
+                timings["first_visible"] = time.perf_counter()
+        if thinking_delta:
+            self._thinking_preview = (self._thinking_preview + thinking_delta)[-STREAM_THINKING_PREVIEW_CHARS:]
+        
+        # Los fragmentos se agrupan y la interfaz se actualiza como máximo STREAM_RENDER_MAX_HZ veces por segundo
+        if self._scheduler.due():
+            self.redraw()
+
+    def redraw(self):
+        """Dibuja ya lo recibido, sin esperar al siguiente intervalo."""
+        self._flush_blocks()
+        self._tail_placeholder.markdown(self._splitter.tail + "▌", unsafe_allow_html=True)
+        
+        if self.parser.in_thinking:
+            self._think_placeholder.markdown(
+                thinking_box_html(self._thinking_preview + "▌", "Pensamiento (en vivo)"),
+                unsafe_allow_html=True
+            )
+
+    def partial(self):
+        """
+        Texto y pensamiento recibidos hasta ahora, sin redibujar (para
+        conservar una respuesta interrumpida).
+        """
+        self.parser.close()
+        return self.parser.text, self.parser.thinking
+
+    def finish(self):
+        """
+        Termina el renderizado con lo recibido hasta ahora.
+
+        Retorna:
+          final_text: Texto final sin el contenido de <think>.
+          final_thinking: Contenido acumulado de los bloques <think>.
+        """
+        text_delta, _ = self.parser.close()
+        if text_delta:
+            self._pending_blocks.extend(self._splitter.feed(text_delta))
+        self._flush_blocks()
+        self._tail_placeholder.markdown(self._splitter.tail, unsafe_allow_html=True)
+        
+        normal_text = self.parser.text
+        thinking_text = self.parser.thinking
+        if thinking_text:
+            label = "Pensamiento (sin cerrar)" if self.parser.in_thinking else "Pensamiento"
+            self._think_placeholder.markdown(thinking_box_html(thinking_text, label), unsafe_allow_html=True)
+        
+        return normal_text, thinking_text
+
+    def _flush_blocks(self):
+        # Cada bloque completo se escribe una vez por ejecución
+        for block in self._pending_blocks:
+            self._frozen_container.markdown(block, unsafe_allow_html=True)
+        self._frozen_blocks.extend(self._pending_blocks)
+        self._pending_blocks = []
@@ -0,0 +1,33 @@
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+# Process-wide cache: path -> (mtime, bytes). Shared by every session.
+_asset_cache: Dict[str, Tuple[float, bytes]] = {}
+_asset_lock = threading.Lock()
+
+def load_asset_bytes(path: str) -> Optional[bytes]:
+    """
+    Read a static asset, reusing the cached bytes while the file is unchanged.
+    
+    Args:
+        path: Path to the asset on disk
+        
+    Returns:
+        File contents, or None if the file does not exist
+    """
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    
+    with _asset_lock:
+        cached = _asset_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    
+    with open(path, "rb") as f:
+        data = f.read()
+    with _asset_lock:
+        _asset_cache[path] = (mtime, data)
+    return data
@@ -0,0 +1,99 @@
+import re
+from typing import List, Optional
+
+FENCE_RE = re.compile(r"^( {0,3})(`{3,}|~{3,})")
+LIST_ITEM_RE = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s")
+HEADING_RE = re.compile(r"^ {0,3}#{1,6}(?:\s|$)")
+
+class MarkdownBlockSplitter:
+    """
+    Split streamed markdown into completed blocks and an open tail.
+
+    A block is complete once nothing that arrives later can change how it
+    renders: a paragraph followed by a blank line, a closed code fence, a
+    heading line, or a list group followed by a blank line and a non-list
+    line. Completed blocks can be rendered once and left alone; only the
+    tail needs re-rendering as new text arrives.
+    """
+
+    def __init__(self):
+        self._lines: List[str] = []
+        self._partial = ""
+        self._fence: Optional[str] = None
+        self._fence_top_level = False
+        self._is_list = False
+        self._blank_pending = False
+
+    def feed(self, text: str) -> List[str]:
+        """
+        Add newly received text.
+
+        Args:
+            text: Text delta
+
+        Returns:
+            Blocks completed by this delta, in order
+        """
+        completed: List[str] = []
+        data = self._partial + text
+        lines = data.split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._process_line(line, completed)
+        return completed
+
+    @property
+    def tail(self) -> str:
+        """Text of the block that is still open, including any partial line."""
+        parts = self._lines + [self._partial] if self._partial else self._lines
+        return "\n".join(parts).strip("\n")
+
+    def _process_line(self, line: str, completed: List[str]) -> None:
+        if self._fence is not None:
+            self._lines.append(line)
+            if line.strip().startswith(self._fence) and not line.strip().strip(self._fence[0]):
+                self._fence = None
+                if self._fence_top_level:
+                    self._flush(completed)
+            return
+
+        if not line.strip():
+            if self._lines:
+                self._blank_pending = True
+                self._lines.append(line)
+            return
+
+        fence = FENCE_RE.match(line)
+        is_list_line = bool(LIST_ITEM_RE.match(line))
+        continues_list = self._is_list and (is_list_line or line[:1] in (" ", "\t"))
+
+        if self._blank_pending and not continues_list:
+            self._flush(completed)
+        self._blank_pending = False
+
+        if fence:
+            top_level = not continues_list
+            if top_level:
+                self._flush(completed)
+            self._fence = fence.group(2)[0] * len(fence.group(2))
+            self._fence_top_level = top_level
+            self._lines.append(line)
+            return
+
+        if HEADING_RE.match(line):
+            self._flush(completed)
+            self._lines.append(line)
+            self._flush(completed)
+            return
+
+        if not self._lines:
+            self._is_list = is_list_line
+        self._lines.append(line)
+
+    def _flush(self, completed: List[str]) -> None:
+        block = "\n".join(self._lines).strip("\n")
+        if block:
+            completed.append(block)
+        self._lines = []
+        self._is_list = False
+        self._blank_pending = False
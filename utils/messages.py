@@ -0,0 +1,117 @@
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.thinking import ThinkStreamParser, THINK_OPEN
+
+# Version of the message schema written by this code.
+#   1: {"role", "content", "thinking"?} with reasoning sometimes merged into
+#      content as <think>...</think>, or content given as a dict
+#   2: {"id", "role", "content", "thinking", "metadata"} with reasoning only
+#      in "thinking" and generation details in "metadata"
+MESSAGE_SCHEMA_VERSION = 2
+
+def new_message_id() -> str:
+    return uuid.uuid4().hex
+
+def new_message(
+    role: str,
+    content: str,
+    thinking: str = "",
+    metadata: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Create a message in the current schema.
+
+    Args:
+        role: "user", "assistant" or "system"
+        content: Final text of the message (never includes reasoning)
+        thinking: Reasoning produced before the answer, if any
+        metadata: Generation details (model, options, timings...)
+
+    Returns:
+        Message dict
+    """
+    return {
+        "id": new_message_id(),
+        "role": role,
+        "content": content,
+        "thinking": thinking or "",
+        "metadata": {"created_at": datetime.now().isoformat(), **(metadata or {})},
+    }
+
+def _split_thinking(content: str) -> Tuple[str, str]:
+    """Split <think> sections out of a v1 content string."""
+    parser = ThinkStreamParser()
+    parser.feed(content)
+    parser.close()
+    if not parser.blocks:
+        return content, ""
+    text = parser.text
+    if parser.in_thinking:
+        # Keep an unclosed section as text, as extract_thinking does
+        text += THINK_OPEN + parser.unclosed
+    return text.strip(), "\n".join(b.strip() for b in parser.blocks).strip()
+
+def upgrade_message(message: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert a message of any schema version to the current one.
+
+    Idempotent: current messages are returned as an equivalent copy. A
+    missing id is assigned on the original dict as well, so later calls on
+    the same message produce the same result.
+
+    Args:
+        message: Message dict
+
+    Returns:
+        New message dict in the current schema
+    """
+    content = message.get("content", "")
+    thinking = message.get("thinking") or ""
+
+    if isinstance(content, dict):
+        thinking = content.get("thinking") or thinking
+        content = content.get("content") or ""
+    elif not isinstance(content, str):
+        content = str(content)
+
+    if THINK_OPEN in content:
+        content, merged_thinking = _split_thinking(content)
+        if merged_thinking:
+            thinking = f"{thinking}\n{merged_thinking}".strip() if thinking.strip() else merged_thinking
+
+    if "id" not in message:
+        message["id"] = new_message_id()
+
+    upgraded = {
+        "id": message["id"],
+        "role": message.get("role", "user"),
+        "content": content,
+        "thinking": thinking,
+        "metadata": dict(message.get("metadata") or {}),
+    }
+    if "token_estimate" in message and content == message.get("content"):
+        upgraded["token_estimate"] = message["token_estimate"]
+    return upgraded
+
+def upgrade_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Upgrade a list of messages to the current schema."""
+    return [upgrade_message(m) for m in messages]
+
+def prompt_content(message: Dict[str, Any]) -> str:
+    """
+    Text of a message as it should be sent to the model: the final answer only.
+
+    Args:
+        message: Message dict of any schema version
+
+    Returns:
+        Content without reasoning
+    """
+    content = message.get("content", "")
+    if isinstance(content, dict):
+        return content.get("content") or ""
+    if THINK_OPEN in content:
+        return _split_thinking(content)[0]
+    return content
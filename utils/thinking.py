@@ -1,5 +1,118 @@
 import re
-from typing import Tuple, Optional
+from typing import List, Tuple, Optional
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+class ThinkStreamParser:
+    """
+    Incremental tokenizer that splits a streamed response into visible text
+    and <think> sections.
+
+    Each call to feed() only scans the new chunk plus at most a few held-back
+    characters, so the work per chunk does not depend on how much has been
+    received. Tags split across chunks (e.g. "<thi" + "nk>") are handled by
+    holding back a trailing partial tag until the next chunk arrives.
+    """
+
+    def __init__(self):
+        self.in_thinking = False
+        self._text_parts: List[str] = []
+        self._thinking_parts: List[str] = []
+        self._blocks: List[str] = []
+        self._block_parts: List[str] = []
+        self._pending = ""
+
+    def feed(self, chunk: str) -> Tuple[str, str]:
+        """
+        Process a new chunk of the response.
+        
+        Args:
+            chunk: Newly received text
+            
+        Returns:
+            Tuple of (visible_text_delta, thinking_delta) for this chunk
+        """
+        data = self._pending + chunk if self._pending else chunk
+        self._pending = ""
+        text_delta: List[str] = []
+        thinking_delta: List[str] = []
+        i = 0
+        
+        while i < len(data):
+            tag = THINK_CLOSE if self.in_thinking else THINK_OPEN
+            idx = data.find(tag, i)
+            if idx == -1:
+                # Hold back a trailing partial tag until the next chunk
+                hold = _partial_tag_length(data, tag)
+                self._emit(data[i:len(data) - hold], text_delta, thinking_delta)
+                self._pending = data[len(data) - hold:]
+                break
+            self._emit(data[i:idx], text_delta, thinking_delta)
+            if self.in_thinking:
+                self._blocks.append("".join(self._block_parts))
+                self._block_parts = []
+            self.in_thinking = not self.in_thinking
+            i = idx + len(tag)
+        
+        return "".join(text_delta), "".join(thinking_delta)
+
+    def close(self) -> Tuple[str, str]:
+        """
+        Flush any held-back characters at the end of the stream.
+        
+        Returns:
+            Tuple of (visible_text_delta, thinking_delta)
+        """
+        text_delta: List[str] = []
+        thinking_delta: List[str] = []
+        self._emit(self._pending, text_delta, thinking_delta)
+        self._pending = ""
+        return "".join(text_delta), "".join(thinking_delta)
+
+    def _emit(self, segment: str, text_delta: List[str], thinking_delta: List[str]) -> None:
+        if not segment:
+            return
+        if self.in_thinking:
+            self._thinking_parts.append(segment)
+            self._block_parts.append(segment)
+            thinking_delta.append(segment)
+        else:
+            self._text_parts.append(segment)
+            text_delta.append(segment)
+
+    @property
+    def text(self) -> str:
+        """Visible text received so far (without <think> sections)."""
+        return _joined(self._text_parts)
+
+    @property
+    def thinking(self) -> str:
+        """All thinking content received so far, including an unclosed section."""
+        return _joined(self._thinking_parts)
+
+    @property
+    def blocks(self) -> List[str]:
+        """Contents of the completed <think>...</think> sections."""
+        return list(self._blocks)
+
+    @property
+    def unclosed(self) -> str:
+        """Content of the current <think> section if it has not been closed."""
+        return "".join(self._block_parts) if self.in_thinking else ""
+
+def _partial_tag_length(data: str, tag: str) -> int:
+    """Length of the longest suffix of data that is a proper prefix of tag."""
+    for length in range(min(len(tag) - 1, len(data)), 0, -1):
+        if data.endswith(tag[:length]):
+            return length
+    return 0
+
+def _joined(parts: List[str]) -> str:
+    """Join parts in place so repeated reads don't rejoin the same pieces."""
+    if len(parts) > 1:
+        parts[:] = ["".join(parts)]
+    return parts[0] if parts else ""
 
 def extract_thinking(text: str) -> Tuple[Optional[str], str]:
     """
@@ -15,11 +128,12 @@ def extract_thinking(text: str) -> Tuple[Optional[str], str]:
     if not text:
         return None, ""
     
-    # Pattern to match <think> tags and their content
-    pattern = r'<think>(.*?)</think>'
+    parser = ThinkStreamParser()
+    parser.feed(text)
+    parser.close()
     
     # Find all thinking sections
-    thinking_matches = re.findall(pattern, text, re.DOTALL)
+    thinking_matches = parser.blocks
     
     if not thinking_matches:
         return None, text.strip()
@@ -31,8 +145,10 @@ def extract_thinking(text: str) -> Tuple[Optional[str], str]:
     if not thinking_content or len(thinking_content.strip()) < 10:
         return None, text.strip()
     
-    # Remove thinking sections from the text
-    clean_text = re.sub(pattern, '', text, flags=re.DOTALL)
+    # Text outside the thinking sections; an unclosed section stays as-is
+    clean_text = parser.text
+    if parser.in_thinking:
+        clean_text += THINK_OPEN + parser.unclosed
     
     # Remove extra whitespace that might be left
     clean_text = re.sub(r'\n\s*\n', '\n\n', clean_text)